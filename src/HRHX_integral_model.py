@@ -4,12 +4,300 @@ Created on Wed May 25 19:54:52 2016
 
 @author: nfette
 """
+import bisect
 import scipy.integrate
 import scipy.optimize
 import scipy.interpolate
 import numpy as np
 from hw2_1 import CelsiusToKelvin as C2K, KelvinToCelsius as K2C
 
+# Gauss-Kronrod 7-15 rule on [-1, 1], as in QUADPACK's qk15. Only the
+# non-negative nodes are listed; the Gauss nodes are xgk[1::2].
+_xgk = np.array([0.991455371120812639206854697526329,
+                 0.949107912342758524526189684047851,
+                 0.864864423359769072789712788640926,
+                 0.741531185599394439863864773280788,
+                 0.586087235467691130294144845693013,
+                 0.405845151377397166906606412076961,
+                 0.207784955007898467600689403773245,
+                 0.000000000000000000000000000000000])
+_wgk = np.array([0.022935322010529224963732008058970,
+                 0.063092092629978553290700663189204,
+                 0.104790010322250183839876322541518,
+                 0.140653259715525918745189590510238,
+                 0.169004726639267902826583426598550,
+                 0.190350578064785409913256402421014,
+                 0.204432940075298892414161999234649,
+                 0.209482141084727828012999174891714])
+_wg = np.array([0.129484966168869693270611432679082,
+                0.279705391489276667901467771423780,
+                0.381830050505118944950369775488975,
+                0.417959183673469387755102040816327])
+# Full rules with 15 nodes, ordered from -1 to 1.
+_nodes15 = np.concatenate([-_xgk[:-1], _xgk[::-1]])
+_wk15 = np.concatenate([_wgk[:-1], _wgk[::-1]])
+_wg15 = np.zeros(15)
+_wg15[1:7:2] = _wg[:-1]
+_wg15[7] = _wg[-1]
+_wg15[9:14:2] = _wg[2::-1]
+
+def quad_vectorized(func, a, b, epsabs=1.49e-8, epsrel=1.49e-8,
+                    panels=8, limit=50, breakpoints=(), maxpanels=4096):
+    """Adaptive composite Gauss-Kronrod (7-15) quadrature of func over
+    [a, b], for a func that accepts and returns arrays.
+
+    Where scipy.integrate.quad calls func once per node, this evaluates all
+    nodes of all active panels in one call. Panels whose error estimate
+    |K15 - G7| exceeds their share of the tolerance are bisected, so the
+    grid is refined only where the integrand is sharp, eg. near a pinch.
+
+    Args
+    ----
+        func : callable
+            Maps an array of abscissas to an array of integrand values.
+        a, b : float
+            Limits of integration.
+        epsabs, epsrel : float
+            Absolute and relative error goals, as in scipy.integrate.quad.
+        panels : int
+            Number of equal panels to start with.
+        limit : int
+            Maximum number of refinement rounds.
+        maxpanels : int
+            Refinement also stops when the number of panels that still need
+            refinement would exceed this, eg. where roundoff in the
+            integrand keeps the error estimate above the goal.
+        breakpoints : sequence of float
+            Extra panel boundaries, eg. at known kinks in the integrand.
+
+    Returns
+    -------
+        result : float
+            The integral.
+        abserr : float
+            An estimate of the absolute error.
+    """
+    if a == b:
+        return 0., 0.
+    edges = np.linspace(a, b, panels + 1)
+    inner = [p for p in breakpoints if min(a, b) < p < max(a, b)]
+    if inner:
+        edges = np.unique(np.concatenate([edges, inner]))
+        if b < a:
+            edges = edges[::-1]
+    lo, hi = edges[:-1], edges[1:]
+    done_result, done_error = 0., 0.
+    for it in range(limit):
+        center = 0.5 * (lo + hi)
+        half = 0.5 * (hi - lo)
+        x = center[:,np.newaxis] + half[:,np.newaxis] * _nodes15
+        fx = np.reshape(func(x.ravel()), x.shape)
+        kronrod = half * fx.dot(_wk15)
+        gauss = half * fx.dot(_wg15)
+        error = np.abs(kronrod - gauss)
+        total = done_result + kronrod.sum()
+        tol = max(epsabs, epsrel * abs(total))
+        # Accept panels that meet their share of the tolerance.
+        share = tol * np.abs(hi - lo) / abs(b - a)
+        good = error <= share
+        if done_error + error.sum() <= tol or it == limit - 1 \
+                or 2 * (~good).sum() > maxpanels:
+            return total, done_error + error.sum()
+        done_result += kronrod[good].sum()
+        done_error += error[good].sum()
+        lo, hi, center = lo[~good], hi[~good], center[~good]
+        lo, hi = np.concatenate([lo, center]), np.concatenate([center, hi])
+
+class monotoneCubic(object):
+    """A monotone piecewise cubic (Pchip) curve y(x), for stream curves.
+
+    Gives the same values as scipy.interpolate.PchipInterpolator, from which
+    it takes the segment coefficients once, but is much cheaper to call
+    with a scalar, as quad and minimize do: the segment is found by bisect
+    and the cubic is evaluated in plain floats. Arrays are evaluated with
+    searchsorted and vectorized Horner's rule.
+
+    Args
+    ----
+        x : array
+            Strictly increasing knots.
+        y : array
+            Values at the knots.
+        extrapolate : bool
+            If True (default), extends the end segments beyond the knots;
+            otherwise returns nan there.
+        breaks : sequence of int, optional
+            Indices of knots where the slope may jump, eg. at the ends of an
+            isothermal plateau. Each stretch between breaks is a separate
+            Pchip curve, so the corners are kept sharp.
+
+    The curve also provides derivatives, via the nu argument as in scipy,
+    and inverse(y), where the knot values are monotone.
+    """
+    def __init__(self, x, y, extrapolate=True, breaks=()):
+        x = np.asarray(x, dtype=float)
+        edges = np.unique(np.concatenate([[0, len(x) - 1],
+                                          np.asarray(breaks, dtype=int)]))
+        pchips = [scipy.interpolate.PchipInterpolator(x[a:b+1], y[a:b+1])
+                  for a, b in zip(edges[:-1], edges[1:])]
+        self.x = x
+        self.c = np.concatenate([p.c for p in pchips], axis=1)
+        self.y = np.append(self.c[3], np.asarray(y, dtype=float)[-1])
+        self.extrapolate = extrapolate
+        self._xl = self.x.tolist()
+        self._cl = self.c.T.tolist()
+        dy = np.diff(self.y)
+        self.monotone = bool(((dy >= 0).all() or (dy <= 0).all())
+                             and (dy != 0).any())
+
+    def _index(self, x):
+        i = np.searchsorted(self.x, x, side='right') - 1
+        return np.clip(i, 0, len(self.x) - 2)
+
+    def __call__(self, x, nu=0):
+        """Returns y(x), or if nu > 0, its nu-th derivative."""
+        if nu == 0 and isinstance(x, float):
+            xl = self._xl
+            if not self.extrapolate and not xl[0] <= x <= xl[-1]:
+                return np.nan
+            i = min(max(bisect.bisect_right(xl, x) - 1, 0), len(xl) - 2)
+            a, b, c, d = self._cl[i]
+            dx = x - xl[i]
+            return ((a * dx + b) * dx + c) * dx + d
+        x = np.asarray(x, dtype=float)
+        i = self._index(x)
+        dx = x - self.x[i]
+        a, b, c, d = self.c[:, i]
+        if nu == 0:
+            y = ((a * dx + b) * dx + c) * dx + d
+        elif nu == 1:
+            y = (3 * a * dx + 2 * b) * dx + c
+        elif nu == 2:
+            y = 6 * a * dx + 2 * b
+        elif nu == 3:
+            y = 6 * a
+        else:
+            y = np.zeros_like(dx)
+        if not self.extrapolate:
+            y = np.where((x < self.x[0]) | (x > self.x[-1]), np.nan, y)
+        return y
+
+    def inverse(self, y, iterations=20):
+        """Returns x such that y(x) = y, for a curve with monotone knot
+        values. Within the knots, solves the segment cubic by Newton's
+        method safeguarded by bisection; beyond them, extends linearly with
+        the end slopes. Where several knots share the value y, as on an
+        isothermal plateau, returns the last of them."""
+        if not self.monotone:
+            raise ValueError("Curve is not monotone, so has no inverse.")
+        scalar = np.ndim(y) == 0
+        y = np.asarray(y, dtype=float)
+        sign = 1. if self.y[-1] > self.y[0] else -1.
+        i = np.clip(np.searchsorted(sign * self.y, sign * y, side='right') - 1,
+                    0, len(self.x) - 2)
+        h = self.x[i+1] - self.x[i]
+        y0, y1 = self.y[i], self.y[i+1]
+        a, b, c, d = self.c[:, i]
+        # Start from the chord, and keep a bracket [lo, hi] within the segment.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(np.where(y1 != y0, h * (y - y0) / (y1 - y0), h), 0, h)
+        lo, hi = np.zeros_like(t), h.copy()
+        for k in range(iterations):
+            f = sign * ((((a * t + b) * t + c) * t + d) - y)
+            lo, hi = np.where(f < 0, t, lo), np.where(f > 0, t, hi)
+            fp = sign * ((3 * a * t + 2 * b) * t + c)
+            step = np.divide(f, fp, out=np.full_like(f, np.inf), where=fp != 0)
+            t_new = t - step
+            inside = (t_new >= lo) & (t_new <= hi)
+            t_new = np.where(inside, t_new, 0.5 * (lo + hi))
+            if np.all(np.abs(t_new - t) <= 1e-14 * h):
+                t = t_new
+                break
+            t = t_new
+        # Newton converges slowly to a knot where the slope is zero, as at
+        # the ends of a Pchip curve, so knot values map to knots exactly.
+        t = np.where(y == y0, 0., np.where(y == y1, h, t))
+        x = self.x[i] + t
+        # Beyond the knots, extend linearly.
+        slope0, slope1 = self(self.x[0], 1), self(self.x[-1], 1)
+        below = sign * (y - self.y[0]) < 0
+        above = sign * (y - self.y[-1]) > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.where(below, self.x[0] + (y - self.y[0]) / slope0, x)
+            x = np.where(above, self.x[-1] + (y - self.y[-1]) / slope1, x)
+        return float(x) if scalar else x
+
+def sampleCurve(func, a, b, tol=0.02, n=9, maxpoints=50, truncate=True,
+                verbose=False):
+    """Samples a stream curve (q, T) = func(t) for parameter t from a to b,
+    placing points where they are needed to interpolate T(q).
+
+    Starts with n evenly spaced parameters, then repeatedly bisects the
+    intervals next to any point that lies further than tol (in T) from the
+    chord through its neighbors. So flat stretches keep few points and the
+    knees (eg. near bubble points) get many, up to maxpoints in all.
+
+    func is called with one parameter at a time, so it may wrap a scalar
+    property routine. If truncate, then an error during the initial pass
+    ends the curve at the last good point, and an error at a bisection point
+    leaves that interval alone; with verbose, the point where the curve ends
+    is printed. Otherwise, errors propagate.
+
+    Returns arrays (t, q, T) in order of the parameter from a to b.
+    """
+    t_list, q_list, T_list = [], [], []
+    for i, t in enumerate(np.linspace(a, b, n)):
+        try:
+            q, T = func(t)
+        except Exception:
+            if not truncate:
+                raise
+            if verbose:
+                print("[{}] t = {}: Unable to evaluate curve".format(i, t))
+            break
+        t_list.append(t)
+        q_list.append(q)
+        T_list.append(T)
+    t, q, T = np.array(t_list), np.array(q_list), np.array(T_list)
+    failed = set()
+    while len(t) < maxpoints and len(t) > 2:
+        # Deviation of each interior point from its neighbors' chord.
+        dq = q[2:] - q[:-2]
+        frac = np.divide(q[1:-1] - q[:-2], dq, out=np.zeros_like(dq),
+                         where=dq != 0)
+        dev = np.abs(T[1:-1] - (T[:-2] + frac * (T[2:] - T[:-2])))
+        # An interval's need is the larger deviation at its two ends.
+        need = np.zeros(len(t) - 1)
+        need[:-1] = dev
+        need[1:] = np.maximum(need[1:], dev)
+        for i in range(len(need)):
+            if (t[i], t[i+1]) in failed:
+                need[i] = 0
+        order = np.argsort(-need)
+        order = order[need[order] > tol][:maxpoints - len(t)]
+        if len(order) == 0:
+            break
+        new_t, new_q, new_T, new_i = [], [], [], []
+        for i in order:
+            tm = 0.5 * (t[i] + t[i+1])
+            try:
+                qm, Tm = func(tm)
+            except Exception:
+                if not truncate:
+                    raise
+                failed.add((t[i], t[i+1]))
+                continue
+            new_t.append(tm)
+            new_q.append(qm)
+            new_T.append(Tm)
+            new_i.append(i + 1)
+        if not new_i:
+            break
+        t = np.insert(t, new_i, new_t)
+        q = np.insert(q, new_i, new_q)
+        T = np.insert(T, new_i, new_T)
+    return t, q, T
+
 class stream(object):
     def setQ(self,Q):
         pass
@@ -17,6 +305,21 @@ class stream(object):
         pass
     def T(self,q):
         pass
+    def segments(self):
+        """Optional. Returns (edges, kinds), where edges is an increasing
+        array of q, and kinds[i] tells the shape of T(q) between edges[i]
+        and edges[i+1]: 'linear', 'isothermal' or 'curve'. Where both
+        streams are linear or isothermal, the integrator uses the closed
+        form (LMTD) instead of quadrature. Streams without this method are
+        treated as a single curve, which is also this default."""
+        return np.array([-np.inf, np.inf]), ['curve']
+    def zones(self):
+        """Optional. Returns (edges, phases), like segments(), where
+        phases[i] is 'subcooled', 'two-phase', 'superheated' or
+        'single-phase'. Used by calcZones to apply a film coefficient per
+        zone. Streams without this method are one 'single-phase' zone, which
+        is also this default."""
+        return np.array([-np.inf, np.inf]), ['single-phase']
 
 class streamExample1(object):
     def __init__(self, T_inlet=0, mdot=1.0, cp=1.0):
@@ -29,6 +332,10 @@ class streamExample1(object):
     def T(self,q):
         C = self.mdot * self.cp
         return self.T_inlet + q / C
+    def segments(self):
+        return np.array([-np.inf, np.inf]), ['linear']
+    def zones(self):
+        return np.array([-np.inf, np.inf]), ['single-phase']
     def __repr__(self):
         return "T_inlet = {}, mdot = {}, cp = {}".format(
             self.T_inlet, self.mdot, self.cp)
@@ -74,23 +381,87 @@ class streamExample2(object):
             return self.T_sat + (h - self.hsatv) / self.cp
         else:
             return self.T_sat
+    def segments(self):
+        edges = self.mdot * (np.array([-np.inf, self.hsatl, self.hsatv, np.inf])
+                             - self.h_inlet)
+        return edges, ['linear', 'isothermal', 'linear']
+    def zones(self):
+        return self.segments()[0], ['subcooled', 'two-phase', 'superheated']
+
+class fluidTable(object):
+    """Tabulated enthalpy of a pure fluid along an isobar, built with one
+    vectorized CoolProp call per phase. Between the tabulated points, h(T)
+    and T(h) are monotone cubic (Pchip) interpolants; the two-phase region
+    is exactly isothermal at T_sat.
+
+    Use getFluidTable(P, fluid), which caches tables by fluid and pressure,
+    so that all streams at the same pressure share one table.
+
+    Units are SI: P in Pa, T in K, h in J/kg.
+    """
+    def __init__(self, P, fluid='water', n=200):
+        import CoolProp
+        from CoolProp.CoolProp import PropsSI
+        self.P = P
+        self.fluid = fluid
+        f = CoolProp.AbstractState('HEOS',fluid)
+        self.Tmin, self.Tmax = f.Tmin(), f.Tmax()
+        f.update(CoolProp.PQ_INPUTS,P,0)
+        self.T_sat, self.h_liq = f.T(), f.hmass()
+        f.update(CoolProp.PQ_INPUTS,P,1)
+        self.h_vap = f.hmass()
+        # Nodes crowd towards saturation, where the curvature is greatest.
+        u = 0.5 * (1 - np.cos(np.linspace(0, np.pi, n)))
+        T_liq = self.Tmin + (self.T_sat - self.Tmin) * u[:-1]
+        T_vap = self.T_sat + (self.Tmax - self.T_sat) * u[1:]
+        h_liq = PropsSI('H','P',P,'T',T_liq,fluid)
+        h_vap = PropsSI('H','P',P,'T',T_vap,fluid)
+        T_liq, h_liq = np.append(T_liq, self.T_sat), np.append(h_liq, self.h_liq)
+        T_vap, h_vap = np.insert(T_vap, 0, self.T_sat), np.insert(h_vap, 0, self.h_vap)
+        self.h_min, self.h_max = h_liq[0], h_vap[-1]
+        pchip = monotoneCubic
+        self._h_liq, self._T_liq = pchip(T_liq, h_liq), pchip(h_liq, T_liq)
+        self._h_vap, self._T_vap = pchip(T_vap, h_vap), pchip(h_vap, T_vap)
+
+    def h(self, T, h_sat=None):
+        """Returns enthalpy at temperature T. At exactly T_sat, returns
+        h_sat, or if None, the saturated liquid enthalpy."""
+        T = np.asarray(T, dtype=float)
+        if h_sat is None:
+            h_sat = self.h_liq
+        return np.where(T < self.T_sat, self._h_liq(T),
+                        np.where(T > self.T_sat, self._h_vap(T), h_sat))
+
+    def T(self, h):
+        """Returns temperature at enthalpy h."""
+        h = np.asarray(h, dtype=float)
+        return np.where(h < self.h_liq, self._T_liq(h),
+                        np.where(h > self.h_vap, self._T_vap(h), self.T_sat))
+
+_fluidTables = {}
+
+def getFluidTable(P, fluid='water'):
+    """Returns the fluidTable for the given pressure, building it once."""
+    key = (fluid, float(P))
+    if key not in _fluidTables:
+        _fluidTables[key] = fluidTable(P, fluid)
+    return _fluidTables[key]
 
 class waterStream(object):
     """A class for phase change of a given fluid. The specific heats of
     saturated water liquid and vapor at equilibrium are different,
-    so the streamExample2 is insufficient to represent this case."""
+    so the streamExample2 is insufficient to represent this case.
+
+    Properties come from a cached fluidTable for the stream pressure, so q
+    and T accept arrays and cost no CoolProp calls after the first stream
+    at each pressure."""
     def __init__(self,P,h_in,mdot,fluid='water'):
-        import CoolProp
-        
         self.P = P
         self.h_in = h_in
         self.mdot = mdot
         self.fluid = fluid
-        f = CoolProp.AbstractState('HEOS',fluid)
-        f.update(CoolProp.PQ_INPUTS,self.P,0)
-        h_liq = f.hmass()
-        f.update(CoolProp.PQ_INPUTS,self.P,1)
-        h_vap = f.hmass()
+        self.table = getFluidTable(P, fluid)
+        h_liq, h_vap = self.table.h_liq, self.table.h_vap
         # Determine what enthalpy to give at saturation temperature, since
         # at saturation temperature, rounding depends whether
         # the user intends heating or cooling.
@@ -101,43 +472,31 @@ class waterStream(object):
         else:
             self.h_sat = h_in
         
-        #f.update(CoolProp.QT_INPUTS,0,f.Ttriple())
-        f.update(CoolProp.PT_INPUTS,P,f.Tmin())
-        h_min = f.hmass()
-        f.update(CoolProp.PT_INPUTS,P,f.Tmax())
-        h_max = f.hmass()
+        h_min, h_max = self.table.h_min, self.table.h_max
         qlim1,qlim2 = self.mdot * (h_max - self.h_in), self.mdot * (h_min - self.h_in)
         self.qmin = min(qlim1,qlim2)
         self.qmax = max(qlim1,qlim2)
-        self.Tmin = K2C(f.Tmin())
-        self.Tmax = K2C(f.Tmax())
-        self.q = np.vectorize(self._q)
-        self.T = np.vectorize(self._T)
+        self.Tmin = K2C(self.table.Tmin)
+        self.Tmax = K2C(self.table.Tmax)
+
+    def segments(self):
+        # The liquid and vapor curves are tabulated; boiling is isothermal.
+        return self.zones()[0], ['curve', 'isothermal', 'curve']
+
+    def zones(self):
+        edges = self.mdot * (np.array([-np.inf, self.table.h_liq,
+                                       self.table.h_vap, np.inf]) - self.h_in)
+        return edges, ['subcooled', 'two-phase', 'superheated']
             
-    def _q(self,T):
-        from CoolProp.CoolProp import PropsSI
-        if T < self.Tmin:
-            return 0
-        elif T > self.Tmax:
-            return self._q(self.Tmax)
-        else:
-            try:
-                # CoolProp raises an exception if this is the saturation temp.
-                #h_out = CP.PropsSI('H','P',self.P,'T',C2K(T),self.fluid)
-                h_out = PropsSI('H','P',self.P,'T',C2K(T),self.fluid)
-            except:
-                h_out = self.h_sat
-        return self.mdot * (h_out - self.h_in)
-
-    def _T(self,q):        
-        from CoolProp.CoolProp import PropsSI
-        if q < self.qmin:
-            q = self.qmin
-        elif q > self.qmax:
-            q = self.qmax
-        
+    def q(self,T):
+        T = np.asarray(T, dtype=float)
+        h_out = self.table.h(C2K(np.minimum(T, self.Tmax)), self.h_sat)
+        return np.where(T < self.Tmin, 0., self.mdot * (h_out - self.h_in))
+
+    def T(self,q):
+        q = np.clip(q, self.qmin, self.qmax)
         h_out = q / self.mdot + self.h_in
-        return K2C(PropsSI('T','P',self.P,'H',h_out,self.fluid))
+        return K2C(self.table.T(h_out))
         
 class waterStreamInterpolated(waterStream):
     """A class for phase change of a given fluid. The specific heats of
@@ -148,60 +507,181 @@ class waterStreamInterpolated(waterStream):
         #print(s)
         s.__init__(P,h_in,mdot,fluid)
         self.Q_design = Q_design
-        q_points1 = np.linspace(0,Q_design*1.1,100)
-        T_points1 = self.T(q_points1)
+        q_points1, _, T_points1 = sampleCurve(
+            lambda q: (q, float(self.T(q))), 0, Q_design*1.1, maxpoints=100)
 
         # This may not work well
         T0,T1 = T_points1[0],T_points1[-1]
         if T0 == T1:
             T1 = T0 + 5. * np.sign(Q_design)
-        T_points2 = np.linspace(T0,T1,100)
-        q_points2 = self.q(T_points2)
+        # Sample q(T) the same way, measuring its error in heat.
+        T_points2, _, q_points2 = sampleCurve(
+            lambda T: (T, float(self.q(T))), T0, T1,
+            tol=abs(Q_design)*1e-4, maxpoints=100)
         
         if Q_design > 0:
-            self.T = scipy.interpolate.PchipInterpolator(q_points1,T_points1)
-            self.q = scipy.interpolate.PchipInterpolator(T_points2,q_points2)
+            self.T = monotoneCubic(q_points1,T_points1)
+            self.q = monotoneCubic(T_points2,q_points2)
         else:
-            self.T = scipy.interpolate.PchipInterpolator(q_points1[::-1],T_points1[::-1])
-            self.q = scipy.interpolate.PchipInterpolator(T_points2[::-1],q_points2[::-1])
-        
+            self.T = monotoneCubic(q_points1[::-1],T_points1[::-1])
+            self.q = monotoneCubic(T_points2[::-1],q_points2[::-1])
 
-class aquaStream(object):
-    """A class for ammonia water mixture stream, using a fixed library."""
-    def __init__(self,inlet,mdot):
+    def segments(self):
+        # The interpolant rounds the corners of the boiling plateau.
+        return np.array([-np.inf, np.inf]), ['curve']
+
+
+def _quantize(*values):
+    """Rounds values to 8 significant digits, for use as a cache key."""
+    return tuple(float('{:.8g}'.format(v)) for v in values)
+
+_ammoniaProps = None
+
+def _getAmmoniaProps():
+    """Returns a shared ammonia_props.AmmoniaProps, loading it once."""
+    global _ammoniaProps
+    if _ammoniaProps is None:
         import ammonia_props
-        amm = ammonia_props.AmmoniaProps()
-        
+        _ammoniaProps = ammonia_props.AmmoniaProps()
+    return _ammoniaProps
+
+_aquaTables = {}
+
+def getAquaTable(P, x, Tmin=200, Tmax=400, dT=4.):
+    """Returns (h_points, T_points) for ammonia-water at pressure P and
+    ammonia mass fraction x, between temperatures Tmin and Tmax (K), with
+    at most about one point per dT of range, placed by sampleCurve. Tables are
+    cached by the quantized (P, x, Tmin, Tmax), so repeat builds are
+    dictionary hits."""
+    key = _quantize(P, x, Tmin, Tmax, dT)
+    if key not in _aquaTables:
+        amm = _getAmmoniaProps()
+        h_min = amm.props2(P = P, x = x, T = Tmin).h
+        h_max = amm.props2(P = P, x = x, T = Tmax).h
+        n = max(10, int(np.ceil((Tmax - Tmin) / dT)) + 1)
+        h_points, _, T_points = sampleCurve(
+            lambda h: (h, amm.props2(P = P, x = x, h = h).T),
+            h_min, h_max, maxpoints = n, truncate = False)
+        _aquaTables[key] = h_points, T_points
+    return _aquaTables[key]
+
+_aquaSaturation = {}
+
+def getAquaSaturation(P, x):
+    """Returns (h_liq, h_vap), the enthalpies of ammonia-water at pressure P
+    and ammonia mass fraction x at the bubble and dew points, cached by the
+    quantized (P, x)."""
+    key = _quantize(P, x)
+    if key not in _aquaSaturation:
+        amm = _getAmmoniaProps()
+        _aquaSaturation[key] = (amm.props2(P = P, x = x, Qu = 0).h,
+                                amm.props2(P = P, x = x, Qu = 1).h)
+    return _aquaSaturation[key]
+
+class aquaStream(object):
+    """A class for ammonia water mixture stream, using a fixed library.
+
+    The curve is tabulated between temperatures Tmin and Tmax (K), which
+    should cover the temperatures the stream can reach in its heat exchanger
+    (eg. the inlet temperatures of both streams). Beyond the table, q and T
+    give nan rather than extrapolating the end cubics, which are unbounded
+    and need not be monotone there. The table is shared by all streams with
+    the same (P, x, Tmin, Tmax); see getAquaTable."""
+    def __init__(self,inlet,mdot,Tmin=200,Tmax=400):
         self.inlet = inlet
         self.mdot = mdot
-        
-        liquid = amm.props2(P = inlet.P, x = inlet.x, Qu = 0)
-        vapor = amm.props2(P = inlet.P, x = inlet.x, Qu = 1)
-        if liquid.T == vapor.T:
-            pass
-            #q,T = self._q, self.T
+        self.Tmin, self.Tmax = Tmin, Tmax
+        h_points, T_points = getAquaTable(inlet.P, inlet.x, Tmin, Tmax)
+        q_points = mdot * (h_points - inlet.h)
+        self.q = monotoneCubic(T_points, q_points, extrapolate=False)
+        self.T = monotoneCubic(q_points, T_points, extrapolate=False)
+        self.h_liq, self.h_vap = getAquaSaturation(inlet.P, inlet.x)
         # Determine what enthalpy to give at saturation temperature, since
         # at saturation temperature, rounding depends whether
         # the user intends heating or cooling.
-        if inlet.h < liquid.h:
-            self.h_sat = liquid.h
-        elif inlet.h > vapor.h:
-            self.h_sat = vapor.h
+        if inlet.h < self.h_liq:
+            self.h_sat = self.h_liq
+        elif inlet.h > self.h_vap:
+            self.h_sat = self.h_vap
         else:
             self.h_sat = inlet.h
-        
-        Tmin,Tmax = 200,400
-        minstate = amm.props2(P = inlet.P, x = inlet.x, T = Tmin)
-        maxstate = amm.props2(P = inlet.P, x = inlet.x, T = Tmax)
-        h_min,h_max = minstate.h, maxstate.h
-        q_points = []
-        T_points = []
-        for h in np.linspace(h_min, h_max):
-            q_points.append(mdot * (h - inlet.h))
-            state = amm.props2(P = inlet.P, x = inlet.x, h = h)
-            T_points.append(state.T)
-        self.q = scipy.interpolate.PchipInterpolator(T_points, q_points)
-        self.T = scipy.interpolate.PchipInterpolator(q_points, T_points)
+
+    def zones(self):
+        edges = self.mdot * (np.array([-np.inf, self.h_liq, self.h_vap,
+                                       np.inf]) - self.inlet.h)
+        return edges, ['subcooled', 'two-phase', 'superheated']
+
+def streamBreakpoints(stream):
+    """Returns the temperatures where a stream's q(T) curve may have kinks
+    or jumps: the knots of a tabulated curve, or the saturation temperature
+    of streamExample2 and waterStream. Returns an empty array for smooth
+    streams."""
+    if isinstance(stream, streamExample2):
+        return np.array([stream.T_sat])
+    if isinstance(stream, waterStream) and not hasattr(stream.q, 'x'):
+        return np.array([K2C(stream.table.T_sat)])
+    return np.asarray(getattr(stream.q, 'x', []), dtype=float)
+
+def _scanMinimum(func, lo, hi, breakpoints=(), n=201):
+    """Minimizes a piecewise smooth func over [lo, hi]. Evaluates func once
+    on a uniform grid merged with points just either side of the
+    breakpoints, then refines between the neighbors of the best point.
+    Returns (x, func(x)).
+
+    The breakpoints themselves are left out: where a stream is isothermal,
+    its q(T) jumps there, and the value it gives exactly at the jump is a
+    matter of convention, whereas the limits either side are physical."""
+    span = hi - lo
+    if span <= 0:
+        return lo, float(func(np.array([lo]))[0])
+    bp = np.asarray(breakpoints, dtype=float)
+    bp = bp[(bp > lo) & (bp < hi)]
+    delta = 1e-9 * span
+    x = np.unique(np.concatenate([np.linspace(lo, hi, n),
+                                  bp - delta, bp + delta]))
+    x = x[~np.isin(x, bp)]
+    y = np.asarray(func(x), dtype=float)
+    i = np.nanargmin(y)
+    a, b = x[max(i - 1, 0)], x[min(i + 1, len(x) - 1)]
+    if b - a > 4 * delta:
+        opt = scipy.optimize.minimize_scalar(lambda t: float(func(t)),
+                                             bounds=(a, b), method='bounded',
+                                             options=dict(xatol=1e-12*span))
+        if opt.fun < y[i]:
+            return opt.x, opt.fun
+    return x[i], y[i]
+
+def _linearUA(h, dt0, dt1, delta_t_min=-np.inf):
+    """Closed form of the UA and error integrals of calcUA3 over an interval
+    of width h, where the temperature difference is linear from dt0 to dt1
+    and is held at no less than delta_t_min. Returns (UA, error)."""
+    lo, hi = min(dt0, dt1), max(dt0, dt1)
+    if hi <= delta_t_min:
+        return h / delta_t_min, h * (delta_t_min - 0.5 * (dt0 + dt1))
+    if lo < delta_t_min:
+        # Split where the difference crosses delta_t_min.
+        f = (delta_t_min - lo) / (hi - lo)
+        ua1, err1 = _linearUA(f * h, lo, delta_t_min, delta_t_min)
+        ua2, err2 = _linearUA((1 - f) * h, delta_t_min, hi, delta_t_min)
+        return ua1 + ua2, err1 + err2
+    if h == 0:
+        return 0., 0.
+    if lo <= 0 <= hi:
+        # The difference reaches zero, so the integral diverges.
+        return np.inf, 0.
+    if hi - lo <= 1e-12 * hi:
+        return h / (0.5 * (dt0 + dt1)), 0.
+    # The log mean temperature difference.
+    return h * np.log(dt1 / dt0) / (dt1 - dt0), 0.
+
+# Per-segment results of counterflow_integrator.calcUA3Segments.
+segmentType = np.dtype(dict(names="q_start q_end Q UA deltaT_min error".split(),
+                            formats=['d']*6))
+
+# Per-zone results of counterflow_integrator.calcZones.
+zoneType = np.dtype([('q_start', 'd'), ('q_end', 'd'), ('Q', 'd'),
+                     ('UA', 'd'), ('U', 'd'), ('area', 'd'),
+                     ('deltaT_min', 'd'), ('cold', 'U12'), ('hot', 'U12')])
 
 class counterflow_integrator(object):
     """Change in progress:
@@ -224,28 +704,71 @@ class counterflow_integrator(object):
         else:
             self.Qmax = np.inf
             
-    def calcUA(self,Q,eff=False):
+    def calcUA(self,Q,eff=False,method='quad'):
+        """Returns UA for total heat flow Q (and effectiveness, if eff).
+
+        With method='grid', the integral is computed by quad_vectorized, and
+        with method='profile', from the adaptive profile counterflowPoints.
+        Both require that the streams' T functions accept arrays."""
         # OLD
         #func = lambda q: 1./(self.hot.T(Q-q)-self.cold.T(q))
         # Q > is total heat transferred into cold stream, and q is local cum.
         func = lambda q: 1./(self.hot.T(q-Q)-self.cold.T(q))
-        ua = scipy.integrate.quad(func,0,Q)[0]
+        if method == 'profile':
+            ua = self.profile(Q).UA[-1]
+        elif method == 'table':
+            self._currentTable()
+            Q = np.asarray(Q, dtype=float)
+            s = -np.log1p(-np.minimum(Q / self.Qmax, 1.))
+            ua = np.where(s > self._y_of_s.x[-1], np.inf,
+                          self._UA_ref * np.expm1(self._y_of_s(s)))
+            if ua.ndim == 0:
+                ua = float(ua)
+        elif method == 'grid':
+            ua = quad_vectorized(func,0,Q)[0]
+        elif self._hasSegments():
+            ua = 0.
+            for a, b, linear in self._pieces(Q):
+                if linear:
+                    dt0, dt1 = (self.hot.T(a-Q) - self.cold.T(a),
+                                self.hot.T(b-Q) - self.cold.T(b))
+                    ua += _linearUA(b - a, dt0, dt1)[0]
+                else:
+                    ua += scipy.integrate.quad(func,a,b)[0]
+        else:
+            ua = scipy.integrate.quad(func,0,Q)[0]
         epsilon = Q / self.Qmax
-        if epsilon > 1:
+        if np.any(epsilon > 1):
             raise ValueError("Q given [{}] is higher than Q maximum [{}];"\
             " effectiveness [{}] > 1.".format(Q,self.Qmax,epsilon))
         if eff:            
             return ua, epsilon
         else:
             return ua
-    def calcQ(self,UA):
+    def calcQ(self,UA,method=None):
+        """Returns the heat flow Q for a given UA.
+
+        With method='table', UA may be an array, and Q is interpolated from
+        the table built by tabulateUA(). UA beyond the table gives its last
+        duty, (1 - epsmin) * Qmax."""
+        if method == 'table':
+            self._currentTable()
+            UA = np.clip(UA, 0, self.UA_table[-1])
+            y = np.log1p(UA / self._UA_ref)
+            return self.Qmax * -np.expm1(-self._s_of_y(y))
         func = lambda Q:(self.calcUA(Q)-UA)**2
         constraints = [{"type":"ineq",
                        "fun":lambda Q: Q},
                         {"type":"ineq",
                        "fun":lambda Q: self.Qmax-Q}]
         return scipy.optimize.minimize(func,0,constraints=constraints).x[0]
-    def calcQmax(self,extra=False,brute=False):
+    def calcQmax(self,extra=False,brute=False,method=None):
+        """Returns the maximum heat flow, Qmax.
+
+        With method='breakpoints', calls calcQmaxBreakpoints() instead of
+        an optimizer (brute chooses differential_evolution over SLSQP)."""
+        if method == 'breakpoints':
+            return self.calcQmaxBreakpoints(extra)
         # Preliminary Max Q based on inlet temperatures only
         qc = min(self.func1(0),self.func2(0))
         #print("qc = ",qc)
@@ -273,7 +796,257 @@ class counterflow_integrator(object):
             return opt1
         else:
             return self.Qmax
-            
+
+    def calcQmaxBreakpoints(self,extra=False):
+        """Computes Qmax directly from the stream curves.
+
+        Both func1 and func2 are the same function of local temperature,
+        D(T) = cold.q(T) - hot.q(T), that is, the heat the cold stream takes
+        up to reach T less the heat the hot stream gives down to T. So Qmax
+        is the least D(T) between the cold and hot inlet temperatures, where
+        the exchanger pinches. D(T) is scanned in one vectorized pass at the
+        stream breakpoints, then refined locally.
+
+        Returns Qmax, or if extra, (Qmax, T_pinch, q_pinch) where q_pinch is
+        the pinch location as cumulative heat into the cold stream.
+        """
+        T_lo, T_hi = float(self.cold.T(0)), float(self.hot.T(0))
+        D = lambda T: self.cold.q(T) - self.hot.q(T)
+        bp = np.concatenate([streamBreakpoints(self.cold),
+                             streamBreakpoints(self.hot)])
+        T_pinch, Qmax = _scanMinimum(D, T_lo, T_hi, bp)
+        self.Qmax = max(float(Qmax), 0.)
+        self.T_pinch = float(T_pinch)
+        self.q_pinch = float(self.cold.q(T_pinch))
+        if extra:
+            return self.Qmax, self.T_pinch, self.q_pinch
+        else:
+            return self.Qmax
+
+    def calcPinch(self, Q):
+        """Returns (q_pinch, DeltaT_pinch), the location (cumulative heat
+        into the cold stream) and size of the least temperature difference
+        for total heat flow Q. Like calcDistanceT, but deterministic: scans
+        both streams' breakpoints in one pass, then refines locally."""
+        f = lambda q: self.hot.T(q-Q) - self.cold.T(q)
+        q_pinch, DeltaT = _scanMinimum(f, 0., Q, self._qBreakpoints(Q))
+        return float(q_pinch), float(DeltaT)
+
+    def _hasSegments(self):
+        return hasattr(self.cold, 'segments') or hasattr(self.hot, 'segments')
+
+    def _split(self, Q, method, default):
+        """Splits [0, Q] (in the cold stream's cumulative q) at the edges
+        returned by each stream's method, 'segments' or 'zones'. Returns a
+        list of (a, b, cold_label, hot_label); streams without the method
+        get the default label throughout."""
+        def labels(s, shift):
+            if hasattr(s, method):
+                edges, names = getattr(s, method)()
+                return np.asarray(edges, dtype=float) + shift, names
+            return np.array([-np.inf, np.inf]), [default]
+        e1, k1 = labels(self.cold, 0.)
+        e2, k2 = labels(self.hot, Q)
+        lo, hi = min(0, Q), max(0, Q)
+        edges = np.concatenate([[lo, hi], e1, e2])
+        edges = np.unique(edges[(edges >= lo) & (edges <= hi)])
+        result = []
+        for a, b in zip(edges[:-1], edges[1:]):
+            m = 0.5 * (a + b)
+            result.append((a, b, k1[np.searchsorted(e1, m) - 1],
+                           k2[np.searchsorted(e2, m) - 1]))
+        if Q < 0:
+            result = [(b, a, k1, k2) for a, b, k1, k2 in result[::-1]]
+        return result
+
+    def _pieces(self, Q):
+        """Splits [0, Q] at the segment edges of both streams. Returns a
+        list of (a, b, linear), where linear tells whether both streams are
+        linear or isothermal there."""
+        return [(a, b, 'curve' not in (k1, k2))
+                for a, b, k1, k2 in self._split(Q, 'segments', 'curve')]
+
+    def calcZones(self, Q, h_cold, h_hot, panels=8):
+        """Sizes the exchanger zone by zone, for heat flow Q.
+
+        The duty is split wherever either stream changes phase (see
+        stream.zones). In each zone the overall coefficient combines the two
+        film coefficients, 1/U = 1/h_cold + 1/h_hot, and the zone's UA
+        integral gives its area, A = UA / U. All zones are integrated
+        together, with one evaluation of each stream on a shared grid of
+        Gauss-Kronrod panels.
+
+        Args
+        ----
+            Q : float
+                Total heat flow into the cold stream.
+            h_cold, h_hot : float or dict
+                Film coefficients for each side, either one value or a dict
+                keyed by phase ('subcooled', 'two-phase', 'superheated',
+                'single-phase'), in units consistent with Q and T.
+            panels : int
+                Number of quadrature panels per zone.
+
+        Returns
+        -------
+            area : float
+                Total area.
+            table : array of zoneType
+                One row per zone, from the cold inlet.
+        """
+        pieces = self._split(Q, 'zones', 'single-phase')
+        def coefficient(h, phase, side):
+            if np.isscalar(h):
+                return h
+            if phase not in h:
+                raise ValueError("No {} film coefficient for phase '{}'"
+                                 .format(side, phase))
+            return h[phase]
+        table = np.zeros(len(pieces), dtype=zoneType)
+        if len(pieces) == 0:
+            return 0., table
+        for i, (a, b, k1, k2) in enumerate(pieces):
+            table[i] = (a, b, b - a, 0., 0., 0., np.inf, k1, k2)
+            table['U'][i] = 1. / (1. / coefficient(h_cold, k1, 'cold')
+                                  + 1. / coefficient(h_hot, k2, 'hot'))
+        # Panels within each zone, and GK15 nodes within each panel.
+        u = np.linspace(0, 1, panels + 1)
+        lo = table['q_start'][:,np.newaxis] \
+            + np.outer(table['Q'], u[:-1])
+        hi = table['q_start'][:,np.newaxis] + np.outer(table['Q'], u[1:])
+        center, half = 0.5 * (lo + hi), 0.5 * (hi - lo)
+        x = center[..., np.newaxis] + half[..., np.newaxis] * _nodes15
+        q = np.concatenate([x.ravel(), lo.ravel(), hi.ravel()])
+        deltaT = self.hot.T(q - Q) - self.cold.T(q)
+        dt_nodes = deltaT[:x.size].reshape(x.shape)
+        dt_edges = np.minimum(deltaT[x.size:x.size+lo.size],
+                              deltaT[x.size+lo.size:]).reshape(lo.shape)
+        table['deltaT_min'] = np.minimum(dt_nodes.min(axis=(1, 2)),
+                                         dt_edges.min(axis=1))
+        table['UA'] = (half * (1. / dt_nodes).dot(_wk15)).sum(axis=1)
+        table['UA'][table['deltaT_min'] <= 0] = np.inf
+        table['area'] = table['UA'] / table['U']
+        return table['area'].sum(), table
+
+    def rateZones(self, area, h_cold, h_hot, **kwargs):
+        """Returns the heat flow Q for which calcZones gives the total area.
+        This is the rating problem for the zoned model; the zone boundaries
+        move with Q."""
+        if self.Qmax == np.inf:
+            self.calcQmaxBreakpoints()
+        func = lambda Q: self.calcZones(Q, h_cold, h_hot, **kwargs)[0] - area
+        Q_hi = self.Qmax * (1 - 1e-9)
+        if func(Q_hi) <= 0:
+            return Q_hi
+        return scipy.optimize.brentq(func, 0., Q_hi, xtol=1e-12*self.Qmax)
+
+    def profile(self, Q, **kwargs):
+        """Returns the counterflowPoints temperature profile for heat flow Q.
+        Keyword arguments are passed to counterflowPoints."""
+        return counterflowPoints(self.cold, self.hot, Q, **kwargs)
+
+    def _qBreakpoints(self, Q):
+        """Knots of the tabulated T(q) curves, in the cold stream's cumulative
+        q coordinate, for total heat flow Q, and the segment edges."""
+        result = [np.asarray(getattr(self.cold.T, 'x', []), dtype=float),
+                  np.asarray(getattr(self.hot.T, 'x', []), dtype=float) + Q]
+        if self._hasSegments():
+            result.append([a for a, b, linear in self._pieces(Q)])
+        return np.concatenate(result)
+
+    def tabulateUA(self, tol=1e-4, n=33, epsmin=1e-6, maxpoints=1025):
+        """Precomputes the rating curve UA(Q) for this stream pair.
+
+        UA is integrated at duties from 0 up to (1 - epsmin) * Qmax, placed
+        in s = -log(1 - Q/Qmax), so that the nodes crowd towards the pinch,
+        where UA grows without bound. Monotone (Pchip) interpolants in both
+        directions then answer calcUA and calcQ with method='table' for whole
+        arrays of targets at once.
+
+        Starting from n even nodes in s, UA is computed a third and two
+        thirds into every interval and compared with the interpolated value.
+        Intervals where the relative error exceeds tol are checked again
+        after adding those points, until all pass or the table would exceed
+        maxpoints nodes. The largest error found in the last check is kept
+        as UA_table_error. It is an estimate from sampled points, not a
+        strict bound, and since the tested points join the table, the final
+        table is usually more accurate still.
+
+        The table is rebuilt by calcUA and calcQ when the streams are
+        replaced or Qmax changes. Streams changed in place are not noticed;
+        call tabulateUA again.
+
+        Returns (Q, UA), the tabulated points.
+        """
+        if self.Qmax == np.inf:
+            self.calcQmaxBreakpoints()
+        def integrate(s):
+            Q = self.Qmax * -np.expm1(-s)
+            UA = np.zeros(len(s))
+            for i in np.flatnonzero(Q > 0):
+                func = lambda q, Q=Q[i]: 1./(self.hot.T(q-Q)-self.cold.T(q))
+                UA[i] = quad_vectorized(func, 0, Q[i],
+                    breakpoints=self._qBreakpoints(Q[i]))[0]
+            return UA
+        s = np.linspace(0., -np.log(epsmin), n)
+        UA = integrate(s)
+        self.UA_table_error = np.inf
+        check = np.ones(n - 1, dtype=bool)
+        while check.any() and len(s) + 2 * check.sum() <= maxpoints:
+            good = np.isfinite(UA) & (np.diff(UA, prepend=-1.) > 0)
+            if not good.all():
+                break
+            # Test points a third and two thirds into each interval; the
+            # midpoint alone can hide the interpolation error.
+            a, b = s[:-1][check], s[1:][check]
+            test = np.concatenate([(2 * a + b) / 3, (a + 2 * b) / 3])
+            UA_test = integrate(test)
+            ref = UA[min(np.searchsorted(s, 1.), len(s) - 1)]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                predicted = ref * np.expm1(monotoneCubic(
+                    s, np.log1p(UA / ref))(test))
+                error = np.abs(predicted / UA_test - 1)
+            error = np.where(np.isfinite(UA_test), error, np.inf)
+            self.UA_table_error = error.max()
+            # Split each failed interval into its three parts.
+            k = len(a)
+            failed = (error[:k] > tol) | (error[k:] > tol)
+            order = np.argsort(np.concatenate([s, test]), kind='stable')
+            s = np.concatenate([s, test])[order]
+            UA = np.concatenate([UA, UA_test])[order]
+            check = np.zeros(len(s) - 1, dtype=bool)
+            first = np.searchsorted(s, test[:k])
+            for j in range(3):
+                check[first - 1 + j] = failed
+        Q = self.Qmax * -np.expm1(-s)
+        # Where the streams' q(T) and T(q) interpolants disagree slightly,
+        # the profile may cross just short of the computed Qmax. Keep only
+        # the part of the table where UA is finite and increasing.
+        bad = ~(np.isfinite(UA) & (np.diff(UA, prepend=-1.) > 0))
+        if bad.any():
+            s, Q, UA = s[:bad.argmax()], Q[:bad.argmax()], UA[:bad.argmax()]
+        self.Q_table, self.UA_table = Q, UA
+        self._tableFor = (self.cold, self.hot, self.Qmax)
+        # Interpolate y = log(1 + UA/UA_ref), which is close to linear in s
+        # both for balanced (UA ~ exp(s)) and unbalanced (UA ~ s) streams.
+        self._UA_ref = UA[min(np.searchsorted(s, 1.), len(s) - 1)]
+        y = np.log1p(UA / self._UA_ref)
+        self._y_of_s = monotoneCubic(s, y)
+        self._s_of_y = monotoneCubic(y, s)
+        return Q, UA
+
+    def _currentTable(self):
+        """Builds the UA table unless one exists for the current streams
+        and Qmax. Replaced streams also get a new Qmax."""
+        built = getattr(self, '_tableFor', None)
+        if built is None or built[0] is not self.cold \
+                or built[1] is not self.hot:
+            if built is not None:
+                self.calcQmaxBreakpoints()
+            self.tabulateUA()
+        elif built[2] != self.Qmax:
+            self.tabulateUA()
+
     def calcDistanceT(self, Q):
         """Returns DeltaT, the least temperature difference between hot and cold streams,
         given the actual heat flow between them. This serves as like metric for
@@ -326,17 +1099,142 @@ class counterflow_integrator(object):
         #delta_t_error = lambda q: delta_t_feasible(q) - delta_t_raw(q)
         delta_t_error = lambda q: max(delta_t_min - delta_t_raw(q), 0)
         f = lambda q:  1 / delta_t_feasible(q)
-        UA = scipy.integrate.quad(f, 0, q_total)[0]
-        error = scipy.integrate.quad(delta_t_error, 0, q_total)[0]
+        if not self._hasSegments():
+            UA = scipy.integrate.quad(f, 0, q_total)[0]
+            error = scipy.integrate.quad(delta_t_error, 0, q_total)[0]
+            return (UA, error)
+        # Use the closed form where both streams are linear or isothermal.
+        UA, error = 0., 0.
+        for a, b, linear in self._pieces(q_total):
+            if linear:
+                ua, err = _linearUA(b - a, delta_t_raw(a), delta_t_raw(b),
+                                    delta_t_min)
+            else:
+                ua = scipy.integrate.quad(f, a, b)[0]
+                err = scipy.integrate.quad(delta_t_error, a, b)[0]
+            UA += ua
+            error += err
         return (UA, error)
 
+    def calcUA3Segments(self, q_total, delta_t_min, segments=10, panels=4,
+                        epsrel=1e-7, limit=50, maxpanels=4096):
+        """Like calcUA3, but in one pass, and with a breakdown by segment.
+
+        The duty is split into equal segments, and each segment into panels,
+        with extra panel edges at the knots of tabulated streams. Both stream
+        temperatures are evaluated together at the 15 Gauss-Kronrod nodes of
+        all panels, and the UA and error integrals are taken from the same
+        values. As in quad_vectorized, panels whose error estimate
+        |K15 - G7| for either integral exceeds their share of the tolerance
+        are bisected. A panel where the temperature difference crosses
+        delta_t_min, where the feasible profile has a kink, is instead split
+        at the crossing. The least temperature difference is taken from the
+        same values, refined in the panel where it is least.
+
+        Inputs:
+            q_total: the heat flow [kW]
+            delta_t_min: the minimum temperature difference in the artificial, feasible profile [K]
+            segments: number of equal duty segments to report
+            panels: number of quadrature panels per segment to start with
+            epsrel: relative error goal for both integrals; the error
+                integral is measured against q_total * delta_t_min
+            limit: maximum number of refinement rounds
+            maxpanels: refinement also stops when the number of panels that
+                still need refinement would exceed this
+        Outputs:
+            UA: The overall heat transfer coefficient - area product [kW/K]
+            error: The error integral
+            table: Array of segmentType, one row per segment
+        """
+        seg_edges = np.linspace(0, q_total, segments + 1)
+        table = np.zeros(segments, dtype=segmentType)
+        table['q_start'], table['q_end'] = seg_edges[:-1], seg_edges[1:]
+        table['Q'] = np.diff(seg_edges)
+        if q_total == 0:
+            table['deltaT_min'] = self.hot.T(0) - self.cold.T(0)
+            return 0., 0., table
+        delta_t_raw = lambda q: self.hot.T(q - q_total) - self.cold.T(q)
+        edges = np.linspace(0, q_total, segments * panels + 1)
+        inner = [p for p in self._qBreakpoints(q_total)
+                 if min(0, q_total) < p < max(0, q_total)]
+        edges = np.unique(np.concatenate([edges, inner]))
+        if q_total < 0:
+            edges = edges[::-1]
+        lo, hi = edges[:-1], edges[1:]
+        # Accepted panels, by center, with their integrals and least
+        # sampled temperature difference.
+        done = [], [], [], [], []
+        error_scale = abs(q_total) * delta_t_min
+        for it in range(limit):
+            center, half = 0.5 * (lo + hi), 0.5 * (hi - lo)
+            x = center[:,np.newaxis] + half[:,np.newaxis] * _nodes15
+            q = np.concatenate([x.ravel(), lo, hi])
+            values = delta_t_raw(q)
+            dt = values[:x.size].reshape(x.shape)
+            dt_edges = np.minimum(values[x.size:x.size + len(lo)],
+                                  values[x.size + len(lo):])
+            f = 1 / np.maximum(dt, delta_t_min)
+            g = np.maximum(delta_t_min - dt, 0)
+            ua, err = half * f.dot(_wk15), half * g.dot(_wk15)
+            ua_error = np.abs(ua - half * f.dot(_wg15))
+            err_error = np.abs(err - half * g.dot(_wg15))
+            total = sum(done[1]) + ua.sum()
+            share = epsrel * np.abs(hi - lo) / abs(q_total)
+            good = (ua_error <= share * abs(total)) \
+                & (err_error <= share * error_scale)
+            # Nodes on both sides of delta_t_min: split at the crossing.
+            above = dt > delta_t_min
+            crossing = (above[:,1:] != above[:,:-1]).any(axis=1)
+            good &= ~crossing
+            last = it == limit - 1 or 2 * (~good).sum() > maxpanels
+            if last:
+                good[:] = True
+            for d, v in zip(done, (center, ua, err,
+                                   np.minimum(dt.min(axis=1), dt_edges),
+                                   np.abs(hi - lo))):
+                d.extend(v[good])
+            if last or good.all():
+                break
+            split = center.copy()
+            for i in np.flatnonzero(crossing & ~good):
+                j = np.flatnonzero(above[i,1:] != above[i,:-1])[0]
+                split[i] = scipy.optimize.brentq(
+                    lambda q: delta_t_raw(q) - delta_t_min,
+                    x[i,j], x[i,j+1], xtol=1e-14 * abs(q_total))
+            lo, hi, split = lo[~good], hi[~good], split[~good]
+            lo, hi = np.concatenate([lo, split]), np.concatenate([split, hi])
+        center, ua, err, dt_panel, width = map(np.array, done)
+        # Assign each panel to the segment that contains its center.
+        k = np.clip(np.searchsorted(seg_edges if q_total > 0
+                                    else seg_edges[::-1], center) - 1,
+                    0, segments - 1)
+        if q_total < 0:
+            k = segments - 1 - k
+        table['UA'] = np.bincount(k, ua, segments)
+        table['error'] = np.bincount(k, err, segments)
+        # Refine the least temperature difference within the panel where the
+        # sampled one is least.
+        i = np.argmin(dt_panel)
+        bounds = sorted((center[i] - width[i] / 2, center[i] + width[i] / 2))
+        opt = scipy.optimize.minimize_scalar(delta_t_raw, bounds=bounds,
+                                             method='bounded')
+        dt_panel[i] = min(dt_panel[i], opt.fun)
+        table['deltaT_min'] = np.inf
+        np.minimum.at(table['deltaT_min'], k, dt_panel)
+        return table['UA'].sum(), table['error'].sum(), table
+
         
 def UA_by_LMTD(Q, Tc_in, Tc_out, Th_in, Th_out):
     """Implements the LMTD equation to compute UA value for a counterflow HX."""
     Cf = 1
     dt_cold_end = Th_out - Tc_in
     dt_hot_end = Th_in - Tc_out
-    LMTD = Cf * (dt_hot_end - dt_cold_end) / np.log(dt_hot_end / dt_cold_end)
+    if dt_hot_end == dt_cold_end:
+        # Limit of the log mean for equal terminal differences.
+        LMTD = Cf * dt_hot_end
+    else:
+        LMTD = Cf * (dt_hot_end - dt_cold_end) \
+            / np.log(dt_hot_end / dt_cold_end)
     UA = Q / LMTD
     return UA
     
@@ -344,111 +1242,372 @@ def UA_quad(Q,Tc_points,Th_points):
     """Implements the LMTD equation to compute UA value for a counterflow HX."""
     pass
 
+# Rows of counterflowPoints.toArray().
+profileType = np.dtype(dict(names="q T_cold T_hot deltaT dUA UA".split(),
+                            formats=['d']*6))
+
 class counterflowPoints(object):
-    """Represents a heat exchanger between two predefined counterflowing
-    streams, each described by a monotonic list of (q,T) points with q
-    monotonically increasing.
-    
-    Be sure to choose consistent units for both heat and temperature points.
-    
+    """Temperature profile of a counterflow heat exchanger between two
+    streams, at a given total heat flow Q. Holds aligned arrays, from the
+    cold inlet (q = 0) to the cold outlet (q = Q):
+
+    * q : cumulative heat into the cold stream
+    * T_cold, T_hot : local stream temperatures
+    * deltaT : T_hot - T_cold
+    * dUA : UA of the interval ending at each point (dUA[0] = 0)
+    * UA : cumulative UA, so that UA[-1] is the total
+
+    Points are placed adaptively. Starting from n equal intervals plus the
+    knots of tabulated streams, intervals are bisected until trapezoidal
+    and Simpson estimates of their UA agree to within their share of tol,
+    so points crowd where the profile bends or pinches.
+
     For example::
-        
-        cold = streamPoints([(0,100), (1,101), (2,103)])
-        hot = streamPoints([(-2,107), (-1,109), (0,110)])
-        cfhx = counterflowPoints(self,cold,hot)
-    
+
+        cold = streamExample1(0)
+        hot = streamExample1(1,1)
+        p = counterflowPoints(cold,hot,0.5)
+        p.UA[-1], p.deltaT.min()
+
     Sign convention:
-    
+
     * q > 0: heat is transferred into stream (cold stream is heating up)
     * q < 0: heat is transferred out of stream (hot stream is cooling down)
     """
-    def __init__(self, cold, hot, useHotT=False, initQmax=False):
+    def __init__(self, cold, hot, Q, tol=1e-4, n=17, maxpoints=2000):
         self.cold = cold
         self.hot = hot
-        self.useHotT = useHotT
-        # Functions for Qmax
-        self.func1 = lambda Q: Q+self.cold.q(self.hot.T(-Q))
-        self.func2 = lambda Q: Q-self.hot.q(self.cold.T(Q))
-        
-        if initQmax:
-            self.calcQmax()
-        else:
-            self.Qmax = np.inf
-            
-    def calcUA(self,Q):
-        # Q > is total heat transferred into cold stream, and q is local cum.
-        # 
-        self.cold
-        ua = scipy.integrate.quad(func,0,Q)[0]
-        epsilon = Q / self.Qmax
-        if epsilon > 1:
-            raise ValueError("Q given [{}] is higher than Q maximum [{}];"\
-            " effectiveness [{}] > 1.".format(Q,self.Qmax,epsilon))
-        if eff:            
-            return ua, epsilon
-        else:
-            return ua
-            
-    def calcQ(self,UA):
-        func = lambda Q:(self.calcUA(Q)-UA)**2
-        constraints = [{"type":"ineq",
-                       "fun":lambda Q: Q},
-                        {"type":"ineq",
-                       "fun":lambda Q: self.Qmax-Q}]
-        return scipy.optimize.minimize(func,0,constraints=constraints).x[0]
-    def calcQmax(self,extra=False,brute=False):
-        # Preliminary Max Q based on inlet temperatures only
-        qc = min(self.func1(0),self.func2(0))
-        #print("qc = ",qc)
-        lim = lambda Q: qc-Q
-        constraints = [{"type":"ineq",
-                       "fun":lambda Q: Q,
-                       "jac":lambda Q: 1},
-                       {"type":"ineq",
-                        "fun":lim,
-                        "jac":lambda Q: -1}]
-        if brute:
-            opt1 = scipy.optimize.differential_evolution(self.func1,[(0,qc)])
-            opt2 = scipy.optimize.differential_evolution(self.func2,[(0,qc)])
-            #print(opt1)
-            #print(opt2)
+        self.Q = Q
+        deltaT = lambda q: hot.T(q-Q) - cold.T(q)
+        q = np.linspace(0, Q, n)
+        bp = np.concatenate([np.asarray(getattr(cold.T, 'x', []), dtype=float),
+                             np.asarray(getattr(hot.T, 'x', []), dtype=float)
+                             + Q])
+        q = np.unique(np.concatenate([q, bp[(bp > min(0, Q))
+                                            & (bp < max(0, Q))]]))
+        if Q < 0:
+            q = q[::-1]
+        f = 1. / deltaT(q)
+        while len(q) < maxpoints:
+            h = np.diff(q)
+            qm = q[:-1] + 0.5 * h
+            fm = 1. / deltaT(qm)
+            trap = 0.5 * h * (f[:-1] + f[1:])
+            simpson = h / 6. * (f[:-1] + 4 * fm + f[1:])
+            share = tol * abs(simpson.sum()) * np.abs(h / Q)
+            split = np.abs(simpson - trap) > share
+            split &= np.cumsum(split) <= maxpoints - len(q)
+            if not split.any():
+                break
+            order = np.argsort(np.concatenate([q, qm[split]]), kind='stable')
+            if Q < 0:
+                order = order[::-1]
+            q = np.concatenate([q, qm[split]])[order]
+            f = np.concatenate([f, fm[split]])[order]
+        self.q = q
+        self.T_cold = cold.T(q)
+        self.T_hot = hot.T(q - Q)
+        self.deltaT = self.T_hot - self.T_cold
+        self.dUA = np.concatenate([[0.], 0.5 * np.diff(q) * (f[:-1] + f[1:])])
+        self.UA = np.cumsum(self.dUA)
+
+    def toArray(self):
+        """Returns the profile as a record array of profileType."""
+        result = np.zeros(len(self.q), dtype=profileType)
+        for name in profileType.names:
+            result[name] = getattr(self, name)
+        return result
+
+    def plot(self, ax=None):
+        """Plots both temperatures against q, on ax or a new figure."""
+        import matplotlib.pyplot as plt
+        if ax is None:
+            ax = plt.figure().gca()
+        ax.plot(self.q, self.T_cold, 'b.-', label="cold")
+        ax.plot(self.q, self.T_hot, 'r.-', label="hot")
+        ax.set_xlabel("q")
+        ax.set_ylabel("T")
+        ax.grid(True)
+        return ax
+
+    def __repr__(self):
+        return "counterflowPoints(Q={}, UA={}, deltaT_min={}, points={})"\
+            .format(self.Q, self.UA[-1], self.deltaT.min(), len(self.q))
+
+# Per-pair results of counterflowBatch.evaluate.
+batchType = np.dtype(dict(names="Q Qmax epsilon UA error deltaT_pinch q_pinch"
+                          .split(), formats=['d']*7))
+
+def _streamColumns(streams, method, X):
+    """Evaluates stream.method on X, an array of points (rows) by pairs
+    (columns). streams is a list with one stream per column, or a single
+    stream whose parameters are arrays with one entry per column."""
+    if isinstance(streams, (list, tuple)):
+        return np.stack([np.asarray(getattr(s, method)(X[:, i]), dtype=float)
+                         for i, s in enumerate(streams)], axis=1)
+    return np.broadcast_to(np.asarray(getattr(streams, method)(X),
+                                      dtype=float), X.shape)
+
+def _knotRows(streams, N, func):
+    """Collects knots func(stream) of each column into an array of shape
+    (knots, N), padded with nan. Infinite knots are dropped."""
+    if isinstance(streams, (list, tuple)):
+        columns = [np.asarray(func(s), dtype=float).ravel() for s in streams]
+    else:
+        rows = [np.broadcast_to(np.asarray(k, dtype=float), (N,))
+                for k in func(streams)]
+        columns = list(np.array(rows).reshape(-1, N).T)
+    k = max([len(c) for c in columns] + [0])
+    result = np.full((k, N), np.nan)
+    for i, c in enumerate(columns):
+        result[:len(c), i] = np.where(np.isfinite(c), c, np.nan)
+    return result
+
+def _scanColumns(func, lo, hi, knots, n=65, rounds=6):
+    """Minimizes func over [lo, hi] in every column at once, like
+    _scanMinimum. func maps an array of points by columns to values. Each
+    column is scanned on a uniform grid merged with points just either side
+    of its knots, then the bracket around the best point is rescanned with
+    n points, rounds times. As in _scanMinimum, the knots themselves are
+    left out; a point that lands on one is moved just below it.
+    Returns (x, func(x))."""
+    u = np.linspace(0., 1., n)[:, np.newaxis]
+    span = hi - lo
+    delta = 1e-9 * span
+    knots = np.where((knots > lo) & (knots < hi), knots, np.nan)
+    X = np.sort(np.concatenate([lo + span * u, knots - delta,
+                                knots + delta]), axis=0)
+    columns = np.arange(X.shape[1])
+    best_x, best_y = lo.copy(), np.full(X.shape[1], np.inf)
+    for r in range(rounds + 1):
+        onKnot = (X[:, np.newaxis, :] == knots[np.newaxis]).any(axis=1)
+        X = np.where(onKnot, X - delta, X)
+        with np.errstate(invalid='ignore'):
+            Y = np.where(np.isnan(X), np.nan, func(np.where(np.isnan(X),
+                                                            lo, X)))
+        i = np.nanargmin(np.where(np.isnan(Y), np.inf, Y), axis=0)
+        y = Y[i, columns]
+        better = y < best_y
+        best_x = np.where(better, X[i, columns], best_x)
+        best_y = np.where(better, y, best_y)
+        if r == rounds:
+            break
+        last = (~np.isnan(X)).sum(axis=0) - 1
+        a = X[np.maximum(i - 1, 0), columns]
+        b = X[np.minimum(i + 1, last), columns]
+        X = a + (b - a) * u
+    return best_x, best_y
+
+class counterflowBatch(object):
+    """Many counterflow heat exchangers, evaluated together.
+
+    Where counterflow_integrator handles one (cold, hot) pair with scalar
+    solvers, this computes Qmax, the pinch, and UA for all pairs in one
+    vectorized pass: every stream curve is evaluated on a whole array of
+    points (rows) for all pairs (columns) at once. Suited to parameter
+    sweeps and population optimizers.
+
+    Inputs
+    ======
+    cold, hot : list of streams, or stream
+        Either lists of equal length, one stream per pair, whose T and q
+        accept arrays; or single streams with a common parametrization,
+        whose parameters are arrays with one entry per pair, such as
+        streamExample1(T_inlet=array, mdot=array).
+    n : int
+        Points per scan of the pinch searches (see _scanColumns).
+
+    For example::
+
+        cold = streamExample1(np.linspace(0, 0.5, 100))
+        hot = streamExample1(1, np.linspace(0.5, 2, 100))
+        batch = counterflowBatch(cold, hot)
+        result = batch.evaluate(0.5 * batch.calcQmax())
+        result['UA'], result['deltaT_pinch']
+
+    Unlike counterflow_integrator, infeasible pairs are not errors: where
+    Q exceeds Qmax, or the profile crosses, UA is inf.
+    """
+    def __init__(self, cold, hot, n=65):
+        self.cold = cold
+        self.hot = hot
+        self.n = n
+        if isinstance(cold, (list, tuple)):
+            if len(cold) != len(hot):
+                raise ValueError("Got {} cold and {} hot streams".format(
+                    len(cold), len(hot)))
+            self.N = len(cold)
         else:
-            opt1 = scipy.optimize.minimize(self.func1,0,constraints=constraints)
-            opt2 = scipy.optimize.minimize(self.func2,0,constraints=constraints)
-            #print(opt1)
-            #print(opt2)
-        self.Qmax = min(np.asscalar(opt1.fun),np.asscalar(opt2.fun))
-        #self.Qmax = np.asscalar(opt.x)
+            self.N = np.broadcast(np.asarray(cold.T(0.)),
+                                  np.asarray(hot.T(0.))).size
+        self.Qmax = np.full(self.N, np.inf)
+
+    @classmethod
+    def fromIntegrators(cls, hxs, **kwargs):
+        """Builds a batch from a list of counterflow_integrators."""
+        return cls([hx.cold for hx in hxs], [hx.hot for hx in hxs], **kwargs)
+
+    def __len__(self):
+        return self.N
+
+    def _T(self, streams, X):
+        return _streamColumns(streams, 'T', X)
+
+    def _q(self, streams, X):
+        return _streamColumns(streams, 'q', X)
+
+    def _inlets(self):
+        zero = np.zeros((1, self.N))
+        return self._T(self.cold, zero)[0], self._T(self.hot, zero)[0]
+
+    def calcQmax(self, extra=False):
+        """Computes Qmax for every pair, as calcQmaxBreakpoints does: the
+        least D(T) = cold.q(T) - hot.q(T) between the inlet temperatures.
+
+        Returns Qmax, or if extra, (Qmax, T_pinch, q_pinch), as arrays."""
+        T_lo, T_hi = self._inlets()
+        T_hi = np.maximum(T_hi, T_lo)
+        knots = np.concatenate([_knotRows(self.cold, self.N, streamBreakpoints),
+                                _knotRows(self.hot, self.N, streamBreakpoints)])
+        D = lambda T: self._q(self.cold, T) - self._q(self.hot, T)
+        T_pinch, Qmax = _scanColumns(D, T_lo, T_hi, knots, self.n)
+        self.Qmax = np.maximum(Qmax, 0.)
+        self.T_pinch = T_pinch
+        self.q_pinch = self._q(self.cold, T_pinch[np.newaxis])[0]
         if extra:
-            return opt1
+            return self.Qmax, self.T_pinch, self.q_pinch
         else:
             return self.Qmax
-            
-    def calcDistanceT(self, Q):
-        """Returns DeltaT, the least temperature difference between hot and cold streams,
-        given the actual heat flow between them. This serves as like metric for
-        separation.
-        
-        DeltaT = inf(T_hot - T_cold)
-        
-        DeltaT > 0: Normal conditions
-        DeltaT = 0: Pinch point is touching
-        DeltaT < 0: The given Q has exceeded Qmax
+
+    def _qKnots(self, Q):
+        """Like counterflow_integrator._qBreakpoints, as rows of knots in
+        the cold stream's cumulative q, for heat flows Q."""
+        def knots(s):
+            return getattr(s.T, 'x', [])
+        def edges(s):
+            return s.segments()[0] if hasattr(s, 'segments') else []
+        return np.concatenate([_knotRows(self.cold, self.N, knots),
+                               _knotRows(self.hot, self.N, knots) + Q,
+                               _knotRows(self.cold, self.N, edges),
+                               _knotRows(self.hot, self.N, edges) + Q])
+
+    def _deltaT(self, X, Q):
+        return self._T(self.hot, X - Q) - self._T(self.cold, X)
+
+    def calcPinch(self, Q):
+        """Returns arrays (q_pinch, DeltaT_pinch) for heat flows Q, as
+        counterflow_integrator.calcPinch does for one pair."""
+        Q = np.broadcast_to(np.asarray(Q, dtype=float), (self.N,))
+        lo, hi = np.minimum(Q, 0.), np.maximum(Q, 0.)
+        return _scanColumns(lambda X: self._deltaT(X, Q), lo, hi,
+                            self._qKnots(Q), self.n)
+
+    def calcUA(self, Q, eff=False, panels=16, levels=24, extra=False):
+        """Returns UA for heat flows Q >= 0 (and effectiveness, if eff),
+        with inf where a pair is infeasible.
+
+        The UA integral is evaluated with Gauss-Kronrod (7-15) panels laid
+        out per pair: panels even ones, the stream knots, and levels more
+        on either side of the pinch, graded geometrically, so that the peak
+        of 1/DeltaT is resolved without adaptive refinement. If extra,
+        returns (UA, error estimate, q_pinch, DeltaT_pinch) instead.
         """
-        f = lambda q: self.hot.T(q-Q)-self.cold.T(q)
-        opt=scipy.optimize.minimize_scalar(f,bounds=(0,Q),method="bounded")
-        #print(opt)
-        return opt.fun
-    
-    def calcUA2(self,Q):
-        DeltaT = self.calcDistanceT(Q)
-        epsilon = Q / self.Qmax
-        if DeltaT <= 0:
-            UA = np.inf            
-        else:
-            func = lambda q: 1./(self.hot.T(q-Q)-self.cold.T(q))
-            UA = scipy.integrate.quad(func,0,Q)[0]
-        return DeltaT,epsilon,UA
+        Q = np.broadcast_to(np.asarray(Q, dtype=float), (self.N,))
+        lo, hi = np.minimum(Q, 0.), np.maximum(Q, 0.)
+        q_pinch, DeltaT = self.calcPinch(Q)
+        span = hi - lo
+        u = np.linspace(0., 1., panels + 1)[:, np.newaxis]
+        grading = np.logspace(0., -12., levels)[:, np.newaxis] * span
+        edges = np.concatenate([lo + span * u, self._qKnots(Q),
+                                q_pinch - grading, q_pinch + grading])
+        edges = np.clip(np.where(np.isnan(edges), hi, edges), lo, hi)
+        edges = np.sort(edges, axis=0)
+        a, b = edges[:-1], edges[1:]
+        center, half = 0.5 * (a + b), 0.5 * (b - a)
+        X = center[:, :, np.newaxis] + half[:, :, np.newaxis] * _nodes15
+        shape = X.shape
+        X = X.transpose(0, 2, 1).reshape(-1, self.N)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = 1. / self._deltaT(X, Q)
+            f = f.reshape(shape[0], shape[2], self.N).transpose(0, 2, 1)
+            kronrod = (half * f.dot(_wk15)).sum(axis=0)
+            gauss = (half * f.dot(_wg15)).sum(axis=0)
+        # Where the profile touches exactly at a knot, the scan may see a
+        # tiny positive DeltaT and the integral then meets 1/0 at a node.
+        infeasible = ~(DeltaT > 0) | (Q > self.Qmax) | np.isnan(kronrod)
+        UA = np.where(infeasible, np.inf, kronrod)
+        error = np.where(infeasible, np.inf, np.abs(kronrod - gauss))
+        if extra:
+            return UA, error, q_pinch, DeltaT
+        if eff:
+            return UA, Q / self.Qmax
+        return UA
+
+    def calcQ(self, UA, n=8, iterations=40, epsmin=1e-12, tol=1e-12):
+        """Returns the heat flows Q for given UA, for all pairs at once.
+
+        UA(Q) increases from 0 to inf as Q goes from 0 to Qmax. As in
+        tabulateUA, g(s) = log(1 + UA(s)/UA) - log(2) is close to linear in
+        s = -log(1 - Q/Qmax), so each pair is bracketed on n values of s
+        from 0 to -log(epsmin), then solved by regula falsi (Illinois),
+        with one vectorized calcUA per step. UA that is inf gives Qmax, and
+        UA that is not positive (or nan) gives 0."""
+        if np.isinf(self.Qmax).any():
+            self.calcQmax()
+        UA = np.broadcast_to(np.asarray(UA, dtype=float), (self.N,))
+        solve = (UA > 0) & np.isfinite(UA)
+        target = np.where(solve, UA, 1.)
+        Q_of_s = lambda s: self.Qmax * -np.expm1(-s)
+        def g(s):
+            with np.errstate(invalid='ignore'):
+                return np.where(solve, np.log1p(self.calcUA(Q_of_s(s))
+                                                / target) - np.log(2.), 0.)
+        s = np.linspace(0., -np.log(epsmin), n)
+        table = np.array([g(np.full(self.N, sk)) for sk in s])
+        columns = np.arange(self.N)
+        j = np.clip((table < 0).sum(axis=0) - 1, 0, n - 2)
+        s_lo, s_hi = s[j], s[j + 1]
+        g_lo, g_hi = table[j, columns], table[j + 1, columns]
+        # Targets beyond the last node stay there.
+        x = np.where(g_hi < 0, s_hi, s_lo)
+        active = solve & (g_lo < 0) & (g_hi > 0)
+        side = np.zeros(self.N)
+        for i in range(iterations):
+            if not active.any():
+                break
+            with np.errstate(invalid='ignore', divide='ignore'):
+                x_new = s_lo - g_lo * (s_hi - s_lo) / (g_hi - g_lo)
+            bisect = ~(np.isfinite(x_new) & (x_new > s_lo) & (x_new < s_hi))
+            x_new = np.where(bisect, 0.5 * (s_lo + s_hi), x_new)
+            x = np.where(active, x_new, x)
+            gx = g(x)
+            new_hi = active & (gx > 0)
+            new_lo = active & ~(gx > 0)
+            g_lo = np.where(new_hi & (side > 0), 0.5 * g_lo, g_lo)
+            g_hi = np.where(new_lo & (side < 0), 0.5 * g_hi, g_hi)
+            s_hi, g_hi = np.where(new_hi, x, s_hi), np.where(new_hi, gx, g_hi)
+            s_lo, g_lo = np.where(new_lo, x, s_lo), np.where(new_lo, gx, g_lo)
+            side = np.where(new_hi, 1., np.where(new_lo, -1., side))
+            active &= (np.abs(gx) > tol) & (s_hi - s_lo > tol * s_hi)
+        Q = np.where(solve, Q_of_s(x), 0.)
+        return np.where(np.isposinf(UA), self.Qmax, Q)
+
+    def evaluate(self, Q):
+        """Returns a record array of batchType with Q, Qmax, epsilon, UA,
+        its error estimate, and the pinch, for heat flows Q."""
+        if np.isinf(self.Qmax).any():
+            self.calcQmax()
+        result = np.zeros(self.N, dtype=batchType)
+        result['Q'] = Q
+        result['Qmax'] = self.Qmax
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['epsilon'] = result['Q'] / self.Qmax
+        result['UA'], result['error'], result['q_pinch'], \
+            result['deltaT_pinch'] = self.calcUA(result['Q'], extra=True)
+        return result
+
+    def __repr__(self):
+        return "counterflowBatch with {} pairs".format(self.N)
 
 def plotFlow(ci,figure=None,Qactual=None):
     import matplotlib.pyplot as plt
@@ -523,6 +1682,9 @@ if __name__ == "__main__":
         # However, a global optimization finds the correct basin.
         ci3.calcQmax(extra=False,brute=True)
         print(ci3.Qmax)
+        # Scanning the breakpoints gives the exact answer, and the pinch:
+        # both streams change phase at 100, so Qmax is 20.
+        print(ci3.calcQmax(extra=True,method='breakpoints'))
         
         plotFlow(ci3)
         plotNN(ci3)
@@ -4,11 +4,131 @@ HRHX_models.py
 2016-02-29 by Nicholas Fette and Andrew Hickey
 Models for the heat recovery heat exchanger.
 """
+import numpy as np
 from CoolProp.CoolProp import PropsSI
 from scipy.optimize import fsolve
 from scipy.integrate import quad
 import scipy.optimize as op
 
+from HRHX_integral_model import monotoneCubic, counterflowBatch, _quantize
+
+# Common heat transfer fluids: CoolProp name and default table range [C].
+# Glycols are 30% by mass; the oil is Therminol 66.
+htfFluids = {'air': ('Air', -50., 1000.),
+             'water': ('Water', 0.01, 370.),
+             'glycol': ('INCOMP::MEG[0.3]', -10., 100.),
+             'propylene glycol': ('INCOMP::MPG[0.3]', -10., 100.),
+             'oil': ('INCOMP::T66', 0., 380.)}
+
+def _finiteLimit(name, P, lo, hi, iterations=40):
+    """Returns the highest temperature [C] up to hi at which PropsSI gives
+    an enthalpy for name at pressure P. Incompressible fluids give inf, or
+    raise, where they would boil."""
+    def finite(T):
+        try:
+            return np.isfinite(PropsSI('H', 'T', T + 273.15, 'P', P, name))
+        except ValueError:
+            return False
+    if finite(hi) or not finite(lo):
+        return hi
+    for i in range(iterations):
+        mid = 0.5 * (lo + hi)
+        lo, hi = (mid, hi) if finite(mid) else (lo, mid)
+    return lo
+
+class HTFLookup(object):
+    """Tabulated enthalpy of a single phase heat transfer fluid.
+
+    Builds monotone cubic tables of h(T) and T(h) at a fixed pressure, once,
+    so the models can look up enthalpy and invert it for whole arrays
+    without calling PropsSI or a root finder. Use getHTFLookup() to share
+    tables between models.
+
+    Usage
+    -----
+    htf = getHTFLookup('water', 101325.)
+    h = htf.h([50., 60.])       # [J/kg]
+    T = htf.T(h)                # [C]
+    cp = htf.lookup('C', 55.)   # [J/kg-K]
+
+    Args:
+        fluid (str): a key of htfFluids, or any CoolProp fluid name.
+        P (float): pressure in [Pa].
+        T_min, T_max (float): table range in [C]. Defaults to the range in
+            htfFluids, or the fluid's own limits. For water, T_max is held
+            just below saturation, and for incompressible fluids, below the
+            temperature where CoolProp reports boiling at P.
+        n (int): number of table points.
+
+    Lookups outside the table range return nan, rather than extrapolate.
+    """
+    def __init__(self, fluid='water', P=101325., T_min=None, T_max=None,
+                 n=200):
+        name, lo, hi = htfFluids.get(fluid.lower(), (fluid, None, None))
+        if lo is None:
+            lo = PropsSI('Tmin', name) - 273.15
+            hi = PropsSI('Tmax', name) - 273.15
+        if name == 'Water' and P < PropsSI('pcrit', name):
+            T_sat = PropsSI('T', 'P', P, 'Q', 0, name) - 273.15
+            hi = min(hi, T_sat - 0.01)
+        if name.startswith('INCOMP::') and T_max is None:
+            hi = _finiteLimit(name, P, lo if T_min is None else T_min, hi)
+        self.fluid = fluid
+        self.name = name
+        self.P = P
+        self.T_min = lo if T_min is None else T_min
+        self.T_max = hi if T_max is None else T_max
+        if not self.T_min < self.T_max:
+            raise ValueError("Empty table range for {} at P = {}: [{}, {}]"
+                             .format(fluid, P, self.T_min, self.T_max))
+        TT = np.linspace(self.T_min, self.T_max, n)
+        hh = PropsSI('H', 'T', TT + 273.15, 'P', P, name)
+        if not np.isfinite(hh).all():
+            raise ValueError("No enthalpy for {} at P = {} above {} C"
+                             .format(fluid, P, TT[np.isfinite(hh)].max(
+                                 initial=np.nan)))
+        self._h = monotoneCubic(TT, hh, extrapolate=False)
+        self._T = monotoneCubic(hh, TT, extrapolate=False)
+
+    def h(self, T):
+        """Specific enthalpy [J/kg] at temperature T [C]."""
+        return self._h(T)
+
+    def T(self, h):
+        """Temperature [C] at specific enthalpy h [J/kg]."""
+        return self._T(h)
+
+    def C(self, T):
+        """Specific heat [J/kg-K] at temperature T [C]."""
+        return self._h(T, 1)
+
+    def lookup(self, name, T):
+        """Property by CoolProp key, 'H' or 'C', at temperature T [C]."""
+        if name == 'H':
+            return self.h(T)
+        elif name == 'C':
+            return self.C(T)
+        raise ValueError("HTFLookup has no property {}".format(name))
+
+    def __repr__(self):
+        return "HTFLookup({}, P = {}, T from {} to {} C)".format(
+            self.fluid, self.P, self.T_min, self.T_max)
+
+def _requireTable(table, value, where):
+    """Raises ValueError if value, looked up in table, has any nan, as the
+    tables give outside their range. where describes the lookup."""
+    if np.isnan(value).any():
+        raise ValueError("{} is outside the range of {}".format(where, table))
+
+_htfTables = {}
+
+def getHTFLookup(fluid='water', P=101325., T_min=None, T_max=None):
+    """Returns a cached HTFLookup for fluid at pressure P."""
+    key = (fluid.lower(),) + _quantize(P) + (T_min, T_max)
+    if key not in _htfTables:
+        _htfTables[key] = HTFLookup(fluid, P, T_min, T_max)
+    return _htfTables[key]
+
 class HRHX_model1():
     """An effectiveness model. Assumes and requires that exhaust stream capacity
     (C = mdot * C_p) is less than that of the HTF stream.
@@ -19,9 +139,13 @@ class HRHX_model1():
     -----
     e,T,P,m = 0.96, 270., 100, 0.80
     HRHX = HRHX_model(e,T,P,m)
-    T_in, m_in, htf = 50, 2, HTFLookup(filename)
+    T_in, m_in, htf = 50, 2, getHTFLookup('water', 10e5)
     Q, T_HTF_outlet, T_exhaust_outlet, DeltaP_HTF, DeltaP_exhaust \\
         = HRHX(T_in, m_in, htf)
+
+    The HTF heat capacity is taken at the mean of the two inlet
+    temperatures, so the table must reach that far: here, pressurized water
+    stays liquid to 180 C. Raises ValueError where the tables give nan.
     """
     def __init__(self, effectiveness, T_exhaust_inlet, P_exhaust_inlet, m_exhaust):
         """Get things going."""
@@ -41,6 +165,7 @@ class HRHX_model1():
                                      'Air')
         C_exhaust = C_p_exhaust * self.m_exhaust  # [J/K]
         C_HTF = htf.lookup('C',T_mean) * m_in
+        _requireTable(htf, C_HTF, "T_mean = {} C".format(T_mean))
 
         # This should be true
         C_min, C_max = C_exhaust, C_HTF
@@ -71,7 +196,7 @@ class HRHX_model2():
     -----
     e,T,P,m = 0.96, 270., 100, 0.80
     HRHX = HRHX_model(e,T,P,m)
-    T_in, m_in, htf = 50, 2, HTFLookup(filename)
+    T_in, m_in, htf = 50, 2, getHTFLookup('water', 10e5)
     Q, T_HTF_outlet, T_exhaust_outlet, DeltaP_HTF, DeltaP_exhaust \\
       = HRHX(T_in, m_in, htf)
         
@@ -94,6 +219,10 @@ class HRHX_model2():
             T_HTF_inlet(float)
             m_in(float)
             htf(HTFLookup)
+
+        T_HTF_inlet and m_in may also be arrays. Raises ValueError if any
+        temperature falls outside the HTF or exhaust tables, eg. where the
+        HTF would boil; see calcQArray for flags per point instead.
         
         Returns:
             Q
@@ -104,32 +233,27 @@ class HRHX_model2():
             
         """
         T_min, T_max = T_HTF_inlet, self.T_exhaust_inlet
-        # Function maps inputs ( T [K], P [Pa] ) to outputs (H [J/kg])
-        # We apply it:  inputs ( T [C], P [Pa] ) to outputs (H [J/kg])
-        H_exhaust = lambda(T): PropsSI('H',
-                                     'T', T + 273.15,
-                                     'P', self.P_exhaust_inlet,
-                                     'Air')
-        H_exhaust_max = H_exhaust(T_max)
-        DeltaH_exhaust_max = H_exhaust_max - H_exhaust(T_min)
+        # Tables map T [C] to H [J/kg] and back at the exhaust pressure.
+        air = getHTFLookup('air', self.P_exhaust_inlet)
+        H_exhaust_max = air.h(T_max)
+        DeltaH_exhaust_max = H_exhaust_max - air.h(T_min)
         # Q_max = C_min * DeltaT_max
         Q_max = self.m_exhaust * DeltaH_exhaust_max
         Q = self.effectiveness * Q_max
         # Now find the temperatures that give this value.
         # For the exhaust stream we have an inverse.
         H_exhaust_outlet = H_exhaust_max  - DeltaH_exhaust_max * self.effectiveness
-        # Function maps inputs ( T [K], P [Pa] ) to outputs (H [J/kg])
-        # We apply it:  inputs ( T [C], P [Pa] ) to outputs (H [J/kg])
-        T_exhaust_outlet = -273.15 + PropsSI('T',
-                                            'H', H_exhaust_outlet,
-                                            'P', self.P_exhaust_inlet,
-                                            'Air')
+        T_exhaust_outlet = air.T(H_exhaust_outlet)
+        _requireTable(air, T_exhaust_outlet,
+                      "Exhaust from {} to {} C".format(T_max, T_min))
         DeltaH_HTF = Q / m_in
         H_HTF_min = htf.h(T_HTF_inlet)
         self.H_HTF_max = H_HTF_min + DeltaH_HTF
-        self.H_HTF_err = lambda(T): htf.h(T) - self.H_HTF_max
-        self.T_HTF_outlet = fsolve(self.H_HTF_err, T_HTF_inlet)
-        T_HTF_outlet = self.T_HTF_outlet[0]
+        # The table inverse replaces a root finder on htf.h(T).
+        T_HTF_outlet = htf.T(self.H_HTF_max)
+        _requireTable(htf, H_HTF_min, "T_HTF_inlet = {} C".format(T_HTF_inlet))
+        _requireTable(htf, T_HTF_outlet,
+                      "HTF outlet h = {} J/kg".format(self.H_HTF_max))
 
         # TODO: adjust for (water) flow rate
         DeltaP_HTF = -6e3 # [Pa]
@@ -147,7 +271,7 @@ class HRHX_model3(object):
     -----
     e,T,P,m = 0.96, 270., 100, 0.80
     HRHX = HRHX_model(e,T,P,m)
-    T_in, m_in, htf = 50, 2, HTFLookup(filename)
+    T_in, m_in, htf = 50, 2, getHTFLookup('water', 10e5)
     Q, T_HTF_outlet, T_exhaust_outlet, DeltaP_HTF, DeltaP_exhaust \\
       = HRHX(T_in, m_in, htf)
         
@@ -181,7 +305,7 @@ def calcUA(T_cold, T_hot, Q):
     -------
         UA (float): the overall heat exchanger coefficient (W/°C)
     """
-    integrand = lambda(q): 1 / (T_hot(Q-q)-T_cold(q))
+    integrand = lambda q: 1 / (T_hot(Q-q)-T_cold(q))
     result = quad(integrand,0,Q)
     return result
 
@@ -202,13 +326,13 @@ def calcQ(T_cold,T_hot,UA,Q_max):
     -------
         Q (float): the total heat flux (W).
     """
-    f = lambda(Q):calcUA(T_cold,T_hot,Q)[0]-UA
+    f = lambda Q:calcUA(T_cold,T_hot,Q)[0]-UA
     result = fsolve(f,0)
     return result
     
 def calcQmax(q_cold,q_hot,T_min,T_max):
     T_guess = 0.5 * (T_min + T_max)
-    f = lambda(t):q_cold(t)+q_hot(t)
+    f = lambda t:q_cold(t)+q_hot(t)
 
     cons = ({'type': 'ineq', 'fun': lambda x:  x-T_min},     # >= 0
             {'type': 'ineq', 'fun': lambda x: T_max-x})
@@ -216,9 +340,155 @@ def calcQmax(q_cold,q_hot,T_min,T_max):
     #result = bracket(f,T_guess,bounds=(T_min,T_max))
     return result.fun[0]
 
+# Flags returned by the array functions, combined bitwise. Zero is good.
+FLAG_INPUT = 1       # nan, or flow not positive, or inlet outside the table
+FLAG_ORDER = 2       # hot inlet not warmer than cold inlet
+FLAG_INFEASIBLE = 4  # Q above Q_max, or UA negative
+FLAG_RANGE = 8       # an outlet leaves the range of its table
+
+class htfStream(object):
+    """A stream of heat transfer fluid, for the array functions.
+
+    Follows the convention of HRHX_integral_model: q(T) is the heat into
+    the stream from its inlet (negative as a hot stream cools), and T(q) is
+    its inverse. The inlet temperature and flow may be arrays, one entry
+    per design, and evaluations broadcast along the last axis.
+
+    Args:
+        htf (HTFLookup): the fluid.
+        T_in (float or array): inlet temperature [C].
+        m (float or array): mass flow rate [kg/s].
+    """
+    def __init__(self, htf, T_in, m):
+        self.htf = htf
+        self.T_in = T_in
+        self.m = m
+        self.h_in = htf.h(T_in)
+    def q(self, T):
+        return self.m * (self.htf.h(T) - self.h_in)
+    def T(self, q):
+        return self.htf.T(self.h_in + q / self.m)
+
+def _arrayInputs(htf_cold, T_cold, m_cold, htf_hot, T_hot, m_hot, *extra):
+    """Broadcasts the inputs to 1-D arrays, and flags bad entries, which
+    are replaced by harmless values so the batch can run. Returns
+    (batch, flags, extra arrays)."""
+    arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(a, dtype=float))
+                                   for a in (T_cold, m_cold, T_hot, m_hot)
+                                   + extra])
+    T_cold, m_cold, T_hot, m_hot = [a.ravel() for a in arrays[:4]]
+    extra = [a.ravel().copy() for a in arrays[4:]]
+    flags = np.zeros(T_cold.shape, dtype=int)
+    with np.errstate(invalid='ignore'):
+        bad = ~((m_cold > 0) & (m_hot > 0)
+                & (T_cold >= htf_cold.T_min) & (T_cold <= htf_cold.T_max)
+                & (T_hot >= htf_hot.T_min) & (T_hot <= htf_hot.T_max))
+        for a in extra:
+            bad |= np.isnan(a)
+        flags[bad] |= FLAG_INPUT
+        flags[~bad & ~(T_hot > T_cold)] |= FLAG_ORDER
+    # Stand-ins keep the flagged entries out of the way.
+    stand = flags > 0
+    T_cold = np.where(stand, htf_cold.T_min, T_cold)
+    T_hot = np.where(stand, htf_hot.T_max, T_hot)
+    m_cold = np.where(stand, 1., m_cold)
+    m_hot = np.where(stand, 1., m_hot)
+    batch = counterflowBatch(htfStream(htf_cold, T_cold, m_cold),
+                             htfStream(htf_hot, T_hot, m_hot))
+    return batch, flags, extra
+
+def _rangeFlags(batch, Q, flags):
+    """Flags entries whose outlets at heat flow Q leave the tables."""
+    cold, hot = batch.cold, batch.hot
+    with np.errstate(invalid='ignore'):
+        out = (cold.h_in + Q / cold.m > cold.htf.h(cold.htf.T_max)) \
+            | (hot.h_in - Q / hot.m < hot.htf.h(hot.htf.T_min))
+    flags[out & (flags == 0)] |= FLAG_RANGE
+    return flags
+
+def calcQmaxArray(htf_cold, T_cold, m_cold, htf_hot, T_hot, m_hot):
+    """Compute Q_max for many designs at once.
+    Array-aware version of calcQmax for two streams of heat transfer fluid.
+
+    Args
+    ----
+        htf_cold, htf_hot (HTFLookup): the fluids.
+        T_cold, T_hot (float or array): inlet temperatures (°C).
+        m_cold, m_hot (float or array): mass flow rates (kg/s).
+
+    Returns
+    -------
+        Q_max (array): the maximum heat flux (W), nan where flagged with
+                       FLAG_INPUT or FLAG_ORDER.
+        flags (array): bitwise combination of the FLAG_ constants.
+    """
+    batch, flags, _ = _arrayInputs(htf_cold, T_cold, m_cold,
+                                   htf_hot, T_hot, m_hot)
+    Q_max = batch.calcQmax()
+    flags = _rangeFlags(batch, Q_max, flags)
+    return np.where(flags & (FLAG_INPUT | FLAG_ORDER), np.nan, Q_max), flags
+
+def calcUAArray(htf_cold, T_cold, m_cold, htf_hot, T_hot, m_hot, Q):
+    """Compute UA for many designs at once.
+    Array-aware version of calcUA for two streams of heat transfer fluid.
+
+    Args
+    ----
+        htf_cold, htf_hot (HTFLookup): the fluids.
+        T_cold, T_hot (float or array): inlet temperatures (°C).
+        m_cold, m_hot (float or array): mass flow rates (kg/s).
+        Q (float or array): the total heat flux (W).
+
+    Returns
+    -------
+        UA (array): the overall heat exchanger coefficient (W/°C), inf
+                    where Q is at or above Q_max, nan where Q is negative
+                    (both FLAG_INFEASIBLE), and nan where flagged with
+                    FLAG_INPUT or FLAG_ORDER.
+        flags (array): bitwise combination of the FLAG_ constants.
+    """
+    batch, flags, (Q,) = _arrayInputs(htf_cold, T_cold, m_cold,
+                                      htf_hot, T_hot, m_hot, Q)
+    Q = np.where(flags > 0, 0., Q)
+    batch.calcQmax()
+    UA = batch.calcUA(np.maximum(Q, 0.))
+    infeasible = (Q < 0) | ~np.isfinite(UA)
+    flags[infeasible & (flags == 0)] |= FLAG_INFEASIBLE
+    UA = np.where(Q < 0, np.nan, UA)
+    flags = _rangeFlags(batch, np.minimum(Q, batch.Qmax), flags)
+    return np.where(flags & (FLAG_INPUT | FLAG_ORDER), np.nan, UA), flags
+
+def calcQArray(htf_cold, T_cold, m_cold, htf_hot, T_hot, m_hot, UA):
+    """Compute heat flux for many designs at once.
+    Array-aware version of calcQ for two streams of heat transfer fluid.
+    Solves all designs together on Q from 0 to Q_max, by regula falsi
+    (Illinois) in s = -log(1 - Q/Q_max); see counterflowBatch.calcQ.
+
+    Args
+    ----
+        htf_cold, htf_hot (HTFLookup): the fluids.
+        T_cold, T_hot (float or array): inlet temperatures (°C).
+        m_cold, m_hot (float or array): mass flow rates (kg/s).
+        UA (float or array): the overall heat exchanger coefficient (W/°C)
+
+    Returns
+    -------
+        Q (array): the total heat flux (W), 0 where UA is negative
+                   (FLAG_INFEASIBLE), and nan where flagged with FLAG_INPUT
+                   or FLAG_ORDER.
+        flags (array): bitwise combination of the FLAG_ constants.
+    """
+    batch, flags, (UA,) = _arrayInputs(htf_cold, T_cold, m_cold,
+                                       htf_hot, T_hot, m_hot, UA)
+    flags[(UA < 0) & (flags == 0)] |= FLAG_INFEASIBLE
+    UA = np.where(flags > 0, 0., UA)
+    Q = batch.calcQ(UA)
+    flags = _rangeFlags(batch, Q, flags)
+    return np.where(flags & (FLAG_INPUT | FLAG_ORDER), np.nan, Q), flags
+
 if __name__ == "__main__":
-    T_cold=lambda(q):q
-    T_hot=lambda(q):1-q
+    T_cold=lambda q:q
+    T_hot=lambda q:1-q
     import numpy as np
     import matplotlib.pyplot as plt
     q=np.linspace(0,1)
@@ -231,7 +501,7 @@ if __name__ == "__main__":
     plt.plot(q,tc,Q-q,th)
     UA_expect = Q / (1-Q)
     UA = calcUA(T_cold,T_hot,Q)[0]
-    print UA_expect, UA
+    print(UA_expect, UA)
     
     calcQ(T_cold,T_hot,9,None)
     QQ = 1-np.logspace(-3,0)
@@ -241,20 +511,20 @@ if __name__ == "__main__":
     plt.figure(2)
     plt.loglog(1-QQ,UA)
     
-    T_cold = lambda(q):q
-    T_hot = lambda(q):1-q**2
-    q_cold = lambda(t):t
-    q_hot = lambda(t):np.sqrt(1-t)
+    T_cold = lambda q:q
+    T_hot = lambda q:1-q**2
+    q_cold = lambda t:t
+    q_hot = lambda t:np.sqrt(1-t)
     
-#    T_cold = lambda(q):q
-#    T_hot = lambda(q):(q-1)**2
-#    q_cold = lambda(t):t
-#    q_hot = lambda(t):1-np.sqrt(t)
+#    T_cold = lambda q:q
+#    T_hot = lambda q:(q-1)**2
+#    q_cold = lambda t:t
+#    q_hot = lambda t:1-np.sqrt(t)
     
-    T_cold = lambda(q):0*q
-    T_hot = lambda(q):1-q**2
-    q_cold = np.vectorize(lambda(t):0 if t <= 0 else 2)
-    q_hot = lambda(t):np.sqrt(1.-t)
+    T_cold = lambda q:0*q
+    T_hot = lambda q:1-q**2
+    q_cold = np.vectorize(lambda t:0 if t <= 0 else 2)
+    q_hot = lambda t:np.sqrt(1.-t)
     
     tc = T_cold(q)
     th = T_hot(q)
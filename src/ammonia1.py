@@ -19,6 +19,9 @@ import HRHX_integral_model
 from ammonia_props import AmmoniaProps, StateType, convert_state_list_to_array, CStateTable
 
 amm = AmmoniaProps()
+# How far (K) the external stream at the evaporator or condenser may lie
+# beyond the refrigerant's own temperatures, for the tabulated streams.
+streamMargin = 50.
 
 class stateIterator:
     def __init__(self, chiller):
@@ -133,15 +136,13 @@ class AmmoniaAbsorberStream(object):
         # TODO: need a robust way to choose xmax.
         # If xmax is less that sat_inlet.x, then the points will "go the wrong way".
         xmax = self.refrig_inlet.x * (0.8)
-        for (i, x) in enumerate(np.linspace(self.sat_inlet.x, xmax)):
-            try:
-                q, t = self._x(x)
-                x_points.append(x)
-                q_points.append(q)
-                T_points.append(t)
-            except:
-                print("[{}] x = {}: Unable to converge in NH3H2O".format(i, x))
-                break
+        # Points are placed by curvature, and the curve ends where NH3H2O
+        # fails to converge.
+        x_sampled, q_sampled, T_sampled = HRHX_integral_model.sampleCurve(
+            self._x, self.sat_inlet.x, xmax, verbose=debug)
+        x_points.extend(x_sampled)
+        q_points.extend(q_sampled)
+        T_points.extend(T_sampled)
 
         if debug:
             print("Weak inlet: ", weak_inlet)
@@ -159,8 +160,8 @@ class AmmoniaAbsorberStream(object):
             plt.plot(q_points, T_points, '.')
             plt.show()
 
-        self.q = scipy.interpolate.PchipInterpolator(T_points[::-1], q_points[::-1])
-        self.T = scipy.interpolate.PchipInterpolator(q_points[::-1], T_points[::-1])
+        self.q = HRHX_integral_model.monotoneCubic(T_points[::-1], q_points[::-1])
+        self.T = HRHX_integral_model.monotoneCubic(q_points[::-1], T_points[::-1])
 
         if debug:
             q_range = np.linspace(min(q_points), max(q_points))
@@ -171,6 +172,10 @@ class AmmoniaAbsorberStream(object):
             plt.plot(q_vals, T_range, '--')
             plt.show()
 
+    def zones(self):
+        """The solution absorbs vapor (two-phase) throughout."""
+        return np.array([-np.inf, np.inf]), ['two-phase']
+
     def _x(self, x_local):
         """ Determine the refrigerant absorbed and local solution mass flow rate.
         """
@@ -268,24 +273,19 @@ class AmmoniaGeneratorStream(object):
         # Previously, I chose x_low_trace = 0.1
         # TODO: Need to assert self.sat_inlet.x > x_low_trace, or change limit.
 
-        for (i, x) in enumerate(np.linspace(self.sat_inlet.x, 0.1)):
-            # try:
-            q, t = self._x(x)
-            q_points.append(q)
-            T_points.append(t)
-            x_points.append(x)
-            # except StandardError as e:
-            #    print("[{}] x = {}: Unable to converge in NH3H2O".format(i,x))
-            #    print(e)
-            #    break
+        x_sampled, q_sampled, T_sampled = HRHX_integral_model.sampleCurve(
+            self._x, self.sat_inlet.x, 0.1, truncate=False)
+        x_points.extend(x_sampled)
+        q_points.extend(q_sampled)
+        T_points.extend(T_sampled)
 
         if debug:
             print(tabulate.tabulate(zip(q_points, T_points, x_points),
                                     "q T x".split()))
             print(np.diff(T_points) < 0)
 
-        self.q = scipy.interpolate.PchipInterpolator(T_points, q_points)
-        self.T = scipy.interpolate.PchipInterpolator(q_points, T_points)
+        self.q = HRHX_integral_model.monotoneCubic(T_points, q_points)
+        self.T = HRHX_integral_model.monotoneCubic(q_points, T_points)
 
         if debug:
             import matplotlib.pyplot as plt
@@ -304,6 +304,13 @@ class AmmoniaGeneratorStream(object):
                                     "q T x".split()))
             print(np.diff(T_points) < 0)
 
+    def zones(self):
+        """Subcooled up to q_pre, if the inlet is subcooled, then two-phase."""
+        if self.q_pre > 0:
+            return np.array([-np.inf, self.q_pre, np.inf]), \
+                ['subcooled', 'two-phase']
+        return np.array([-np.inf, np.inf]), ['two-phase']
+
     def _x(self, z_local):
         # Input z_local is the ammonia mass fraction in the liquid phase.
         liquid, vapor = amm.equilibriumStates(self.rich_inlet.P, z_local)
@@ -401,13 +408,16 @@ class AmmoniaRefluxStream(object):
         T_max = vapor_inlet.T
         if debug:
             print("T_min, T_max = {}, {}".format(T_min, T_max))
-        T_points = np.linspace(T_min, T_max)
-        for t in T_points:
-            q, _ = self._t(t, list_vapor, list_liquid)
-            q_points.append(q)
-        q_points = np.array(q_points)
+        T_points, q_points, _ = HRHX_integral_model.sampleCurve(
+            lambda t: (self._t(t, list_vapor, list_liquid)[0], t),
+            T_min, T_max, truncate=False)
 
         if debug:
+            # The states are only kept in debug mode, in the order they were
+            # evaluated, which for sampleCurve is not that of T; sort them.
+            order = np.argsort([liquid.T for liquid in list_liquid])
+            list_vapor = [list_vapor[i] for i in order]
+            list_liquid = [list_liquid[i] for i in order]
             qdiff = np.diff(q_points)
             print(qdiff < 0)
 
@@ -420,12 +430,18 @@ class AmmoniaRefluxStream(object):
                 ["T vapor", "T liquid", "x vapor", "x liquid", "h vapor",
                  "h liquid", "q (kW)"]))
 
-        # TODO: check for non-increasing points before interpolate.
-        # Check for crossing over saturation and other causes...
+        # sampleCurve returns increasing T. Both curves need increasing knots,
+        # so check q too, eg. for crossing over saturation.
+        if not (np.diff(q_points) > 0).all():
+            raise ValueError("Reflux stream q is not increasing with T")
+
+        self.q = HRHX_integral_model.monotoneCubic(T_points, q_points)
+        self.T = HRHX_integral_model.monotoneCubic(q_points, T_points)
 
-        self.q = scipy.interpolate.PchipInterpolator(T_points, q_points)
-        self.T = scipy.interpolate.PchipInterpolator(q_points, T_points)
 
+    def zones(self):
+        """Vapor and reflux liquid are in equilibrium throughout."""
+        return np.array([-np.inf, np.inf]), ['two-phase']
 
     def _x(self, z_local, output_vapor=None, output_liquid=None):
         """Returns the amount of heat removed from the reflux stream between the
@@ -949,12 +965,18 @@ is_degenerate,bool""".split()
                 raise e
 
     def getEvaporatorStream(self):
-        return HRHX_integral_model.aquaStream(self.refrig_exp_outlet,
-                                              self.m_refrig)
+        # Leave room for the external stream, up to streamMargin warmer.
+        return HRHX_integral_model.aquaStream(
+            self.refrig_exp_outlet, self.m_refrig,
+            self.refrig_exp_outlet.T - 1,
+            self.refrig_evap_outlet.T + streamMargin)
 
     def getCondenserStream(self):
-        return HRHX_integral_model.aquaStream(self.refrig_rect_outlet,
-                                              self.m_refrig)
+        # Leave room for the external stream, up to streamMargin colder.
+        return HRHX_integral_model.aquaStream(
+            self.refrig_rect_outlet, self.m_refrig,
+            self.refrig_cond_outlet.T - streamMargin,
+            self.refrig_rect_outlet.T + 1)
 
     def getRectifierStream(self,retry=True):
         try:
@@ -974,16 +996,23 @@ is_degenerate,bool""".split()
         """Constructs and returns a model for the internal heat
         exchanger between the weak and rich solution streams.
         """
-        hot = HRHX_integral_model.aquaStream(self.weak_gen_outlet, self.m_weak)
-        cold = HRHX_integral_model.aquaStream(self.rich_pump_outlet, self.m_rich)
+        # Both streams stay between the two inlet temperatures.
+        T_range = self.rich_pump_outlet.T - 1, self.weak_gen_outlet.T + 1
+        hot = HRHX_integral_model.aquaStream(self.weak_gen_outlet, self.m_weak,
+                                             *T_range)
+        cold = HRHX_integral_model.aquaStream(self.rich_pump_outlet, self.m_rich,
+                                              *T_range)
         return HRHX_integral_model.counterflow_integrator(cold, hot, **kwargs)
 
     def getCEHX(self, **kwargs):
         """Constructs and returns a model for the internal heat
         exchanger between the condenser and evaporator.
         """
-        hot = HRHX_integral_model.aquaStream(self.refrig_cond_outlet, self.m_refrig)
-        cold = HRHX_integral_model.aquaStream(self.refrig_evap_outlet, self.m_refrig)
+        T_range = self.refrig_evap_outlet.T - 1, self.refrig_cond_outlet.T + 1
+        hot = HRHX_integral_model.aquaStream(self.refrig_cond_outlet,
+                                             self.m_refrig, *T_range)
+        cold = HRHX_integral_model.aquaStream(self.refrig_evap_outlet,
+                                              self.m_refrig, *T_range)
         return HRHX_integral_model.counterflow_integrator(cold, hot, **kwargs)
 
     def display(a):
@@ -9,41 +9,47 @@ A single effect LiBr absorption chiller model.
 import numpy as np
 import tabulate
 from scipy.optimize import fsolve
-from scipy.interpolate import PchipInterpolator
 from collections import namedtuple
 import CoolProp.CoolProp as CP
 from hw2_1 import CelsiusToKelvin as C2K
 from hw2_1 import KelvinToCelsius as K2C
 import libr_props, libr_props2
 import HRHX_integral_model
+from HRHX_integral_model import UA_by_LMTD, monotoneCubic
 
 water = 'HEOS::Water'
 librname = lambda x: 'INCOMP::LiBr[{}]'.format(x)
 pwater = CP.AbstractState("HEOS","water")
 
-pointType = np.dtype(dict(names="name m x T p Q h D C".split(),formats=['S32']+['d']*8))
-class ProcessPoint(object):
-    def __init__(self,row):
-        self.row = row
-def makeprop(i):
-    def getx(self):
-        return self.row[i]
-    def setx(self,value):
-        self.row[i]=value
-    def delx(self):
-        del self.row[i]
-    return property(getx,setx,delx)
-for i in pointType.names:
-   setattr(ProcessPoint,i,makeprop(i))
-class ProcessTable(object):
-    pass
+stateType = np.dtype(dict(names="T P x h s m Q".split(),formats=['d']*7))
+stateUnits = "C Pa kg/kg J/kg J/kg-K kg/s kg/kg".split()
+
 def makePointTable(names):
-    table=np.zeros(len(names),dtype=pointType)
-    points=ProcessTable()
-    for i,name in enumerate(names):
-        points.__setattr__(name,ProcessPoint(table[i]))
-        table[i][0]=name
-    return table,points
+    """Returns a preallocated state point table, one row per name.
+    Unknown values are nan."""
+    table = np.full(len(names), np.nan, dtype=stateType)
+    return table
+
+class CStateTable(object):
+    """Wraps a state point table with its labels, for display on request."""
+    def __init__(self, table, labels):
+        self.table = table
+        self.labels = labels
+    def tabulate(self, **kwargs):
+        return tabulate.tabulate([[label] + list(row)
+                                  for label, row in zip(self.labels,
+                                                        self.table)],
+                                 ['state'] + ["{} [{}]".format(n, u) for n, u
+                                              in zip(stateType.names,
+                                                     stateUnits)],
+                                 **kwargs)
+    def toDataFrame(self):
+        import pandas
+        return pandas.DataFrame(self.table, index=self.labels)
+    def __repr__(self):
+        return self.tabulate()
+    def _repr_html_(self):
+        return self.tabulate(tablefmt="html")
     
 # Units in this file:
 # temperature [C]
@@ -274,14 +280,14 @@ class GeneratorLiBrInterpolated(GeneratorLiBr):
         TT1[-1] = TT1[-2] + 1
         if (np.diff(qq1) < 0).any():
             print("Captain, it's a non-monotonic function!")
-        self.q = PchipInterpolator(TT1,qq1,extrapolate=True)
+        self.q = monotoneCubic(TT1,qq1,extrapolate=True)
         
         # Need to use fresh arrays because they are referenced.
         qq2 = np.resize(qq,qq.size+1)
         TT2 = np.resize(TT,TT.size+1)
         qq2[-1] = qq2[-2] * 1.02
         TT2[-1] = TT2[-2]
-        self.T = PchipInterpolator(qq2,TT2,extrapolate=True)
+        self.T = monotoneCubic(qq2,TT2,extrapolate=True)
 
         # Show that it worked
         if debug:
@@ -329,16 +335,11 @@ class AbsorberLiBr1(object):
             self.Q_pre_cool = self.m_in * (self.h_sat - self.h_in)
             self.T_in = K2C(t)
             prepoints_x = np.linspace(xl,self.x_in,20,endpoint=False)
-            prepoints_T = np.zeros_like(prepoints_x)
-            prepoints_q = np.zeros_like(prepoints_x)
-            
-            for i,x in enumerate(prepoints_x):
-                #q,t,xl = libr_props.twoPhaseProps(h,self.P*1e-5,self.x_in)
-                t = libr_props.temperature(self.P * 1e-5, x)
-                h = libr_props.massSpecificEnthalpy(t,x)
-                prepoints_T[i] = K2C(t)
-                prepoints_q[i] = self.m_in * (h - self.h_in)
-                prepoints_x[i] = x
+            # All pre-cooling points at once with the vectorized kernels.
+            t = libr_props.temperatureArray(self.P * 1e-5, prepoints_x)
+            h = libr_props.massSpecificEnthalpyArray(t, prepoints_x)
+            prepoints_T = K2C(t)
+            prepoints_q = self.m_in * (h - self.h_in)
         else:
             self.Q_pre_cool = 0
             self.T_in = K2C(libr_props.temperature(self.P * 1e-5, self.x_in))
@@ -351,12 +352,8 @@ class AbsorberLiBr1(object):
         pwater.update(CP.PQ_INPUTS,P,0)
         self.Tmin = pwater.T()
         x_points = np.linspace(x_in,0.1,100)
-        T_points = np.zeros_like(x_points)
-        q_points = np.zeros_like(x_points)
-        #q_func = np.vectorize(self._q)
-        #q_points = q_func(T_points)
-        for i,x in enumerate(x_points):
-            T_points[i],q_points[i] = self._qx(x)
+        # One array evaluation for the whole absorption curve.
+        T_points,q_points = self._qx(x_points)
 
         x_points = np.concatenate([prepoints_x,x_points])
         T_points = np.concatenate([prepoints_T,T_points])
@@ -385,8 +382,8 @@ class AbsorberLiBr1(object):
             plt.figure(); plt.plot(q_points2,T_points2); plt.title("T(q)")
         # Interpolate data must be in increasing order, so we reverse it
         # compared to reaction direction.
-        self.q = PchipInterpolator(T_points1[::-1], q_points1[::-1])
-        self.T = PchipInterpolator(q_points2[::-1], T_points2[::-1])
+        self.q = monotoneCubic(T_points1[::-1], q_points1[::-1])
+        self.T = monotoneCubic(q_points2[::-1], T_points2[::-1])
         
     def _q(self,T):
         # First, determine the mass fraction here.
@@ -396,11 +393,18 @@ class AbsorberLiBr1(object):
             x_local = libr_props.massFraction(C2K(T),self.P*1e-5)
         return self._qx(x_local)
     
+    def _T(self,q):
+        """Scalar temperature (deg C) at heat flow q (W), from the cached
+        interpolant built at construction."""
+        return float(self.T(q))
+
     def _qx(self,x_local):
-        T = K2C(libr_props.temperature(self.P*1e-5,x_local))
+        """Returns (T, q) at local mass fraction x_local. Accepts a scalar or
+        an array, in which case all points are evaluated in one pass."""
+        T = K2C(libr_props.temperatureArray(self.P*1e-5,x_local))
         dx = self.x_in - x_local
         # TODO
-        h_local = libr_props.massSpecificEnthalpy(C2K(T),x_local)
+        h_local = libr_props.massSpecificEnthalpyArray(C2K(T),x_local)
         # And calculate
         m_vapor = self.m_in * dx / x_local
         m_out = self.m_in + m_vapor
@@ -483,8 +487,10 @@ evap_inlet
 evap_sat_liquid
 evap_sat_vapor
 evap_outlet""".split('\n')
-        #self.states=dict((k, nullPP('LiBrH2O')) for k in self.stateLabels)
-        self.stateTable,self.states=makePointTable(self.stateLabels)
+        # Solution states have x > 0 and pure water states x = 0. Column Q is
+        # the vapor quality, or nan for subcooled and superheated states.
+        self._stateTable=makePointTable(self.stateLabels)
+        self._stateTableFilled=True
         
         
         self.T_gen_inlet = 0
@@ -503,6 +509,7 @@ evap_outlet""".split('\n')
         self.h_abs_pre = np.nan
         self.Q_abs_pre_cool = 0
         self.P_abs_pre = np.nan
+        self.Qu_abs_pre = np.nan
         self.Q_abs_main = 0
         self.Q_abs_total = 0
         self.T_gen_pre = np.nan
@@ -515,6 +522,9 @@ evap_outlet""".split('\n')
         self.W_pump = 0
         self.f = np.inf
         self.x_abs_pre = self.x2
+        self._absorberStream = None
+        self._absorberKey = None
+        self._ratingSolution = None
     
     # These routines allow updating solution
     def setT_evap(self,T_evap):
@@ -525,6 +535,14 @@ evap_outlet""".split('\n')
         self.T_cond = T_cond
         pwater.update(CP.QT_INPUTS, 1, C2K(T_cond))
         self.P_cond = pwater.p()
+    def setOutletTemperatures(self,T_abs_outlet,T_gen_outlet):
+        """Resolve the concentrations x1, x2 from the absorber and generator
+        solution outlet temperatures (deg C) at the current pressures."""
+        self.x1 = float(libr_props.massFractionArray(C2K(T_abs_outlet),
+                                                     self.P_evap * 1e-5))
+        self.x2 = float(libr_props.massFractionArray(C2K(T_gen_outlet),
+                                                     self.P_cond * 1e-5))
+        self.dx = self.x1 - self.x2
         
     def ZeroCheck(self):
         return self.W_pump + self.Q_evap_heat + self.Q_gen_total - self.Q_condenser_reject - self.Q_abs_total
@@ -577,7 +595,7 @@ evap_outlet""".split('\n')
                                               self.x2)
             self.T_abs_pre = K2C(t)
             self.x_abs_pre = xl
-            # ignore vapor quality, q
+            self.Qu_abs_pre = q
             # Minimum vapor pressure for absorption to occur
             self.P_abs_pre = np.inf
         else:
@@ -587,6 +605,7 @@ evap_outlet""".split('\n')
             #    'P', self.P_evap,
             #    librname(self.x2)))
             self.T_abs_pre = np.nan
+            self.Qu_abs_pre = np.nan
             # Minimum vapor pressure for absorption to occur
 #            self.P_abs_pre = CP.PropsSI('P',
 #                'T', C2K(self.T_abs_pre),
@@ -649,7 +668,73 @@ evap_outlet""".split('\n')
             - self.h_evap_inlet)
         
         self.COP = self.Q_evap_heat / self.Q_gen_total
-    
+        self.updateStateTable()
+
+    def updateStateTable(self):
+        """Writes the state point values that iterate1 has computed into the
+        table, in the order of self.stateLabels: T, P, x, h and m. The
+        saturation enthalpies, vapor quality and entropy need further
+        property calls, so they are filled in only when the table is read
+        (see stateTable)."""
+        Pe, Pc, nan = self.P_evap, self.P_cond, np.nan
+        t = self._stateTable
+        # The pump temperature rise is neglected.
+        t['T'] = [self.T_abs_outlet_max, self.T_abs_outlet_max,
+            self.T_gen_pre, self.T_gen_inlet, self.T_gen_outlet,
+            self.T_SHX_concentrate_outlet, self.T_abs_pre,
+            self.T_abs_inlet_max,
+            self.T_gen_inlet, self.T_cond, self.T_cond,
+            self.T_evap, self.T_evap, self.T_evap, self.T_evap]
+        t['P'] = [Pe, Pc, Pc, Pc, Pc, Pc, Pe, Pe, Pc, Pc, Pc, Pe, Pe, Pe, Pe]
+        t['x'] = [self.x1, self.x1, self.x1, self.x1, self.x2, self.x2,
+            self.x2, self.x2] + [0] * 7
+        t['h'] = [self.h_abs_outlet, self.h_pump_outlet,
+            self.h_gen_pre, self.h_gen_inlet, self.h_gen_outlet,
+            self.h_SHX_concentrate_outlet, self.h_abs_pre, self.h_abs_inlet,
+            self.h_gen_vapor_outlet, nan,
+            self.h_condenser_outlet, self.h_evap_inlet, nan,
+            self.h_abs_vapor_inlet, self.h_evap_outlet]
+        t['m'] = [self.m_pump] * 4 + [self.m_concentrate] * 4 \
+            + [self.m_refrig] * 7
+        t['s'] = nan
+        t['Q'] = nan
+        self._stateTableFilled = False
+
+    def _fillStateTable(self):
+        """Computes the derived columns of the state point table: the
+        saturated vapor and liquid enthalpies, vapor quality, and entropy,
+        evaluated for all points at once."""
+        t = self._stateTable
+        nan = np.nan
+        pwater.update(CP.PQ_INPUTS, self.P_cond, 1)
+        t['h'][9] = pwater.hmass() - h_w_ref
+        pwater.update(CP.PQ_INPUTS, self.P_evap, 0)
+        t['h'][12] = pwater.hmass() - h_w_ref
+        pwater.update(CP.HmassP_INPUTS, self.h_evap_inlet + h_w_ref,
+                      self.P_evap)
+        Qu_evap_inlet = pwater.Q()
+        t['Q'] = [0, nan, nan, 0, 0, nan, self.Qu_abs_pre, 0,
+            nan, 1, 0, Qu_evap_inlet, 0, 1, 1]
+        # Entropy of solution states, except where two phases are present.
+        sol, ref = slice(0,8), slice(8,None)
+        liquid = np.isnan(t['Q'][sol]) | (t['Q'][sol] == 0)
+        t['s'][sol] = libr_props.massSpecificEntropyArray(C2K(t['T'][sol]),
+            np.where(liquid, t['x'][sol], np.nan))
+        t['s'][ref] = CP.PropsSI('S', 'P', t['P'][ref],
+            'H', t['h'][ref] + h_w_ref, water)
+        self._stateTableFilled = True
+
+    @property
+    def stateTable(self):
+        """The state point table (array of stateType), one row per label.
+        Derived columns are computed on the first read after each solve."""
+        if not self._stateTableFilled:
+            self._fillStateTable()
+        return self._stateTable
+
+    def getStateTable(self):
+        return CStateTable(self.stateTable, self.stateLabels)
+
     def updateGenerator(self,Q_gen):
         genStream = self.getGeneratorStream()
         self.h_gen_inlet = genStream.h_sat
@@ -743,9 +828,223 @@ evap_outlet""".split('\n')
         
         return zip(*result)
 
-    def iterate2(self,T_gen_outlet,T_abs_outlet):
-        """Resolve the concentrations. Not yet implemented."""
-        pass
+    def ratingResiduals(self,UA,heat,absorberReject,condReject,cold):
+        """Returns the relative UA residuals (UA_required / UA - 1) for the
+        generator, absorber, condenser and evaporator at the current state,
+        in that order. Call iterate1() first.
+
+        Each exchanger is rated with the LMTD equation, treating the
+        condenser and evaporator as isothermal on the refrigerant side."""
+        T_gen_in = self.T_gen_pre
+        if np.isnan(T_gen_in):
+            T_gen_in = self.T_gen_inlet
+        T_abs_in = self.T_abs_pre
+        if np.isnan(T_abs_in):
+            T_abs_in = self.T_abs_inlet_max
+        C = lambda s: s.mdot * s.cp
+        UA_required = [
+            UA_by_LMTD(self.Q_gen_total, T_gen_in, self.T_gen_outlet,
+                heat.T_inlet, heat.T_inlet - self.Q_gen_total / C(heat)),
+            UA_by_LMTD(self.Q_abs_total, absorberReject.T_inlet,
+                absorberReject.T_inlet + self.Q_abs_total / C(absorberReject),
+                T_abs_in, self.T_abs_outlet_max),
+            UA_by_LMTD(self.Q_condenser_reject, condReject.T_inlet,
+                condReject.T_inlet + self.Q_condenser_reject / C(condReject),
+                self.T_cond, self.T_cond),
+            UA_by_LMTD(self.Q_evap_heat, self.T_evap, self.T_evap,
+                cold.T_inlet, cold.T_inlet - self.Q_evap_heat / C(cold))]
+        UA = [UA[name] for name in "gen abs cond evap".split()]
+        return np.array(UA_required) / np.array(UA) - 1
+
+    def ratingLimits(self,heat,absorberReject,condReject,cold):
+        """Returns (lo, hi), open bounds on the rating unknowns
+        (T_evap, T_cond, T_abs_outlet, T_gen_outlet) (deg C): the evaporator
+        below the chilled stream inlet (and above freezing), the condenser and
+        absorber outlet above their coolant inlets, and all below the heat
+        source inlet."""
+        lo = np.array([0., condReject.T_inlet, absorberReject.T_inlet,
+                       max(condReject.T_inlet, absorberReject.T_inlet)])
+        hi = np.array([cold.T_inlet, heat.T_inlet, heat.T_inlet,
+                       heat.T_inlet])
+        return lo, hi
+
+    def ratingFeasible(self,z,limits):
+        """Whether z = (T_evap, T_cond, T_abs_outlet, T_gen_outlet) lies
+        strictly within limits (see ratingLimits), with T_cond > T_evap, and
+        gives concentrations in the valid LiBr range with x1 < x2."""
+        lo, hi = limits
+        if not (np.all(z > lo) and np.all(z < hi) and z[1] > z[0]):
+            return False
+        P = CP.PropsSI('P', 'T', C2K(np.array(z[:2])), 'Q', 1, water)
+        x1, x2 = libr_props.massFractionArray(C2K(np.array(z[2:])), P * 1e-5)
+        # massFractionArray gives nan outside the valid range.
+        return bool(0 < x1 < x2)
+
+    def ratingState(self):
+        """Returns the current (T_evap, T_cond, T_abs_outlet, T_gen_outlet)
+        (deg C), the unknowns of iterate2, from the saturation temperatures
+        and concentrations."""
+        return np.array([self.T_evap, self.T_cond,
+            K2C(libr_props.temperature(self.P_evap * 1e-5, self.x1)),
+            K2C(libr_props.temperature(self.P_cond * 1e-5, self.x2))])
+
+    def feasibleGuess(self,UA,heat,absorberReject,condReject,cold,
+                      guess=None,steps=4):
+        """Returns a starting point for iterate2 near guess (default, the
+        current state) that is within ratingLimits, gives valid
+        concentrations, and has finite rating residuals. The guess is first
+        pulled inside the limits, then moved in steps towards a point with
+        fixed approach temperatures (the evaporator 4 K below the chilled
+        stream, condenser and absorber 10 K above their coolant, generator
+        15 K below the heat source) until it qualifies.
+
+        Returns None if no such point is found."""
+        streams = heat,absorberReject,condReject,cold
+        lo, hi = self.ratingLimits(*streams)
+        span = hi - lo
+        target = np.array([hi[0] - min(4., 0.5 * span[0]),
+                           lo[1] + min(10., 0.5 * span[1]),
+                           lo[2] + min(10., 0.5 * span[2]),
+                           hi[3] - min(15., 0.5 * span[3])])
+        z = self.ratingState() if guess is None \
+            else np.array(guess, dtype=float)
+        if not np.isfinite(z).all():
+            z = target
+        z = np.clip(z, lo + 0.05 * span, hi - 0.05 * span)
+        for t in np.linspace(0., 1., steps + 1):
+            zt = (1 - t) * z + t * target
+            if not self.ratingFeasible(zt, (lo, hi)):
+                continue
+            try:
+                self.setT_evap(zt[0])
+                self.setT_cond(zt[1])
+                self.setOutletTemperatures(zt[2],zt[3])
+                self.iterate1()
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    r = self.ratingResiduals(UA,*streams)
+            except (ValueError, ZeroDivisionError):
+                continue
+            if np.isfinite(r).all():
+                return zt
+        return None
+
+    def iterate2(self,UA,heat,absorberReject,condReject,cold,
+                 guess=None,tol=1e-6,maxiter=50,maxstep=5.,debug=False):
+        """Rating mode: solve the cycle for given heat exchanger sizes and
+        external streams, by adjusting the internal temperatures
+        (T_evap, T_cond, T_abs_outlet, T_gen_outlet) with a damped Newton
+        method. Pump flow and SHX effectiveness are held fixed.
+
+        The unknowns are kept within ratingLimits, and to valid, ordered
+        concentrations (ratingFeasible): a step is shortened to stay inside
+        the limits, and halved while it would cross them or fail to reduce
+        the residuals. If no such step exists, the solver stops with an
+        error rather than leave the physical region.
+
+        The solution is kept and used as the starting point of the next call,
+        so repeated calls for nearby conditions converge in a few steps.
+
+        Args
+        ----
+            UA : dict
+                UA values (W/K) keyed by 'gen', 'abs', 'cond', 'evap'
+            heat, absorberReject, condReject, cold : stream
+                External streams with attributes T_inlet (deg C),
+                mdot (kg/s) and cp (J/kg-K), eg. streamExample1
+            guess : array, optional
+                Initial (T_evap, T_cond, T_abs_outlet, T_gen_outlet) (deg C).
+                Defaults to the previous solution, if any, or else the
+                current state of the chiller.
+            tol : float
+                Convergence tolerance on the relative UA residuals
+            maxiter : int
+                Maximum number of Newton steps
+            maxstep : float
+                Largest temperature change (K) allowed in one step
+
+        Returns
+        -------
+            z : array
+                The solved (T_evap, T_cond, T_abs_outlet, T_gen_outlet)
+
+        Raises ValueError if the starting point is infeasible, or the solver
+        stalls or does not converge.
+        """
+        streams = heat,absorberReject,condReject,cold
+        def residuals(z):
+            try:
+                self.setT_evap(z[0])
+                self.setT_cond(z[1])
+                self.setOutletTemperatures(z[2],z[3])
+                self.iterate1()
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    r = self.ratingResiduals(UA,*streams)
+            except (ValueError, ZeroDivisionError):
+                r = np.full(4, np.nan)
+            return r
+
+        if guess is not None:
+            z = np.array(guess, dtype=float)
+        elif self._ratingSolution is not None:
+            z = self._ratingSolution.copy()
+        else:
+            z = self.ratingState()
+        limits = self.ratingLimits(*streams)
+        lo, hi = limits
+        if not self.ratingFeasible(z, limits):
+            raise ValueError("Initial guess {} is outside the limits {} to {}"
+                             " or gives invalid concentrations."
+                             .format(z, lo, hi))
+        r = residuals(z)
+        if not np.isfinite(r).all():
+            raise ValueError("Initial guess {} is not feasible.".format(z))
+        h = 1e-3
+        for it in range(maxiter):
+            norm = np.linalg.norm(r)
+            if debug:
+                print(it, z, norm)
+            if norm < tol:
+                break
+            # Forward difference Jacobian, stepping away from the upper limit.
+            J = np.zeros((4,4))
+            for j in range(4):
+                zj = z.copy()
+                hj = h if z[j] + 2 * h < hi[j] else -h
+                zj[j] += hj
+                J[:,j] = (residuals(zj) - r) / hj
+            step = -np.linalg.lstsq(J, r, rcond=None)[0]
+            biggest = np.abs(step).max()
+            if biggest > maxstep:
+                step *= maxstep / biggest
+            # Go at most 90% of the way to the nearest limit.
+            with np.errstate(divide='ignore', invalid='ignore'):
+                room = np.where(step > 0, (hi - z) / step,
+                                np.where(step < 0, (lo - z) / step, np.inf))
+            alpha = min(1., 0.9 * room.min())
+            # Damping: halve the step until it stays feasible and the
+            # residual decreases.
+            while alpha > 1e-4:
+                z_new = z + alpha * step
+                if self.ratingFeasible(z_new, limits):
+                    r_new = residuals(z_new)
+                    if np.isfinite(r_new).all() \
+                            and np.linalg.norm(r_new) < norm:
+                        break
+                alpha *= 0.5
+            else:
+                residuals(z)
+                raise ValueError("Rating solver stalled at {}, residuals {}:"
+                                 " no step within the limits {} to {}"
+                                 " reduces the residuals."
+                                 .format(z, r, lo, hi))
+            z = z_new
+            r = r_new
+        else:
+            raise ValueError("Rating solver did not converge in {} steps."
+                             .format(maxiter))
+        self._ratingSolution = z
+        self.UA_residuals = r
+        return z
     
     def buildGeneratorHeatCurve(self):
         """Provide process heat canonical curve for generator in various forms.
@@ -854,12 +1153,14 @@ evap_outlet""".split('\n')
         return gen
         
     def getAbsorberStream(self):
-        absorber = AbsorberLiBr1(self.P_evap,
-                                 self.m_concentrate,
-                                 self.h_abs_pre,
-                                 self.x_abs_pre,
-                                 self.h_evap_outlet)
-        return absorber
+        """Returns the absorber heat curve. The curve is cached, and only
+        rebuilt when the absorber inlet conditions have changed."""
+        key = (self.P_evap, self.m_concentrate, self.h_abs_pre,
+               self.x_abs_pre, self.h_evap_outlet)
+        if key != self._absorberKey:
+            self._absorberStream = AbsorberLiBr1(*key)
+            self._absorberKey = key
+        return self._absorberStream
     
     def getCondenserStream(self):
         h_rel = self.h_gen_vapor_outlet + h_w_ref
@@ -924,9 +1225,167 @@ evap_outlet""".split('\n')
         W
         none""".split()
         vartable = tabulate.tabulate(zip(names,vals,units))
-        statetable = tabulate.tabulate(self.stateTable,pointType.names)
-        return vartable + "\nComing soon ...\n" + statetable
-        
+        statetable = self.getStateTable().tabulate()
+        return vartable + "\n" + statetable
+        
+mapType = np.dtype(dict(names="""T_evap T_cond T_abs_outlet T_gen_outlet
+    m_pump Eff_SHX P_evap P_cond x1 x2
+    T_gen_inlet T_abs_inlet_max T_SHX_concentrate_outlet T_abs_pre T_gen_pre
+    h_gen_inlet h_gen_outlet h_abs_inlet h_abs_outlet
+    h_SHX_concentrate_outlet h_gen_pre
+    m_concentrate m_refrig
+    Q_SHX Q_abs_total Q_gen_total Q_condenser_reject Q_evap_heat W_pump COP
+    crystallized ok""".split(),
+    formats=['d']*30+['?']*2))
+
+def iterate1Map(T_evap, T_cond, T_abs_outlet, T_gen_outlet,
+                m_pump=0.05, Eff_SHX=0.64):
+    """Runs the ChillerLiBr1.iterate1 cycle over arrays of operating points.
+
+    Where ChillerLiBr1 takes the mass fractions, this takes the absorber and
+    generator outlet temperatures, and finds x1 and x2 from equilibrium at
+    the evaporator and condenser pressures. Every step is evaluated for all
+    points at once with the vectorized libr_props kernels.
+
+    Args
+    ----
+        T_evap : array
+            Evaporator saturation temperature (deg C)
+        T_cond : array
+            Condenser saturation temperature (deg C)
+        T_abs_outlet : array
+            Absorber solution outlet temperature (deg C)
+        T_gen_outlet : array
+            Generator solution outlet temperature (deg C)
+        m_pump : array
+            Mass flow rate through the solution pump (kg/s)
+        Eff_SHX : array
+            Effectiveness of the solution heat exchanger (K/K), 0 to 1
+
+    Returns
+    -------
+        table : array of mapType
+            One record per operating point, with the same meaning and units
+            as the ChillerLiBr1 attributes of the same name. Field 'ok' is
+            False where the cycle failed to solve, and field 'crystallized'
+            is True where the concentrate leaving the SHX lies beyond the
+            crystallization curve.
+    """
+    inputs = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in
+        (T_evap, T_cond, T_abs_outlet, T_gen_outlet, m_pump, Eff_SHX)])
+    shape = inputs[0].shape
+    table = np.zeros(shape, dtype=mapType)
+    for name, a in zip(mapType.names[:6], inputs):
+        table[name] = a
+    t = table.ravel()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t['P_evap'] = CP.PropsSI('P','T',C2K(t['T_evap']),'Q',1,water)
+        t['P_cond'] = CP.PropsSI('P','T',C2K(t['T_cond']),'Q',1,water)
+        t['x1'] = libr_props.massFractionArray(C2K(t['T_abs_outlet']),
+                                               t['P_evap'] * 1e-5)
+        t['x2'] = libr_props.massFractionArray(C2K(t['T_gen_outlet']),
+                                               t['P_cond'] * 1e-5)
+        x1, x2 = t['x1'], t['x2']
+
+        t['T_gen_inlet'] = K2C(libr_props.temperatureArray(t['P_cond']*1e-5,
+                                                           x1))
+        t['T_abs_inlet_max'] = K2C(libr_props.temperatureArray(
+            t['P_evap'] * 1e-5, x2))
+        t['h_gen_inlet'] = libr_props.massSpecificEnthalpyArray(
+            C2K(t['T_gen_inlet']), x1)
+        t['h_gen_outlet'] = libr_props.massSpecificEnthalpyArray(
+            C2K(t['T_gen_outlet']), x2)
+        t['h_abs_inlet'] = libr_props.massSpecificEnthalpyArray(
+            C2K(t['T_abs_inlet_max']), x2)
+        t['h_abs_outlet'] = libr_props.massSpecificEnthalpyArray(
+            C2K(t['T_abs_outlet']), x1)
+
+        # Mass balance on LiBr
+        t['m_concentrate'] = t['m_pump'] * x1 / x2
+        # Mass balance on Water
+        t['m_refrig'] = t['m_pump'] - t['m_concentrate']
+
+        # Compute SHX outlets, assuming concentrate limits heat flow (C_min)
+        DeltaT_max = t['T_gen_outlet'] - t['T_abs_outlet']
+        t['T_SHX_concentrate_outlet'] = t['T_gen_outlet'] \
+            - t['Eff_SHX'] * DeltaT_max
+        t['h_SHX_concentrate_outlet'] = libr_props.massSpecificEnthalpyArray(
+            C2K(t['T_SHX_concentrate_outlet']), x2)
+        t['Q_SHX'] = t['m_concentrate'] \
+            * (t['h_gen_outlet'] - t['h_SHX_concentrate_outlet'])
+
+        # Expansion valve
+        h_abs_pre = t['h_SHX_concentrate_outlet']
+        precool = h_abs_pre > t['h_abs_inlet']
+        Q_abs_pre_cool = np.where(precool,
+            t['m_concentrate'] * (h_abs_pre - t['h_abs_inlet']), 0)
+        t['T_abs_pre'] = np.nan
+        if precool.any():
+            q,tt,xl = libr_props.twoPhasePropsArray(h_abs_pre[precool],
+                                                    t['P_evap'][precool]*1e-5,
+                                                    x2[precool])
+            t['T_abs_pre'][precool] = K2C(tt)
+
+        # Heat rejection in absorber: energy balance
+        h_abs_vapor_inlet = CP.PropsSI('H','P',t['P_evap'],'Q',1,water) \
+            - h_w_ref
+        Q_abs_main = t['m_refrig'] * h_abs_vapor_inlet \
+            + t['m_concentrate'] * t['h_abs_inlet'] \
+            - t['m_pump'] * t['h_abs_outlet']
+        t['Q_abs_total'] = Q_abs_main + Q_abs_pre_cool
+
+        # Energy balance in SHX, pump side
+        D_in = np.full(t.shape, np.nan)
+        for i in range(t.size):
+            try:
+                D_in[i] = CP.PropsSI('D', 'T', C2K(t['T_abs_outlet'][i]),
+                                     'Q', 0, librname(x1[i]))
+            except ValueError:
+                pass
+        DeltaH_pump = (t['P_cond'] - t['P_evap']) / D_in
+        t['W_pump'] = t['m_pump'] * DeltaH_pump
+        h_pump_outlet = t['h_abs_outlet'] + DeltaH_pump
+        t['h_gen_pre'] = h_pump_outlet + t['Q_SHX'] / t['m_pump']
+        cp = libr_props.massSpecificHeatArray(C2K(t['T_gen_inlet']), x1)
+        t['T_gen_pre'] = np.where(t['h_gen_pre'] > t['h_gen_inlet'], np.nan,
+            t['T_gen_inlet'] - (t['h_gen_inlet'] - t['h_gen_pre']) / cp)
+        Q_gen_pre_heat = t['m_pump'] * (t['h_gen_inlet'] - t['h_gen_pre'])
+
+        # Heat input to generator: energy balance
+        h_gen_vapor_outlet = CP.PropsSI('H','P',t['P_cond'],
+                                        'T',C2K(t['T_gen_inlet']),water) \
+            - h_w_ref
+        Q_gen_main = t['m_refrig'] * h_gen_vapor_outlet \
+            + t['m_concentrate'] * t['h_gen_outlet'] \
+            - t['m_pump'] * t['h_gen_inlet']
+        t['Q_gen_total'] = Q_gen_main + Q_gen_pre_heat
+
+        # Condenser
+        h_condenser_outlet = CP.PropsSI('H','P',t['P_cond'],'Q',0,water) \
+            - h_w_ref
+        t['Q_condenser_reject'] = t['m_refrig'] \
+            * (h_gen_vapor_outlet - h_condenser_outlet)
+
+        # Evaporator
+        t['Q_evap_heat'] = t['m_refrig'] \
+            * (h_abs_vapor_inlet - h_condenser_outlet)
+        t['COP'] = t['Q_evap_heat'] / t['Q_gen_total']
+
+        # Flag the concentrate leaving the SHX beyond the solubility limit.
+        x_cryst = np.interp(t['T_SHX_concentrate_outlet'],
+                            libr_props.crystallization_data_T,
+                            libr_props.crystallization_data_x)
+        t['crystallized'] = x2 > x_cryst
+
+        results = [t[name] for name in
+                   "Q_evap_heat Q_gen_total Q_abs_total COP W_pump".split()]
+        t['ok'] = np.isfinite(results).all(axis=0) \
+            & (t['T_cond'] > t['T_evap']) & (x2 > x1) \
+            & (t['Q_evap_heat'] > 0) & (t['Q_gen_total'] > 0) \
+            & ~t['crystallized']
+    return table
+
 def main():
     if True:
         # Example 6.1 in the book
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+Precomputed performance map for the single effect LiBr chiller (libr3).
+
+The full rating solver, ChillerLiBr1.iterate2, is sampled once over a box of
+external stream inlet temperatures, and the results are stored on a regular
+grid. Evaluating the map is then an interpolation, which is fast enough for
+annual simulations and controller design.
+
+Example::
+
+    chiller = libr3.ChillerLiBr1(T_evap=5, T_cond=40, m_pump=0.05)
+    chiller.setOutletTemperatures(35., 90.)
+    streams = dict(heat=se1(120., 0.3, 4179), absorberReject=se1(25., 1., 4179),
+                   condReject=se1(25., 1., 4179), cold=se1(12., 1., 4179))
+    UA = dict(gen=480., abs=1140., cond=1030., evap=2440.)
+    axes = dict(heat=np.linspace(100, 130, 7), cold=np.linspace(8, 16, 5))
+    pm = PerformanceMap.build(chiller, UA, streams, axes)
+    pm.save('../data/libr3_map.npz')
+    Q_evap = pm([[110., 12.], [125., 9.]], 'Q_evap_heat')
+    errors = pm.validate(pm.midpoints())
+"""
+import numpy as np
+import tabulate
+from scipy.interpolate import RegularGridInterpolator
+
+import libr3
+from HRHX_integral_model import streamExample1 as se1
+
+streamNames = "heat absorberReject condReject cold".split()
+hxNames = "gen abs cond evap".split()
+# Attributes of ChillerLiBr1 stored in the map by default.
+defaultOutputs = """Q_evap_heat Q_gen_total Q_abs_total Q_condenser_reject COP
+T_evap T_cond T_abs_outlet_max T_gen_outlet x1 x2""".split()
+# The internal temperatures that iterate2 solves for, in order.
+ratingOutputs = "T_evap T_cond T_abs_outlet_max T_gen_outlet".split()
+
+
+def _nearestSolved(solutions, index):
+    """Returns the solution at the solved grid point nearest to index (in
+    city block distance, the first in scan order on ties), or None."""
+    solved = np.argwhere(np.isfinite(solutions).all(axis=-1))
+    if len(solved) == 0:
+        return None
+    distance = np.abs(solved - np.array(index)).sum(axis=1)
+    return solutions[tuple(solved[np.argmin(distance)])]
+
+
+class PerformanceMap(object):
+    """A gridded map of chiller outputs over external inlet temperatures.
+
+    Inputs
+    ======
+    axes : list of (name, array)
+        Grid axes, in order. Each name is one of streamNames, and the array
+        holds the increasing inlet temperatures (deg C) of that stream.
+    values : dict
+        Maps output names to arrays with one dimension per axis. Points
+        where the rating solver failed are nan.
+    UA : dict
+        UA values (W/K) keyed by 'gen', 'abs', 'cond', 'evap'
+    streams : dict
+        External streams keyed by streamNames. Temperatures of streams that
+        are not axes stay fixed at their T_inlet.
+    m_pump, Eff_SHX : float
+        Chiller parameters held fixed while sampling.
+    method : string, optional
+        Interpolation method passed to RegularGridInterpolator, eg. 'linear'
+        (default) or 'cubic'.
+    """
+    def __init__(self, axes, values, UA, streams, m_pump, Eff_SHX,
+                 method='linear'):
+        self.axes = axes
+        self.values = values
+        self.UA = UA
+        self.streams = streams
+        self.m_pump = m_pump
+        self.Eff_SHX = Eff_SHX
+        self.method = method
+        self._interpolants = {}
+
+    @classmethod
+    def build(cls, chiller, UA, streams, axes, outputs=defaultOutputs,
+              method='linear', debug=False):
+        """Samples chiller.iterate2 over the grid given by axes.
+
+        Each solve is warm started from the nearest solved grid point, in
+        any direction, moved if need be to a feasible start (see
+        ChillerLiBr1.feasibleGuess). Points that fail are retried in a
+        second pass in reverse order.
+
+        Args
+        ----
+            chiller : libr3.ChillerLiBr1
+                Provides m_pump, Eff_SHX, and the starting point.
+            UA : dict
+                UA values (W/K) keyed by 'gen', 'abs', 'cond', 'evap'
+            streams : dict
+                External streams keyed by streamNames, eg. streamExample1.
+            axes : dict or list of (name, array)
+                The inlet temperatures of each varied stream.
+            outputs : list of string, optional
+                Attributes of the chiller to store.
+        """
+        if isinstance(axes, dict):
+            axes = list(axes.items())
+        axes = [(name, np.asarray(a, dtype=float)) for name, a in axes]
+        for name, a in axes:
+            if name not in streamNames:
+                raise ValueError("Unknown stream name '{}'".format(name))
+        streams = dict((name, se1(s.T_inlet, s.mdot, s.cp))
+                       for name, s in streams.items())
+        shape = tuple(len(a) for name, a in axes)
+        values = dict((name, np.full(shape, np.nan)) for name in outputs)
+        solutions = np.full(shape + (len(ratingOutputs),), np.nan)
+        order = list(np.ndindex(*shape))
+        # A second pass in reverse order retries the points that failed,
+        # now with solved neighbors on their other side.
+        for points in order, order[::-1]:
+            for index in points:
+                if np.isfinite(solutions[index]).all():
+                    continue
+                for (name, a), i in zip(axes, index):
+                    streams[name].T_inlet = a[i]
+                args = [streams[name] for name in streamNames]
+                guess = chiller.feasibleGuess(
+                    UA, *args, guess=_nearestSolved(solutions, index))
+                if guess is None:
+                    if debug:
+                        print("At {} found no feasible start".format(index))
+                    continue
+                try:
+                    solutions[index] = chiller.iterate2(UA, *args,
+                                                        guess=guess)
+                except ValueError as e:
+                    if debug:
+                        print("At {} caught {}".format(index, e))
+                    continue
+                for name in outputs:
+                    values[name][index] = getattr(chiller, name)
+        # Streams on an axis have no fixed inlet temperature.
+        for name, a in axes:
+            streams[name].T_inlet = np.nan
+        return cls(axes, values, UA, streams, chiller.m_pump, chiller.Eff_SHX,
+                   method)
+
+    def _interpolant(self, output):
+        if output not in self._interpolants:
+            self._interpolants[output] = RegularGridInterpolator(
+                [a for name, a in self.axes], self.values[output],
+                method=self.method, bounds_error=False, fill_value=np.nan)
+        return self._interpolants[output]
+
+    def __call__(self, points, output='Q_evap_heat'):
+        """Evaluates the map at points, an array of shape (..., len(axes))
+        with inlet temperatures in the order of self.axes. Returns nan
+        outside the box."""
+        return self._interpolant(output)(points)
+
+    def evaluate(self, points, outputs=None):
+        """Like __call__ but returns a dict of arrays, one per output."""
+        if outputs is None:
+            outputs = list(self.values)
+        return dict((name, self(points, name)) for name in outputs)
+
+    def midpoints(self):
+        """Returns the centers of all grid cells, which are the points
+        furthest from the samples and so make a natural hold-out set."""
+        centers = [0.5 * (a[1:] + a[:-1]) for name, a in self.axes]
+        grid = np.meshgrid(*centers, indexing='ij')
+        return np.stack([g.ravel() for g in grid], axis=-1)
+
+    def validate(self, points, outputs=None):
+        """Compares the map against the full model at the given points.
+
+        The rating solver at each point is started from the interpolated
+        internal temperatures, so it usually converges in a few steps.
+
+        Returns
+        -------
+            result : dict
+                Maps each output name to a tuple
+                (max absolute error, max relative error, number of points),
+                over the points where both the map and the model succeeded.
+        """
+        if outputs is None:
+            outputs = list(self.values)
+        points = np.atleast_2d(points)
+        mapped = self.evaluate(points, outputs)
+        guesses = self.evaluate(points, ratingOutputs) \
+            if set(ratingOutputs) <= set(self.values) else None
+        chiller = libr3.ChillerLiBr1(m_pump=self.m_pump,
+                                     Eff_SHX=self.Eff_SHX)
+        streams = dict((name, se1(s.T_inlet, s.mdot, s.cp))
+                       for name, s in self.streams.items())
+        exact = dict((name, np.full(len(points), np.nan)) for name in outputs)
+        for i, point in enumerate(points):
+            for (name, a), t in zip(self.axes, point):
+                streams[name].T_inlet = t
+            guess = None
+            if guesses is not None:
+                guess = [guesses[name][i] for name in ratingOutputs]
+            args = [streams[name] for name in streamNames]
+            guess = chiller.feasibleGuess(self.UA, *args, guess=guess)
+            if guess is None:
+                continue
+            try:
+                chiller.iterate2(self.UA, *args, guess=guess)
+            except ValueError:
+                continue
+            for name in outputs:
+                exact[name][i] = getattr(chiller, name)
+        result = {}
+        for name in outputs:
+            err = np.abs(mapped[name] - exact[name])
+            good = np.isfinite(err)
+            scale = np.abs(exact[name][good])
+            result[name] = (err[good].max(initial=0),
+                            (err[good] / np.where(scale > 0, scale, 1))
+                            .max(initial=0),
+                            good.sum())
+        self.validation = result
+        return result
+
+    def save(self, fname):
+        """Stores the map in a numpy .npz file."""
+        data = dict(axis_names=np.array([name for name, a in self.axes]),
+                    UA=np.array([self.UA[name] for name in hxNames]),
+                    stream_params=np.array([[self.streams[name].T_inlet,
+                                             self.streams[name].mdot,
+                                             self.streams[name].cp]
+                                            for name in streamNames]),
+                    chiller_params=np.array([self.m_pump, self.Eff_SHX]),
+                    method=np.array(self.method))
+        for name, a in self.axes:
+            data['axis_' + name] = a
+        for name, v in self.values.items():
+            data['value_' + name] = v
+        np.savez_compressed(fname, **data)
+
+    @classmethod
+    def load(cls, fname):
+        """Reads a map stored by save()."""
+        with np.load(fname) as f:
+            axes = [(name, f['axis_' + name]) for name in f['axis_names']]
+            values = dict((key[len('value_'):], f[key]) for key in f.files
+                          if key.startswith('value_'))
+            UA = dict(zip(hxNames, f['UA']))
+            streams = dict((name, se1(*row)) for name, row
+                           in zip(streamNames, f['stream_params']))
+            m_pump, Eff_SHX = f['chiller_params']
+            method = str(f['method'])
+        return cls(axes, values, UA, streams, m_pump, Eff_SHX, method)
+
+    def __repr__(self):
+        rows = [(name, a[0], a[-1], len(a)) for name, a in self.axes]
+        result = tabulate.tabulate(rows, "axis T_min T_max N".split())
+        ok = np.isfinite(self.values[list(self.values)[0]])
+        result += "\nsolved {} of {} grid points".format(ok.sum(), ok.size)
+        return result
@@ -163,6 +163,50 @@ def temperature(P,x):
     #print("Success, message: {}, {}".format(soln.success, soln.message))
     return soln.x[0]
 
+def _satProp(output, name, value, Q=0.):
+    """Evaluate a saturated water property, of the liquid by default or of
+    quality Q, over an array of any shape. CoolProp vectorizes PropsSI only
+    for one-dimensional inputs, and fails on the whole array if any entry is
+    nan, so nan inputs give nan."""
+    value = np.asarray(value, dtype=float)
+    result = np.full(value.size, np.nan)
+    finite = np.isfinite(value.ravel())
+    if finite.any():
+        result[finite] = PropsSI(output, name, value.ravel()[finite],
+                                 'Q', Q, 'water')
+    return np.reshape(result, value.shape)
+
+def temperatureArray(P,x):
+    """Vectorized form of temperature(P,x), for arrays of P and x.
+
+    Theta(T,x) from Table 4 is linear in T, so instead of calling a solver for
+    each point, the equation Theta(T,x) = T_sat,water(P) is inverted directly.
+
+    Units:
+        T [K]
+        x = mass fraction LiBr
+        P [bar]
+    """
+    a = [-2.41303e2, 1.91750e7, -1.75521e8, 3.25432e7,
+         3.92571e2, -2.12626e3, 1.85127e8, 1.91216e3] # [K]
+    m = [3,4,4,8,1,1,4,6]
+    n = [0,5,6,3,0,2,6,0]
+    t = [0,0,0,0,1,1,1,1]
+    T_c = 647.096 # [K]
+    P, x = np.broadcast_arrays(np.asarray(P, dtype=float),
+                               np.asarray(x, dtype=float))
+    theta = _satProp('T', 'P', P * 1e5) # [K]
+    x_N = molefraction(x)
+    # Theta = T - s0 - s1 * T / T_c
+    s0, s1 = 0, 0
+    for i in range(8):
+        term = a[i] * x_N**m[i] * (0.4-x_N)**n[i]
+        if t[i] == 0:
+            s0 = s0 + term
+        else:
+            s1 = s1 + term
+    return (theta + s0) / (1 - s1 / T_c)
+
 def objective_x(x,*TTheta):
     #print("T, Px = {}, {}".format(T,Px))
     T,Theta = TTheta
@@ -209,6 +253,39 @@ def massFraction(T,P,guess=(0.5,)):
     #print("Success, message: {}, {}".format(soln2.success, soln2.message))
     return soln2.x[0]
 
+def massFractionArray(T,P,xlim=(0.,0.75),iterations=60):
+    """Vectorized form of massFraction(T,P), for arrays of T and P.
+
+    Theta(T,x) is monotonically decreasing in x over the range of the
+    correlation, so a bracketed bisection is applied to all points at once.
+    Points where no solution exists within xlim are returned as nan.
+
+    Args
+    ----
+        T [K]
+            Temperature
+        P [bar]
+            Pressure
+
+    Outputs
+    -------
+        x [kg/kg]
+            Mass fraction LiBr
+    """
+    T, P = np.broadcast_arrays(np.asarray(T, dtype=float),
+                               np.asarray(P, dtype=float))
+    theta = _satProp('T', 'P', P * 1e5) # [K]
+    lo = np.full(T.shape, xlim[0])
+    hi = np.full(T.shape, xlim[1])
+    with np.errstate(invalid='ignore'):
+        valid = (thetaFun(T, lo)[0] >= theta) & (thetaFun(T, hi)[0] <= theta)
+    for i in range(iterations):
+        mid = 0.5 * (lo + hi)
+        above = thetaFun(T, mid)[0] > theta
+        lo = np.where(above, mid, lo)
+        hi = np.where(above, hi, mid)
+    return np.where(valid, 0.5 * (lo + hi), np.nan)
+
 def massSpecificEnthalpy(T,x):
     """Inputs:  T = Temperature / [Kelvin]
          x = mass fraction LiBr
@@ -250,6 +327,42 @@ Based on table 7 and equation (4) in reference.
     result = h_molar / MW # [J/kg]
     return result
 
+def massSpecificEnthalpyArray(T,x):
+    """Vectorized form of massSpecificEnthalpy(T,x), for arrays of T and x.
+    The water saturation enthalpy is evaluated in a single CoolProp call.
+
+    Inputs:  T = Temperature / [Kelvin]
+             x = mass fraction LiBr
+    Outputs: h = mass specific enthalpy / [J/kg]
+    """
+    a=[2.27431,-7.99511, 385.239,-16394,-422.562,0.113314,-8.33474,-17383.3,\
+    6.49763,3245.52,-13464.3,39932.2,-258877,-0.00193046,2.80616,-40.4479,\
+    145.342,-2.74873,-449.743,-12.1794,-0.00583739,0.233910,0.341888,8.85259,\
+    -17.8731,0.0735179,-0.000179430,0.00184261,-0.00624282,0.00684765]
+    m=[1,1,2,3,6,1,3,5,4,5,5,6,6,1,2,2,2,5,6,7,1,1,2,2,2,3,1,1,1,1]
+    n=[0,1,6,6,2,0,0,4,0,4,5,5,6,0,3,5,7,0,3,1,0,4,2,6,7,0,0,1,2,3]
+    t=[0,0,0,0,0,1,1,1,2,2,2,2,2,3,3,3,3,3,3,3,4,4,4,4,4,4,5,5,5,5]
+    T_crit = pwater.T_critical() # [K]
+    P_crit = pwater.p_critical()
+    state = AbstractState('HEOS','Water')
+    state.specify_phase(constants.iphase_critical_point)
+    state.update(constants.PT_INPUTS, P_crit, T_crit)
+    h_c = state.hmolar() # [J/mol] = [kJ/kmol]
+    T_c = T_crit # [K]
+    T_0 = 221. # [K] "is a nonlinear parameter of the equations"
+
+    TK, x = np.broadcast_arrays(np.asarray(T, dtype=float),
+                                np.asarray(x, dtype=float))
+    x_N = molefraction(x)
+    s = 0
+    for i in range(len(a)):
+        s = s + a[i] * x_N**m[i] * (0.4-x_N)**n[i] * (T_c/(TK-T_0))**t[i]
+    h_w_molar = _satProp('Hmolar', 'T', TK) - h_w_molar_ref # [J/mol]
+    h_molar = (1 - x_N) * h_w_molar + h_c * s # [J/mol]
+    MW = x_N * MW_LiBr + (1 - x_N) * MW_H2O # [kg/mol]
+    result = h_molar / MW # [J/kg]
+    return result
+
 def massSpecificEntropy(T,x):
     """Inputs:  T = Temperature / [Kelvin]
          x = mass fraction LiBr
@@ -294,6 +407,43 @@ Based on table 8 and equation (5) in reference.
     result = s_molar / MW
     return result
     
+def massSpecificEntropyArray(T,x):
+    """Vectorized form of massSpecificEntropy(T,x), for arrays of T and x.
+
+    Inputs:  T = Temperature / [Kelvin]
+             x = mass fraction LiBr
+    Outputs: s = mass specific entropy / [J/kg-K]
+    """
+    a=[1.53091,-4.52564, 698.302,-21666.4,-1475.33,0.0847012,-6.59523,
+       -29533.1,0.00956314,-0.188679,9.31752,5.78104,13893.1,-17176.2,
+       415.108,-55564.7,-0.00423409,30.5242,-1.67620,14.8283,0.00303055,
+       -0.0401810,0.149252,2.59240,-0.177421,-0.0000699650,0.000605007,
+       -0.00165228,0.00122966]
+    m = [1,1,2,3,6,1,3,5,1,2,2,4,5,5,6,6,1,3,5,7,1,1,1,2,3,1,1,1,1]
+    n = [0,1,6,6,2,0,0,4,0,0,4,0,4,5,2,5,0,4,0,1,0,2,4,7,1,0,1,2,3]
+    t = [0,0,0,0,0,1,1,1,2,2,2,2,2,2,2,2,3,3,3,3,4,4,4,4,4,5,5,5,5]
+    T_c = 647.096 # [K]
+    T_0 = 221 # [K] "is a nonlinear parameter of the equations"
+    T_crit = pwater.T_critical() # [K]
+    P_crit = pwater.p_critical() # [Pa]
+    state = AbstractState('HEOS','Water')
+    state.specify_phase(constants.iphase_critical_point)
+    state.update(constants.PT_INPUTS, P_crit, T_crit)
+    s_c = state.smolar() # J/mol-K
+
+    TK, x = np.broadcast_arrays(np.asarray(T, dtype=float),
+                                np.asarray(x, dtype=float))
+    x_N = molefraction(x)
+    s = 0
+    for i in range(len(a)):
+         s = s + a[i] * x_N ** m[i] * (0.4 - x_N) ** n[i] \
+             * (T_c / (TK - T_0)) ** t[i]
+    s_w_molar = _satProp('Smolar', 'T', TK) # J/mol-K
+    s_molar = (1 - x_N) * s_w_molar + s_c * s
+    MW = x_N * MW_LiBr + (1 - x_N) * MW_H2O
+    result = s_molar / MW
+    return result
+
 def massSpecificHeat(T,x):
     """Inputs:  T = Temperature / [Kelvin]
          x = mass fraction LiBr
@@ -323,6 +473,34 @@ Based on Table 6 and equation (3) of reference.
     result = Cp_molar / MW
     return result
     
+def massSpecificHeatArray(T,x):
+    """Vectorized form of massSpecificHeat(T,x), for arrays of T and x.
+
+    Inputs:  T = Temperature / [Kelvin]
+             x = mass fraction LiBr
+    Outputs: cp = mass specific heat / [J/kg-K]
+    """
+    a = [-14.2094,40.4943,111.135,229.980,
+         1345.26,-0.0141010,0.0124977,-0.000683209]
+    m = [2,3,3,3,3,2,1,1]
+    n = [0,0,1,2,3,0,3,2]
+    t = [0,0,0,0,0,2,3,4]
+    Cp_t = 76.0226 # [J/mol-K]
+    T_c=647.096 # [K]
+    T_0 = 221 # [K] "is a nonlinear parameter of the equations"
+    TK, x = np.broadcast_arrays(np.asarray(T, dtype=float),
+                                np.asarray(x, dtype=float))
+    x_N = molefraction(x)
+    s=0
+    for i in range(len(a)):
+        s = s + a[i] * x_N ** m[i] * (0.4 - x_N) ** n[i] \
+            * (T_c / (TK - T_0)) ** t[i]
+    Cp_w_molar = _satProp('Cpmolar', 'T', TK) # J/mol-K
+    Cp_molar = (1 - x_N) * Cp_w_molar + Cp_t * s
+    MW = x_N * MW_LiBr + (1 - x_N) * MW_H2O
+    result = Cp_molar / MW
+    return result
+
 def twoPhaseProps(h,P,z):
     """Some notes.
     This function returns the quality, temperature and liquid composition of a
@@ -380,6 +558,44 @@ def twoPhaseProps(h,P,z):
     #print "TwoPhaseProps converged at iter = ", iter
     return Q, T, x
 
+def twoPhasePropsArray(h,P,z):
+    """Vectorized form of twoPhaseProps(h,P,z), for arrays of h, P and z.
+    The same successive substitution is applied to all points at once,
+    until every point has converged. Points that have no solution, eg. with
+    nan inputs, give nan.
+
+    Inputs:
+        h is enthalpy / [J/kg]
+        P is pressure / [bar].
+        z is the overall lithium bromide mass fraction [kg/kg].
+
+    Outputs:
+        Q is the quality (or vapor fraction) on a mass basis [kg/kg].
+        T is temperature / [K].
+        x is the lithium bromide mass fraction of the liquid phase [kg/kg].
+    """
+    h, P, z = np.broadcast_arrays(np.asarray(h, dtype=float),
+                                  np.asarray(P, dtype=float),
+                                  np.asarray(z, dtype=float))
+    T = temperatureArray(P, z)
+    hL = massSpecificEnthalpyArray(T, z)
+    subcooled = h <= hL
+    Q = np.where(subcooled, np.where(h == hL, 0., -100.), 0.1)
+    x = np.array(z)
+    for iter in range(100):
+        Qlast = Q
+        x = np.where(subcooled, z, z / (1. - Q))
+        T = temperatureArray(P, x)
+        hL = massSpecificEnthalpyArray(T, x)
+        hv = _satProp('H', 'T', T, 1.)
+        Q = np.where(h > hL, (h - hL) / (hv - hL), 0.)
+        Q = np.where(subcooled, Qlast, Q)
+        # Points with no solution (nan h, or P and x out of range) stay nan.
+        Q = np.where(np.isnan(h - hL), np.nan, Q)
+        if (np.isnan(Q) | (np.abs(Q - Qlast) < 0.00001)).all() and (iter > 5):
+            break
+    return Q, T, x
+
 def massSpecificGibbs(T,x):
     h = massSpecificEnthalpy(T,x) # [J/kg]
     s = massSpecificEntropy(T,x) # [J/kg-K]
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+A persistent, content-addressed cache for Problem.lookup results.
+
+Each evaluation is stored in its own small JSON file, named by a SHA-256
+digest of the model namespace, a context list (model version, UA goal,
+boundary conditions and their class names) and the exact bytes of the
+input vector. Files are
+written to a temporary name and then renamed into place, which is atomic,
+so any number of processes may share a folder without locks: a reader sees
+either no entry or a complete one, and two writers of the same key write the
+same result.
+
+Failed evaluations are stored too, with their error message, so repeated or
+restarted optimizations skip them as well.
+
+Example::
+
+    p = system_aqua1.Problem(bdry, 100, cache='../cache')
+    p.lookup(x)            # computed and stored
+    p = system_aqua1.Problem(bdry, 100, cache='../cache')
+    p.lookup(x)            # read from disk
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+def describe(obj):
+    """Returns a list with the class name of obj, then floats for its
+    numeric attributes, in order of name, recursing into attributes that
+    are objects. Used to put boundary conditions (eg. a Boundary of
+    streamExample1) into a key; the class names keep apart objects of
+    different kinds that happen to hold the same numbers."""
+    result = [type(obj).__name__]
+    for name in sorted(vars(obj)):
+        value = getattr(obj, name)
+        if isinstance(value, (int, float, np.number)) \
+                and not isinstance(value, bool):
+            result.append(float(value))
+        elif hasattr(value, '__dict__'):
+            result.extend(describe(value))
+    return result
+
+
+def _sameValues(a, b):
+    """Whether two lists of floats and strings are equal, with nan equal
+    to nan."""
+    if len(a) != len(b):
+        return False
+    for u, v in zip(a, b):
+        if isinstance(u, str) or isinstance(v, str):
+            if u != v:
+                return False
+        elif not (u == v or (np.isnan(u) and np.isnan(v))):
+            return False
+    return True
+
+
+class LookupCache(object):
+    """A folder of stored Problem.lookup results.
+
+    Inputs
+    ======
+    folder : string
+        The root folder, created if needed. Entries go in
+        folder/namespace/ab/abcd....json.
+    namespace : string
+        Separates models, eg. 'system_aqua1'.
+    context : sequence of float or string
+        Everything besides the input vector that the result depends on,
+        eg. [modelVersion, UAgoal] + describe(bdry).
+    """
+    def __init__(self, folder, namespace='', context=()):
+        self.folder = folder
+        self.namespace = namespace
+        self.context = [c if isinstance(c, str) else float(c)
+                        for c in context]
+        self._prefix = hashlib.sha256(namespace.encode('utf-8'))
+        # JSON writes floats with repr, which round trips exactly.
+        self._prefix.update(json.dumps(self.context).encode('utf-8'))
+
+    def key(self, x):
+        """Returns the hex digest for input vector x."""
+        h = self._prefix.copy()
+        h.update(np.asarray(x, dtype=np.double).tobytes())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, self.namespace, key[:2],
+                            key + '.json')
+
+    def get(self, x):
+        """Returns the stored entry (a dict) for x, or None."""
+        try:
+            with open(self._path(self.key(x))) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Guard against a digest collision, however unlikely.
+        if not _sameValues(entry.get('x', []),
+                           [float(v) for v in np.ravel(x)]) \
+                or not _sameValues(entry.get('context', []), self.context):
+            return None
+        return entry
+
+    def put(self, x, Q, cons, error=None, elapsed=None):
+        """Stores a result for x. error is the message of a failed
+        evaluation, or None. Returns the entry."""
+        entry = dict(x=[float(v) for v in np.ravel(x)],
+                     context=self.context,
+                     Q=float(Q),
+                     cons=[float(c) for c in cons],
+                     error=None if error is None else str(error),
+                     elapsed=elapsed,
+                     time=time.time(),
+                     pid=os.getpid())
+        path = self._path(self.key(x))
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, temp = tempfile.mkstemp(suffix='.tmp', dir=folder)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(temp, path)
+        except BaseException:
+            os.remove(temp)
+            raise
+        return entry
+
+    def __contains__(self, x):
+        return self.get(x) is not None
+
+    def entries(self):
+        """Yields every stored entry in the namespace, for any context."""
+        root = os.path.join(self.folder, self.namespace)
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in sorted(filenames):
+                if name.endswith('.json'):
+                    try:
+                        with open(os.path.join(dirpath, name)) as f:
+                            yield json.load(f)
+                    except (OSError, ValueError):
+                        continue
+
+    def __repr__(self):
+        return "LookupCache({}, namespace={}, context={})".format(
+            self.folder, self.namespace, self.context)
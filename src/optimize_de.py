@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+A population based global optimizer, differential evolution, that evaluates
+each generation concurrently, for the system_aqua1 studies.
+
+Constraints follow the convention of scipy.optimize: each c(x) >= 0 where
+feasible. Instead of penalty weights, candidates are compared by Deb's
+feasibility rules: a feasible point beats an infeasible one, two feasible
+points compare by objective, and two infeasible points by their total
+violation, sum(max(0, -c)). So the search is pulled into the feasible region
+first and then along it, with nothing to tune.
+
+All random numbers come from one seeded generator in the parent process, and
+results are gathered in order, so a run is reproducible for a given seed
+whatever the number of workers.
+
+Example::
+
+    xB = [400, 1, 305, 3, 305, 5, 285, 4, 305, 0.15]
+    opt = optimizeAqua(xB, 100, maxevals=3000, seed=1, workers=8,
+                       cache='../cache')
+    opt.x, -opt.fun, opt.maxcv
+"""
+import concurrent.futures
+import threading
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+
+def violation(cons):
+    """Total constraint violation, sum(max(0, -c)). nan counts as inf."""
+    c = np.asarray(cons, dtype=float)
+    v = np.where(np.isnan(c), np.inf, np.maximum(0., -c))
+    return float(v.sum())
+
+
+def better(f1, v1, f2, v2):
+    """Deb's feasibility rules: whether (f1, v1) is at least as good as
+    (f2, v2), where f is the objective (minimized) and v the violation."""
+    if v1 == 0 and v2 == 0:
+        return f1 <= f2
+    return v1 <= v2
+
+
+def differentialEvolution(func, bounds, maxevals=1000, popsize=None,
+                          F=(0.5, 1.0), CR=0.9, seed=None, x0=None,
+                          workers=1, executor='process', initializer=None,
+                          initargs=(), callback=None, disp=False):
+    """Minimizes func(x), which returns (f, cons), subject to cons >= 0.
+
+    Uses the rand/1/bin strategy. Each generation makes one trial per
+    member, evaluates them all, and keeps each trial that is at least as
+    good as its parent by the feasibility rules.
+
+    Args
+    ----
+        func : callable
+            Maps x to (objective, sequence of constraints). For a process
+            pool it must be picklable, eg. a module level function.
+        bounds : sequence of (lo, hi)
+            Box for each variable. Trials are kept inside it.
+        maxevals : int
+            Budget of calls to func, including the initial population. The
+            last generation is cut short to keep within it.
+        popsize : int, optional
+            Population size (default 10 per variable, at least 5), cut to
+            maxevals. Must be at least 4, since each mutant is made from
+            three members other than its parent.
+        F : float or (float, float)
+            Mutation scale, or a range to draw it from each generation.
+        CR : float
+            Crossover probability.
+        seed : int, optional
+            Seed for numpy.random.default_rng.
+        x0 : array, optional
+            Included in the initial population, which is otherwise a Latin
+            hypercube sample of the bounds.
+        workers : int
+            Size of the pool. 1 (default) evaluates in this process.
+        executor : string or concurrent.futures.Executor
+            'process' (default) or 'thread' to create a pool, or an
+            existing pool to use, whose workers must already be set up.
+        initializer, initargs : optional
+            Passed to a created pool, and also called here in serial mode,
+            to set up per process state such as a Problem. An existing pool
+            gives no way to reach each of its workers, so initializer may
+            not be combined with one.
+        callback : callable, optional
+            Called as callback(result) after each generation with the best
+            so far; returning True stops the search.
+
+    Returns
+    -------
+        result : OptimizeResult
+            With x, fun, cons, maxcv, success (whether x is feasible),
+            nfev, nit, message, population and population_fun.
+    """
+    rng = np.random.default_rng(seed)
+    bounds = np.asarray(bounds, dtype=float)
+    lo, hi = bounds[:, 0], bounds[:, 1]
+    dim = len(bounds)
+    if popsize is None:
+        popsize = max(5, 10 * dim)
+    popsize = min(popsize, maxevals)
+    if popsize < 4:
+        raise ValueError("popsize (after limiting to maxevals) is {}, but "
+                         "must be at least 4".format(popsize))
+    isPool = isinstance(executor, concurrent.futures.Executor)
+    if isPool and initializer is not None:
+        raise ValueError("initializer cannot be run on the workers of an "
+                         "existing executor")
+    # Latin hypercube: one point in each of popsize strata per variable.
+    u = (rng.permuted(np.tile(np.arange(popsize), (dim, 1)), axis=1).T
+         + rng.random((popsize, dim))) / popsize
+    population = lo + u * (hi - lo)
+    if x0 is not None:
+        population[0] = np.clip(x0, lo, hi)
+
+    pool, own = None, False
+    if isPool:
+        pool = executor
+    elif workers > 1:
+        Pool = dict(process=concurrent.futures.ProcessPoolExecutor,
+                    thread=concurrent.futures.ThreadPoolExecutor)[executor]
+        pool, own = Pool(max_workers=workers, initializer=initializer,
+                         initargs=initargs), True
+    elif initializer is not None:
+        initializer(*initargs)
+
+    def evaluate(points):
+        if pool is None:
+            results = [func(x) for x in points]
+        else:
+            results = list(pool.map(func, points))
+        f = np.array([float(r[0]) for r in results])
+        f = np.where(np.isnan(f), np.inf, f)
+        cons = [np.asarray(r[1], dtype=float) for r in results]
+        v = np.array([violation(c) for c in cons])
+        return f, v, cons
+
+    try:
+        fun, viol, cons = evaluate(population)
+        nfev, nit, message = popsize, 0, "Maximum number of evaluations"
+        while nfev < maxevals:
+            n = min(popsize, maxevals - nfev)
+            scale = rng.uniform(*F) if np.ndim(F) else F
+            trials = population[:n].copy()
+            for i in range(n):
+                others = [j for j in range(popsize) if j != i]
+                a, b, c = population[rng.choice(others, 3, replace=False)]
+                mutant = a + scale * (b - c)
+                cross = rng.random(dim) < CR
+                cross[rng.integers(dim)] = True
+                trial = np.where(cross, mutant, population[i])
+                # Reflect back into the box, then clip any remainder.
+                trial = np.where(trial < lo, 2 * lo - trial, trial)
+                trial = np.where(trial > hi, 2 * hi - trial, trial)
+                trials[i] = np.clip(trial, lo, hi)
+            f, v, c = evaluate(trials)
+            nfev += n
+            nit += 1
+            for i in range(n):
+                if better(f[i], v[i], fun[i], viol[i]):
+                    population[i], fun[i], viol[i] = trials[i], f[i], v[i]
+                    cons[i] = c[i]
+            best = _best(fun, viol)
+            if disp:
+                print("generation {}: nfev = {}, f = {}, maxcv = {}".format(
+                    nit, nfev, fun[best], viol[best]))
+            if callback is not None and callback(
+                    _result(population, fun, viol, cons, nfev, nit, "")):
+                message = "Stopped by callback"
+                break
+    finally:
+        if own:
+            pool.shutdown()
+    return _result(population, fun, viol, cons, nfev, nit, message)
+
+
+def _best(fun, viol):
+    """Index of the best member by the feasibility rules."""
+    feasible = viol == 0
+    if feasible.any():
+        return int(np.flatnonzero(feasible)[np.argmin(fun[feasible])])
+    return int(np.argmin(viol))
+
+
+def _result(population, fun, viol, cons, nfev, nit, message):
+    i = _best(fun, viol)
+    return OptimizeResult(x=population[i].copy(), fun=fun[i], cons=cons[i],
+                          maxcv=viol[i], success=bool(viol[i] == 0),
+                          nfev=nfev, nit=nit, message=message,
+                          population=population.copy(),
+                          population_fun=fun.copy())
+
+
+def defaultBounds(xB):
+    """A box for the chiller inputs of system_aqua1.makeChiller, given the
+    boundary xB of makeBoundary: the evaporator below the cold inlet, and
+    the condenser, rectifier, absorber and generator outlet between the
+    reject and heat inlets."""
+    t_heat, m_heat, t_abs, m_abs, t_cond, m_cond, t_cold, m_cold, \
+        t_rect, m_rect = xB
+    return [(0.01, 1.),
+            (t_cold - 30., t_cold),
+            (t_cond, t_heat),
+            (max(t_cond, t_rect), t_heat),
+            (t_abs, t_heat),
+            (max(t_abs, t_cond), t_heat)]
+
+
+# Per worker state. Thread local, so that each thread of a thread pool has
+# its own Problem, whose lookup appends to its input and output.
+_worker = threading.local()
+
+
+def _initAqua(xB, U, cache):
+    """Builds the Problem that _lookupAqua uses in this worker."""
+    import system_aqua1
+    _worker.problem = system_aqua1.Problem(system_aqua1.makeBoundary(xB), U,
+                                           cache=cache)
+
+
+def _lookupAqua(x):
+    Q, cons = _worker.problem.lookup(np.array(x, dtype=float))
+    return -Q, cons
+
+
+def optimizeAqua(xB, U, bounds=None, maxevals=2000, seed=None, x0=None,
+                 workers=1, cache=None, **kwargs):
+    """Maximizes the cooling capacity of system_aqua1 at boundary xB with
+    UA goal U, subject to all the Problem constraints.
+
+    Each worker, process or thread, builds its own Problem (and a process
+    loads the property library once). With cache, a folder, evaluations are shared between the
+    workers and later runs; see lookupcache. Other keyword arguments go to
+    differentialEvolution, except that executor may only name a pool type,
+    'process' or 'thread', since the workers of an existing pool would have
+    no Problem.
+
+    Returns the OptimizeResult of differentialEvolution, where fun is -Q.
+    """
+    if isinstance(kwargs.get('executor'), concurrent.futures.Executor):
+        raise ValueError("optimizeAqua creates its own pool; pass executor="
+                         "'process' or 'thread' with workers instead")
+    if bounds is None:
+        bounds = defaultBounds(xB)
+    return differentialEvolution(_lookupAqua, bounds, maxevals=maxevals,
+                                 seed=seed, x0=x0, workers=workers,
+                                 initializer=_initAqua,
+                                 initargs=(list(xB), U, cache), **kwargs)
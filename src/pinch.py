@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+Pinch analysis for many streams at once: hot and cold composite curves, the
+grand composite curve, and the minimum utility targets.
+
+Streams follow the convention of HRHX_integral_model: each has q(T), the
+cumulative heat into the stream from its inlet, and T(q). A stream enters
+the analysis with its duty Q, positive for a cold stream (heated from T(0)
+to T(Q)) and negative for a hot stream (cooled from T(0) to T(Q)).
+
+All stream curves are evaluated once on a common grid of shifted
+temperatures, so the targets are cheap enough to screen designs inside an
+optimizer.
+
+Example::
+
+    streams = [(se1(170., 3.), -330.), (se1(150., 1.5), -180.),
+               (se1(20., 2.), 230.), (se1(80., 4.), 240.)]
+    pa = PinchAnalysis(streams, deltaT_min=10.)
+    pa.Q_hot_min, pa.Q_cold_min, pa.T_pinch   # 20, 60, 85
+
+    pa = PinchAnalysis.fromSystem(system_aqua1.System(boundary, chiller))
+"""
+import numpy as np
+import tabulate
+
+from HRHX_integral_model import streamBreakpoints
+
+
+class PinchAnalysis(object):
+    """Composite curves and utility targets for a set of streams.
+
+    Inputs
+    ======
+    streams : list of (stream, Q), or dict of name: (stream, Q)
+        Stream curves with their duties. Q > 0 for cold streams, Q < 0 for
+        hot streams.
+    deltaT_min : float
+        Minimum approach temperature. Hot streams are shifted down, and cold
+        streams up, by half of it.
+    n : int
+        Number of evenly spaced points in the shifted temperature grid. The
+        supply and target temperatures and the stream knots are added.
+
+    Attributes
+    ==========
+    T : array
+        The shifted temperature grid, increasing.
+    H_hot, H_cold : array
+        Hot and cold composite curves: the heat hot streams give while
+        cooling from T (shifted) down to their targets, and the heat cold
+        streams take to warm from their supply temperatures up to T.
+    cascade : array
+        Net heat surplus of everything above T, with no hot utility.
+    gcc : array
+        Grand composite curve, cascade + Q_hot_min.
+    Q_hot_min, Q_cold_min : float
+        Minimum hot and cold utility.
+    T_pinch : float
+        Shifted pinch temperature, or nan if the problem is threshold
+        (needs only one utility).
+    """
+    def __init__(self, streams, deltaT_min=0., n=201):
+        if isinstance(streams, dict):
+            self.names = list(streams)
+            streams = list(streams.values())
+        else:
+            self.names = [str(i) for i in range(len(streams))]
+        self.streams = streams
+        self.deltaT_min = deltaT_min
+        shift = 0.5 * deltaT_min
+        self.Q = np.array([Q for s, Q in streams], dtype=float)
+        self.isHot = self.Q < 0
+        # Shifted supply and target temperatures.
+        sign = np.where(self.isHot, -1., 1.)
+        self.T_supply = np.array([float(s.T(0.)) for s, Q in streams]) \
+            + sign * shift
+        self.T_target = np.array([float(s.T(Q)) for s, Q in streams]) \
+            + sign * shift
+
+        T_lo = min(self.T_supply.min(), self.T_target.min())
+        T_hi = max(self.T_supply.max(), self.T_target.max())
+        knots = [np.linspace(T_lo, T_hi, n), self.T_supply, self.T_target]
+        for (s, Q), sg in zip(streams, sign):
+            bp = streamBreakpoints(s) + sg * shift
+            bp = bp[(bp > T_lo) & (bp < T_hi)]
+            # Either side of a knot, to resolve isothermal steps.
+            delta = 1e-9 * (T_hi - T_lo)
+            knots.extend([bp - delta, bp, bp + delta])
+        self.T = np.unique(np.concatenate(knots))
+
+        # Heat content of each stream on the grid, one row per stream.
+        self.H = np.empty((len(streams), len(self.T)))
+        for i, ((s, Q), sg) in enumerate(zip(streams, sign)):
+            q = np.asarray(s.q(self.T - sg * shift), dtype=float)
+            if Q < 0:
+                # Heat released in cooling from T down to the target.
+                self.H[i] = np.clip(q - Q, 0, -Q)
+            else:
+                # Heat taken in warming from the supply up to T.
+                self.H[i] = np.clip(q, 0, Q)
+        self.H_hot = self.H[self.isHot].sum(axis=0)
+        self.H_cold = self.H[~self.isHot].sum(axis=0)
+
+        # The problem table cascade, from the top down.
+        self.cascade = (self.H_hot[-1] - self.H_hot) \
+            - (self.H_cold[-1] - self.H_cold)
+        i = np.argmin(self.cascade)
+        self.Q_hot_min = max(0., -self.cascade[i])
+        self.gcc = self.cascade + self.Q_hot_min
+        self.Q_cold_min = self.gcc[0]
+        if 0 < i < len(self.T) - 1 and self.cascade[i] < 0:
+            self.T_pinch = self.T[i]
+        else:
+            self.T_pinch = np.nan
+
+    @classmethod
+    def fromSystem(cls, system, deltaT_min=0., external=False, **kwargs):
+        """Builds the analysis for the streams of a System's heat exchangers.
+
+        Args
+        ----
+            system : system_aqua1.System or system_libr3.System
+                Provides hxs (counterflow_integrators) and Q (duties).
+            external : bool
+                If False (default), include only the chiller's own streams,
+                which shows how much heat they could recover internally.
+                If True, include the boundary streams as well.
+        """
+        boundary = [getattr(system.boundary, name) for name
+                    in vars(system.boundary)]
+        streams = {}
+        for name, hx in system.hxs.items():
+            Q = system.Q[name]
+            for side, s, q in (('cold', hx.cold, Q), ('hot', hx.hot, -Q)):
+                if external or not any(s is b for b in boundary):
+                    streams['{}_{}'.format(name, side)] = (s, q)
+        return cls(streams, deltaT_min, **kwargs)
+
+    def hotComposite(self):
+        """Returns (H, T) of the hot composite curve in actual temperatures."""
+        return self.H_hot, self.T + 0.5 * self.deltaT_min
+
+    def coldComposite(self):
+        """Returns (H, T) of the cold composite curve in actual
+        temperatures, offset by Q_cold_min so that the curves touch at the
+        pinch."""
+        return self.H_cold + self.Q_cold_min, self.T - 0.5 * self.deltaT_min
+
+    @property
+    def Q_recovery(self):
+        """Heat recovered between hot and cold streams at the targets."""
+        return self.H_hot[-1] - self.Q_cold_min
+
+    def plot(self):
+        import matplotlib.pyplot as plt
+        fig, (ax1, ax2) = plt.subplots(1, 2, sharey=True)
+        ax1.plot(*self.hotComposite(), 'r-', label="hot")
+        ax1.plot(*self.coldComposite(), 'b-', label="cold")
+        ax1.set_xlabel("H")
+        ax1.set_ylabel("T")
+        ax1.legend(loc='best')
+        ax2.plot(self.gcc, self.T, 'k-')
+        ax2.set_xlabel("Net heat flow")
+        ax2.set_title("Grand composite")
+        return fig
+
+    def _rows(self):
+        return [("Q_hot_min", self.Q_hot_min),
+                ("Q_cold_min", self.Q_cold_min),
+                ("Q_recovery", self.Q_recovery),
+                ("T_pinch (shifted)", self.T_pinch),
+                ("deltaT_min", self.deltaT_min)]
+
+    def __repr__(self):
+        return tabulate.tabulate(self._rows(), "name value".split())
+
+    def _repr_html_(self):
+        return tabulate.tabulate(self._rows(), "name value".split(),
+                                 tablefmt='html')
@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+Compact, versioned storage for stream curves, heat exchanger profiles and
+System summaries.
+
+A result file is a numpy .npz archive of plain arrays plus one entry,
+'__header__', holding a JSON document with the format name and version,
+the kind of result, free-form metadata, and the name, shape and dtype of
+every array. Nothing is pickled, so files are small, quick to write, and
+readable without the code (or the scipy version) that made them.
+
+Opening a file reads only the zip directory and the header. Arrays are read
+one at a time on first access, so a tool can scan the metadata of thousands
+of results and load just the columns it needs.
+
+Example::
+
+    cold = HRHX_integral_model.streamExample1(20., 1., 4.)
+    saveStream('cold.npz', cold, 200., name='cold')
+    s = loadStream('cold.npz')          # a curveStream
+    s.T(100.), s.q(45.)
+
+    saveProfile('gen.npz', counterflowPoints(hx.cold, hx.hot, Q))
+    with ResultFile('gen.npz') as f:
+        f.meta, f['profile/deltaT'].min()
+
+    saveSystem('sys.npz', system_aqua1.System(boundary, chiller))
+    df = index('../data13')             # metadata of every result file
+"""
+import glob
+import json
+import os
+import zipfile
+
+import numpy as np
+import pandas
+import tabulate
+
+from HRHX_integral_model import monotoneCubic, sampleCurve, profileType, \
+    segmentType
+
+FORMAT = 'hrhx-result'
+VERSION = 1
+_headerKey = '__header__'
+
+
+def _jsonable(value):
+    """Converts numpy scalars and arrays in metadata to plain Python."""
+    if isinstance(value, dict):
+        return dict((str(k), _jsonable(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return _jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def write(fname, kind, arrays, meta=None, compressed=True):
+    """Writes arrays and a header to a result file.
+
+    Args
+    ----
+        fname : string
+            Output path. numpy adds '.npz' if it is missing.
+        kind : string
+            What the file holds, eg. 'stream', 'profile' or 'system'.
+        arrays : dict
+            Maps names to arrays. Names may contain '/' to group columns.
+            Arrays must have a numeric, bool or unicode dtype, since object
+            arrays would need pickle.
+        meta : dict, optional
+            Scalars, strings and lists stored in the header.
+        compressed : bool
+            Whether to deflate the arrays (default True).
+    """
+    arrays = dict((name, np.asarray(a)) for name, a in arrays.items())
+    for name, a in arrays.items():
+        if a.dtype.hasobject:
+            raise ValueError("Array '{}' has object dtype".format(name))
+    header = dict(format=FORMAT, version=VERSION, kind=kind,
+                  meta=_jsonable(meta or {}),
+                  arrays=dict((name, dict(shape=list(a.shape),
+                                          dtype=a.dtype.str))
+                              for name, a in arrays.items()))
+    arrays[_headerKey] = np.frombuffer(json.dumps(header).encode('utf-8'),
+                                       dtype=np.uint8)
+    if compressed:
+        np.savez_compressed(fname, **arrays)
+    else:
+        np.savez(fname, **arrays)
+
+
+class ResultFile(object):
+    """A result file opened for lazy reading.
+
+    Inputs
+    ======
+    fname : string
+        Path of a file made by write().
+
+    Attributes
+    ==========
+    header : dict
+        The decoded JSON header.
+    kind, version, meta : from the header
+    files : list of string
+        Names of the stored arrays.
+
+    Index the object by name to read an array; each is read from disk once
+    and then kept. Use as a context manager, or call close(), to release the
+    file handle.
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self._npz = np.load(fname, allow_pickle=False)
+        try:
+            self.header = json.loads(
+                self._npz[_headerKey].tobytes().decode('utf-8'))
+        except (KeyError, zipfile.BadZipFile):
+            self._npz.close()
+            raise ValueError("{} is not a result file".format(fname))
+        if self.header.get('format') != FORMAT:
+            self._npz.close()
+            raise ValueError("{} has format {}, expected {}".format(
+                fname, self.header.get('format'), FORMAT))
+        if self.header['version'] > VERSION:
+            self._npz.close()
+            raise ValueError("{} has version {}, newer than {}".format(
+                fname, self.header['version'], VERSION))
+        self.kind = self.header['kind']
+        self.version = self.header['version']
+        self.meta = self.header['meta']
+        self.files = list(self.header['arrays'])
+        self._cache = {}
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            self._cache[name] = self._npz[name]
+        return self._cache[name]
+
+    def __contains__(self, name):
+        return name in self.header['arrays']
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def group(self, prefix):
+        """Returns the names under prefix/ (without the prefix)."""
+        start = prefix + '/'
+        return [name[len(start):] for name in self.files
+                if name.startswith(start)]
+
+    def table(self, prefix, dtype=None):
+        """Reassembles a record array stored as columns prefix/field."""
+        fields = self.group(prefix)
+        if dtype is None:
+            dtype = np.dtype([(f, self.header['arrays'][prefix + '/' + f]
+                               ['dtype']) for f in fields])
+        result = np.zeros(len(self[prefix + '/' + dtype.names[0]]),
+                          dtype=dtype)
+        for name in dtype.names:
+            result[name] = self[prefix + '/' + name]
+        return result
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _rows(self):
+        return [(name, tuple(info['shape']), info['dtype'])
+                for name, info in self.header['arrays'].items()]
+
+    def __repr__(self):
+        result = "{} (kind = {}, version = {})\n".format(
+            self.fname, self.kind, self.version)
+        result += tabulate.tabulate(self.meta.items(), "meta value".split())
+        result += "\n\n" + tabulate.tabulate(self._rows(),
+                                             "array shape dtype".split())
+        return result
+
+    def _repr_html_(self):
+        return tabulate.tabulate(self.meta.items(), "meta value".split(),
+                                 tablefmt='html') \
+            + tabulate.tabulate(self._rows(), "array shape dtype".split(),
+                                tablefmt='html')
+
+
+def _columns(prefix, records):
+    """Splits a record array into arrays named prefix/field."""
+    return dict(('{}/{}'.format(prefix, name), records[name])
+                for name in records.dtype.names)
+
+
+def index(folder, pattern='*.npz', kind=None):
+    """Reads just the headers of the result files in folder.
+
+    Returns a pandas.DataFrame with one row per file, indexed by file name,
+    with columns 'kind', 'version' and the metadata keys. Files that are
+    not result files are skipped.
+    """
+    rows, names = [], []
+    for fname in sorted(glob.glob(os.path.join(folder, pattern))):
+        try:
+            with ResultFile(fname) as f:
+                if kind is not None and f.kind != kind:
+                    continue
+                row = dict(kind=f.kind, version=f.version)
+                row.update(f.meta)
+        except (ValueError, OSError, KeyError, zipfile.BadZipFile):
+            # Not a result file, or truncated or missing header fields.
+            continue
+        rows.append(row)
+        names.append(fname)
+    return pandas.DataFrame(rows, index=names)
+
+
+class curveStream(object):
+    """A stream given by a table of (q, T), as stored in a result file.
+
+    T(q) is a monotoneCubic through the knots, and q(T) is its inverse, so
+    round trips agree. At the temperature of an isothermal plateau, such as
+    boiling, q(T) gives the point of the plateau nearest q = 0, as
+    waterStream does. Optional segments and zones are passed through from
+    the original stream.
+
+    Inputs
+    ======
+    q, T : array
+        Knots, with q increasing.
+    segments, zones : (edges, kinds) or None
+    """
+    def __init__(self, q, T, segments=None, zones=None):
+        q, T = np.asarray(q, dtype=float), np.asarray(T, dtype=float)
+        self._segments = segments
+        self._zones = zones
+        # Plateaus as (T, q_start, q_end), from runs of knots with equal T.
+        flat = np.flatnonzero(np.diff(T) == 0)
+        runs = [r for r in np.split(flat, np.flatnonzero(np.diff(flat) > 1)
+                                    + 1) if len(r)]
+        self._plateaus = [(T[r[0]], q[r[0]], q[r[-1] + 1]) for r in runs]
+        # Break the curve at the plateau ends, which Pchip would round.
+        self.T = monotoneCubic(q, T, breaks=[i for r in runs
+                                             for i in (r[0], r[-1] + 1)])
+
+    def q(self, T):
+        q = self.T.inverse(T)
+        for T_p, q_start, q_end in self._plateaus:
+            q = np.where(T == T_p, np.clip(0., q_start, q_end), q)
+        return q if np.ndim(q) else float(q)
+
+    def segments(self):
+        if self._segments is None:
+            return np.array([-np.inf, np.inf]), ['curve']
+        return self._segments
+
+    def zones(self):
+        if self._zones is None:
+            return np.array([-np.inf, np.inf]), ['single-phase']
+        return self._zones
+
+    def __repr__(self):
+        return "curveStream with {} knots, q from {} to {}".format(
+            len(self.T.x), self.T.x[0], self.T.x[-1])
+
+
+def streamArrays(stream, Q, tol=0.01, maxpoints=200, prefix='stream'):
+    """Tabulates a stream's T(q) for q between 0 and Q.
+
+    A stream whose T is already a monotoneCubic keeps its own knots.
+    Otherwise each of its segments within the range is sampled with
+    sampleCurve to within tol (in T), so that kinks fall on knots.
+
+    Returns a dict of arrays prefix/q and prefix/T, plus prefix/segment_edges
+    and so on, if the stream has segments() or zones().
+    """
+    lo, hi = min(0., Q), max(0., Q)
+    if isinstance(stream.T, monotoneCubic):
+        q = np.asarray(stream.T.x, dtype=float)
+        T = np.asarray(stream.T.y, dtype=float)
+    else:
+        edges = [lo, hi]
+        for method in ('segments', 'zones'):
+            if hasattr(stream, method):
+                e = np.asarray(getattr(stream, method)()[0], dtype=float)
+                edges.extend(e[(e > lo) & (e < hi)])
+        edges = np.unique(edges)
+        q, T = [], []
+        for a, b in zip(edges[:-1], edges[1:]):
+            t, qq, TT = sampleCurve(lambda q: (q, float(stream.T(q))), a, b,
+                                    tol=tol, maxpoints=maxpoints,
+                                    truncate=False)
+            q.append(qq)
+            T.append(TT)
+        q, i = np.unique(np.concatenate(q), return_index=True)
+        T = np.concatenate(T)[i]
+    result = {prefix + '/q': q, prefix + '/T': T}
+    for method, label in (('segments', 'kinds'), ('zones', 'phases')):
+        if hasattr(stream, method):
+            edges, kinds = getattr(stream, method)()
+            result['{}/{}_edges'.format(prefix, method[:-1])] = \
+                np.asarray(edges, dtype=float)
+            result['{}/{}_{}'.format(prefix, method[:-1], label)] = \
+                np.asarray(kinds, dtype=str)
+    return result
+
+
+def streamFromArrays(f, prefix='stream'):
+    """Builds a curveStream from the arrays in a ResultFile (or dict)."""
+    pieces = {}
+    for method, label in (('segment', 'kinds'), ('zone', 'phases')):
+        key = '{}/{}_edges'.format(prefix, method)
+        if key in f:
+            pieces[method + 's'] = (f[key], [str(k) for k in
+                f['{}/{}_{}'.format(prefix, method, label)]])
+    return curveStream(f[prefix + '/q'], f[prefix + '/T'], **pieces)
+
+
+def saveStream(fname, stream, Q, tol=0.01, compressed=True, **meta):
+    """Stores the curve of stream between q = 0 and Q, with keyword
+    arguments as metadata."""
+    meta.update(Q=Q, T_in=float(stream.T(0.)), T_out=float(stream.T(Q)))
+    write(fname, 'stream', streamArrays(stream, Q, tol), meta, compressed)
+
+
+def loadStream(fname):
+    """Reads a stream stored by saveStream as a curveStream."""
+    with ResultFile(fname) as f:
+        return streamFromArrays(f)
+
+
+def saveProfile(fname, profile, compressed=True, **meta):
+    """Stores a counterflowPoints profile, one array per column."""
+    meta.update(Q=profile.Q, UA=float(profile.UA[-1]),
+                deltaT_min=float(profile.deltaT.min()))
+    write(fname, 'profile', _columns('profile', profile.toArray()), meta,
+          compressed)
+
+
+def loadProfile(fname):
+    """Reads a profile stored by saveProfile as an array of profileType."""
+    with ResultFile(fname) as f:
+        return f.table('profile', profileType)
+
+
+def saveSystem(fname, system, curves=False, compressed=True, **meta):
+    """Stores the summary of a system_aqua1 or system_libr3 System.
+
+    The table System.df (or System.data, for system_libr3) goes to arrays
+    summary/<column>, with the heat exchanger names in summary/name, and
+    each heat exchanger's segment table, if any, to columns
+    segments/<name>/<field>. If curves, the cold
+    and hot stream curves of each heat exchanger are stored as well, under
+    streams/<name>/cold and streams/<name>/hot.
+    """
+    if hasattr(system, 'df'):
+        df = system.df
+    else:
+        # system_libr3 keeps rows of (name, deltaT, epsilon, UA, Q).
+        df = pandas.DataFrame([row[1:] for row in system.data],
+                              index=[row[0] for row in system.data],
+                              columns='deltaT epsilon UA Q'.split())
+    arrays = {'summary/name': np.array(list(df.index), dtype=str)}
+    for column in df.columns:
+        arrays['summary/' + column] = df[column].to_numpy(dtype=float)
+    for name, table in getattr(system, 'segments', {}).items():
+        arrays.update(_columns('segments/' + name, table))
+    if curves:
+        for name, hx in system.hxs.items():
+            Q = system.Q[name]
+            arrays.update(streamArrays(hx.cold, Q,
+                                       prefix='streams/{}/cold'.format(name)))
+            arrays.update(streamArrays(hx.hot, -Q,
+                                       prefix='streams/{}/hot'.format(name)))
+    chiller = system.chiller
+    for attr in ('Q_evap', 'Q_evap_heat', 'COP'):
+        if hasattr(chiller, attr):
+            meta.setdefault(attr, float(getattr(chiller, attr)))
+    meta.setdefault('totalUA', float(df['UA'].sum()))
+    write(fname, 'system', arrays, meta, compressed)
+
+
+class systemSummary(object):
+    """A System summary read back from a result file.
+
+    Attributes
+    ==========
+    df : pandas.DataFrame
+        Like System.df.
+    segments : dict
+        Segment tables (segmentType) keyed by heat exchanger name.
+    meta : dict
+        The metadata, eg. Q_evap and totalUA.
+    """
+    def __init__(self, df, segments, meta, streams=None):
+        self.df = df
+        self.segments = segments
+        self.meta = meta
+        self.streams = streams or {}
+
+    def __repr__(self):
+        return tabulate.tabulate(self.df, headers='keys')
+
+    def _repr_html_(self):
+        return self.df.to_html()
+
+
+def loadSystem(fname, curves=False):
+    """Reads a summary stored by saveSystem as a systemSummary. If curves,
+    also rebuilds the stored stream curves as curveStreams, in
+    systemSummary.streams[name] = (cold, hot)."""
+    with ResultFile(fname) as f:
+        names = [str(name) for name in f['summary/name']]
+        columns = [c for c in f.group('summary') if c != 'name']
+        df = pandas.DataFrame(dict((c, f['summary/' + c]) for c in columns),
+                              index=names)
+        segments = dict((name, f.table('segments/' + name, segmentType))
+                        for name in names
+                        if 'segments/{}/Q'.format(name) in f)
+        streams = {}
+        if curves:
+            for name in names:
+                if 'streams/{}/cold/q'.format(name) in f:
+                    streams[name] = tuple(
+                        streamFromArrays(f, 'streams/{}/{}'.format(name, side))
+                        for side in ('cold', 'hot'))
+        return systemSummary(df, segments, f.meta, streams)
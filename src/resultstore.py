@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+An append-only, columnar store of system_aqua1 optimization results.
+
+A store is a folder of chunks. Each chunk is a result file (see resultio)
+holding equal length columns: the boundary conditions, the UA goal, the
+optimizer inputs, objective and constraints of every evaluation, the
+timing, and the run's outcome. Appending writes a new chunk under a unique
+name and renames it into place, so writers never touch existing files and
+need no locks.
+
+Each chunk header records the minimum and maximum of every indexed column
+(by default the boundary fields and U). A query reads only the headers to
+rule out chunks, then only the columns it needs from the rest.
+
+The old per-run pickles in ../data*/ load with importPickles, which needs
+neither the model code nor the property library.
+
+Example::
+
+    store = ResultStore('../store')
+    importPickles(store, glob.glob('../data*'))
+    df = store.query(T_condReject=(300, 320), U=100,
+                     columns=['T_condReject', 'Q', 'cons'])
+"""
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+import pandas
+import tabulate
+
+import resultio
+
+# Columns of the boundary vector xB, in the order of makeBoundary.
+boundaryFields = """T_heat m_heat T_absorberReject m_absorberReject
+T_condReject m_condReject T_cold m_cold T_rectifierReject m_rectifierReject
+""".split()
+# Columns of the chiller input vector x, in the order of makeChiller.
+inputFields = "m_rich T_evap T_cond T_rect T_abs_outlet T_gen_outlet".split()
+Ncons = 11
+
+
+class ResultStore(object):
+    """A folder of chunks of columnar results.
+
+    Inputs
+    ======
+    folder : string
+        Created if needed.
+    indexed : list of string
+        Columns whose range is recorded in each chunk header, for queries.
+    """
+    def __init__(self, folder, indexed=boundaryFields + ['U']):
+        self.folder = folder
+        self.indexed = list(indexed)
+        os.makedirs(folder, exist_ok=True)
+        self._headers = {}
+
+    def append(self, columns, **meta):
+        """Writes columns (a dict of arrays of equal length) as a new
+        chunk, with keyword arguments as metadata. Returns its path."""
+        columns = dict((name, np.asarray(a)) for name, a in columns.items())
+        rows = set(len(a) for a in columns.values())
+        if len(rows) != 1:
+            raise ValueError("Columns have lengths {}".format(sorted(rows)))
+        meta['rows'] = rows.pop()
+        meta['index'] = dict((name, [float(np.nanmin(columns[name])),
+                                     float(np.nanmax(columns[name]))])
+                             for name in self.indexed
+                             if name in columns and meta['rows'] > 0
+                             and not np.isnan(columns[name]).all())
+        fname = os.path.join(self.folder, 'chunk_{:020d}_{}.npz'.format(
+            time.time_ns(), os.getpid()))
+        fd, temp = tempfile.mkstemp(prefix='.tmp_', suffix='.npz',
+                                    dir=self.folder)
+        os.close(fd)
+        try:
+            resultio.write(temp, 'chunk', columns, meta)
+            os.replace(temp, fname)
+        except BaseException:
+            os.remove(temp)
+            raise
+        return fname
+
+    def chunks(self):
+        """Returns the chunk paths in order of writing."""
+        return sorted(glob.glob(os.path.join(self.folder, 'chunk_*.npz')))
+
+    def headers(self):
+        """Returns {path: header} for every chunk. Headers are read once
+        and kept, since chunks never change."""
+        for fname in self.chunks():
+            if fname not in self._headers:
+                with resultio.ResultFile(fname) as f:
+                    self._headers[fname] = f.header
+        return self._headers
+
+    def _matches(self, header, conditions):
+        """Whether a chunk may hold rows meeting the conditions."""
+        index = header['meta'].get('index', {})
+        for name, value in conditions.items():
+            if name not in index:
+                if name not in header['arrays']:
+                    return False
+                continue
+            lo, hi = index[name]
+            a, b = value if isinstance(value, tuple) else (value, value)
+            if b < lo - 1e-9 * abs(lo) or a > hi + 1e-9 * abs(hi):
+                return False
+        return True
+
+    def query(self, columns=None, **conditions):
+        """Returns a pandas.DataFrame of the rows meeting all conditions.
+
+        Each keyword names a column and gives a value, matched to within
+        a relative 1e-9 (or exactly, for text columns such as run), or a
+        tuple (lo, hi), inclusive. columns lists the
+        columns to return (default all). Two dimensional columns, such as
+        cons, are split into cons_0, cons_1, and so on.
+        """
+        frames = []
+        for fname, header in sorted(self.headers().items()):
+            if header['meta']['rows'] == 0 \
+                    or not self._matches(header, conditions):
+                continue
+            with resultio.ResultFile(fname) as f:
+                mask = np.ones(header['meta']['rows'], dtype=bool)
+                for name, value in conditions.items():
+                    if name not in f:
+                        mask[:] = False
+                        break
+                    a = f[name]
+                    if isinstance(value, tuple):
+                        mask &= (a >= value[0]) & (a <= value[1])
+                    elif a.dtype.kind in 'US':
+                        mask &= a == value
+                    else:
+                        mask &= np.isclose(a, value, rtol=1e-9, atol=0)
+                if not mask.any():
+                    continue
+                names = f.files if columns is None else columns
+                data = {}
+                for name in names:
+                    if name not in f:
+                        continue
+                    a = f[name][mask]
+                    if a.ndim == 2:
+                        for i in range(a.shape[1]):
+                            data['{}_{}'.format(name, i)] = a[:, i]
+                    else:
+                        data[name] = a
+                frames.append(pandas.DataFrame(data))
+        if not frames:
+            return pandas.DataFrame()
+        return pandas.concat(frames, ignore_index=True)
+
+    def sources(self):
+        """Returns the set of 'source' metadata of all chunks."""
+        return set(h['meta'].get('source') for h in self.headers().values())
+
+    def __len__(self):
+        return sum(h['meta']['rows'] for h in self.headers().values())
+
+    def __repr__(self):
+        rows = [(os.path.basename(fname), h['meta']['rows'],
+                 h['meta'].get('source'))
+                for fname, h in sorted(self.headers().items())]
+        return "ResultStore {} with {} rows\n".format(self.folder, len(self)) \
+            + tabulate.tabulate(rows, "chunk rows source".split())
+
+
+def _hasher(x):
+    """The key of Problem.output, as system_aqua1.hasher."""
+    return hashlib.md5(np.asarray(x, dtype=np.double)).hexdigest()
+
+
+def problemColumns(xB, p, opt=None, err=None):
+    """Returns the columns for all evaluations of a system_aqua1.Problem,
+    one row per entry of p.input, with the boundary xB and the run's
+    outcome repeated on every row."""
+    n = len(p.input)
+    columns = {}
+    xB = np.asarray(xB, dtype=float)
+    for name, value in zip(boundaryFields, xB):
+        columns[name] = np.full(n, value)
+    columns['U'] = np.full(n, float(p.UAgoal))
+    x = np.array(p.input, dtype=float).reshape(n, len(inputFields))
+    for i, name in enumerate(inputFields):
+        columns[name] = x[:, i]
+    columns['step'] = np.arange(n)
+    Q = np.full(n, np.nan)
+    cons = np.full((n, Ncons), np.nan)
+    elapsed = np.full(n, np.nan)
+    timing = getattr(p, 'elapsed', {})
+    for i, xi in enumerate(x):
+        h = _hasher(xi)
+        if h in p.output:
+            q, c = p.output[h]
+            Q[i] = q
+            cons[i, :len(c)] = np.asarray(c, dtype=float)[:Ncons]
+        elapsed[i] = timing.get(h, np.nan)
+    columns['Q'] = Q
+    columns['cons'] = cons
+    columns['elapsed'] = elapsed
+    columns['run'] = np.full(n, _hasher(xB))
+    columns['status'] = np.full(n, getattr(opt, 'status', -1)
+                                if opt is not None else -1, dtype=int)
+    columns['error'] = np.full(n, '' if err is None else repr(err))
+    return columns
+
+
+def appendProblem(store, xB, p, opt=None, err=None, source=''):
+    """Appends the evaluations of a Problem as one chunk."""
+    return store.append(problemColumns(xB, p, opt, err), source=source,
+                        run=_hasher(xB), U=float(p.UAgoal),
+                        success=bool(getattr(opt, 'success', False)))
+
+
+class _Record(object):
+    """Stands in for classes of the model modules when reading old
+    pickles, keeping just their attributes."""
+    pass
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """Reads the pickles of makeOrGetProblemForBoundary without importing
+    system_aqua1 (and so the property library). Model classes become
+    _Record, bound methods become their names, and modules that scipy has
+    since renamed are mapped to their new place."""
+    renamed = {'scipy.optimize.optimize': 'scipy.optimize',
+               'scipy.optimize.lbfgsb': 'scipy.optimize'}
+
+    def find_class(self, module, name):
+        if module in ('system_aqua1', 'HRHX_integral_model'):
+            return type(name, (_Record,), {})
+        if (module, name) == ('builtins', 'getattr'):
+            return lambda obj, attr: '{}.{}'.format(type(obj).__name__, attr)
+        module = self.renamed.get(module, module)
+        return super().find_class(module, name)
+
+
+def importPickles(store, folders, pattern='system_aqua1_*.pkl'):
+    """Imports the pickles of makeOrGetProblemForBoundary from folders,
+    one chunk per file. Files already in the store (by source path) are
+    skipped, so importing again picks up only new files. Returns the
+    number of files imported."""
+    if isinstance(folders, str):
+        folders = [folders]
+    done = store.sources()
+    count = 0
+    for folder in folders:
+        for fname in sorted(glob.glob(os.path.join(folder, pattern))):
+            source = os.path.abspath(fname)
+            if source in done:
+                continue
+            with open(fname, 'rb') as f:
+                xB, bdry, p, opt, err = _LegacyUnpickler(f).load()
+            appendProblem(store, xB, p, opt, err, source)
+            count += 1
+    return count
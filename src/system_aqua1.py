@@ -16,6 +16,13 @@ from scipy.special import expit
 import hashlib
 import pickle
 import pandas
+import concurrent.futures
+import time
+import os
+from lookupcache import LookupCache, describe
+
+# Part of the key of cached lookups; bump it when the model changes results.
+modelVersion = 1
 
 def makeBoundary(x):
     """Given a iterable x that represents 5 stream inlets as T,m pairs,
@@ -106,9 +113,52 @@ class Boundary(object):
                                  tablefmt='html')
 
 
+def _sizeExchanger(cold, hot, Q, delta_t_min):
+    """Runs calcUA3Segments for one heat exchanger. At module level so
+    that a process pool can pickle it."""
+    return hxci(cold, hot).calcUA3Segments(Q, delta_t_min)
+
+
+def mapJobs(func, jobs, workers=None, executor='thread'):
+    """Returns [func(*job) for job in jobs], optionally on a pool.
+
+    Inputs
+    ======
+    workers : int, optional
+        Size of the pool. None or 1 (default) runs the jobs in order in
+        this thread.
+    executor : string or concurrent.futures.Executor, optional
+        'thread' (default) or 'process' to create a pool for these jobs, or
+        an existing pool to reuse, in which case workers is ignored.
+
+    Results are in the order of jobs whatever the mode, so callers see the
+    same values as in serial mode.
+    """
+    if isinstance(executor, concurrent.futures.Executor):
+        return list(executor.map(func, *zip(*jobs)))
+    if workers is None or workers <= 1:
+        return [func(*job) for job in jobs]
+    if executor == 'thread':
+        Pool = concurrent.futures.ThreadPoolExecutor
+    elif executor == 'process':
+        Pool = concurrent.futures.ProcessPoolExecutor
+    else:
+        raise ValueError("Unknown executor {}".format(executor))
+    with Pool(max_workers=workers) as pool:
+        return list(pool.map(func, *zip(*jobs)))
+
+
 class System(object):
-    def __init__(self, boundary, chiller, delta_t_min=0.1):
-        """delta_t_min is passed to heat exchanger UA calculation."""
+    def __init__(self, boundary, chiller, delta_t_min=0.1, workers=None,
+                 executor='thread'):
+        """delta_t_min is passed to heat exchanger UA calculation.
+
+        The five heat exchangers are sized independently once the streams
+        are built, so with workers > 1 (or an Executor as executor) they
+        run concurrently; see mapJobs. The streams are still built here in
+        order, since they call the property library. A process pool needs
+        picklable streams, and pays to start up, so pass a long lived one
+        as executor when making many Systems."""
         self.boundary = boundary
         self.chiller = chiller
 
@@ -126,7 +176,8 @@ class System(object):
 
         self.totalUA = 0
         self.data = []
-        self.df = pandas.DataFrame(columns='deltaT epsilon UA Q error'.split(),
+        self.segments = {}
+        self.df = pandas.DataFrame(columns='deltaT epsilon UA Q error deltaT_min'.split(),
                                    index='gen rect abs cond evap'.split())
         # for name in self.hxs:
         #     self.hxs[name].calcQmax()
@@ -139,12 +190,18 @@ class System(object):
         #     self.data.append((name, deltaT, epsilon, UA, self.Q[name]))
         #     self.totalUA += UA
 
-        for name in self.hxs:
+        names = list(self.hxs)
+        results = mapJobs(_sizeExchanger,
+                          [(self.hxs[name].cold, self.hxs[name].hot,
+                            self.Q[name], delta_t_min) for name in names],
+                          workers, executor)
+        for name, (UA, error, segments) in zip(names, results):
             delta_t_max = self.hxs[name].hot.T(0) - self.hxs[name].cold.T(0)
-            UA, error = self.hxs[name].calcUA3(self.Q[name], delta_t_min)
+            self.segments[name] = segments
             #delta_t = self.hxs[name].calcDistanceT(self.Q[name])
             delta_t = delta_t_max
-            self.df.loc[name] = delta_t, 0, UA, self.Q[name], error
+            self.df.loc[name] = delta_t, 0, UA, self.Q[name], error, \
+                self.segments[name]['deltaT_min'].min()
 
 
     def __repr__(self):
@@ -160,6 +217,12 @@ class System(object):
         modified_df.append(total_row, ignore_index=True)
         return modified_df.to_html()
 
+    def save(self, fname, curves=False, **meta):
+        """Stores the summary (and optionally stream curves) in a result
+        file, see resultio.saveSystem."""
+        import resultio
+        resultio.saveSystem(fname, self, curves, **meta)
+
     def display(self):
         import matplotlib.pyplot as plt
         for name in self.hxs:
@@ -242,6 +305,14 @@ class Problem(object):
     mu : float, optional
         Scale over which constraints send the objective to zero, eg.
         ``objective *= expit(constraint/mu)``. Default = 0.1.
+    workers : int, optional
+        Passed to System, to size the heat exchangers concurrently.
+    executor : string, optional
+        Passed to System, 'thread' (default) or 'process'.
+    cache : string or LookupCache, optional
+        A folder for results of lookup() that persist between runs and are
+        shared between processes. Keys include modelVersion, UAgoal and the
+        boundary, besides the input vector.
         
     Attributes
     ==========
@@ -255,15 +326,25 @@ class Problem(object):
     output : dict
         Each keys is the hash of an input vector; values are (Q,cons) where
         Q is the cooling capacity and cons are the raw constraint values.
+    elapsed : dict
+        Seconds spent computing each output, by the same keys.
     """
 
-    def __init__(self, bdry, UAgoal, constraintMode=None, mu=0.1):
+    def __init__(self, bdry, UAgoal, constraintMode=None, mu=0.1,
+                 workers=None, executor='thread', cache=None):
         self.bdry = bdry
+        self.workers = workers
+        self.executor = executor
+        if isinstance(cache, str):
+            cache = LookupCache(cache, 'system_aqua1',
+                                [modelVersion, UAgoal] + describe(bdry))
+        self.cache = cache
         self.UAgoal = UAgoal
         self.constraintMode = constraintMode
         self.mu = 0.1
         self.input = []
         self.output = dict()
+        self.elapsed = dict()
         self.Ncons = 11
         if constraintMode == None:
             # Soft constraints mode: this is sent to minimizer
@@ -321,25 +402,41 @@ class Problem(object):
         h = hasher(x)
         if h in self.output:
             return self.output[h]
+        # Problems pickled before the cache existed lack it.
+        cache = getattr(self, 'cache', None)
+        entry = cache.get(x) if cache is not None else None
+        if entry is not None:
+            self.input.append(x.copy())
+            self.output[h] = (entry['Q'], entry['cons'])
+            return self.output[h]
         else:
             self.input.append(x.copy())
+            start, error = time.time(), None
             cons = [x[0],
                     x[2] - x[1],
                     x[3] - x[2],
                     x[5] - x[3],
                     x[5] - x[4]]
             try:
-                sys = System(self.bdry, makeChiller(x))
+                # Problems pickled before workers existed lack them.
+                sys = System(self.bdry, makeChiller(x),
+                             workers=getattr(self, 'workers', None),
+                             executor=getattr(self, 'executor', 'thread'))
                 Q = sys.chiller.Q_evap
                 for name, deltaT, epsilon, UA, Qhx in sys.data:
                     cons.append(deltaT)
                 cons.append(self.UAgoal - sys.totalUA)
             except Exception as e:
                 print("At {} caught {}".format(h, e))
+                error = e
                 Q = 0
                 while len(cons) < self.Ncons:
                     cons.append(-1)
             self.output[h] = (Q, cons)
+            if hasattr(self, 'elapsed'):
+                self.elapsed[h] = time.time() - start
+            if cache is not None:
+                cache.put(x, Q, cons, error, time.time() - start)
             if printing:
                 print("@ hash {:15}, maxcv = {:12.5f}, Q = {:12.5f}".format(h, -min(cons), Q))
 
@@ -419,7 +516,8 @@ def hasher(x):
     return h
 
 
-def makeOrGetProblemForBoundary(xB, U, xC, method=None, options=None, folder='data', create=False):
+def makeOrGetProblemForBoundary(xB, U, xC, method=None, options=None, folder='data', create=False,
+                                store=None):
     """Wrap the minimizer and problem with disk storage.
     If the given boundary constraint has been tried before, the data file
     in ``folder`` will be loaded to save time.
@@ -441,6 +539,9 @@ def makeOrGetProblemForBoundary(xB, U, xC, method=None, options=None, folder='da
     create : bool, optional
         Whether optimization should proceed if the problem is not found on disk
         (defaults to False).
+    store : string or resultstore.ResultStore, optional
+        If given, the evaluations of a newly created case are also appended
+        to this columnar store.
     
     Returns
     =======
@@ -489,6 +590,12 @@ def makeOrGetProblemForBoundary(xB, U, xC, method=None, options=None, folder='da
             data = xB, bdry, p, opt, err
             with open(fname, 'wb') as f:
                 pickle.dump(data, f)
+            if store is not None:
+                import resultstore
+                if isinstance(store, str):
+                    store = resultstore.ResultStore(store)
+                resultstore.appendProblem(store, xB, p, opt, err,
+                                          os.path.abspath(fname))
 
     return xB, bdry, p, opt, err
 
@@ -16,7 +16,10 @@ from scipy.special import expit, logit
 from hw2_1 import CelsiusToKelvin as C2K
 from hw2_1 import KelvinToCelsius as K2C
 
+import time
+
 import libr3
+from lookupcache import LookupCache, describe
 from HRHX_integral_model import streamExample1 as se1, \
     counterflow_integrator as hxci, \
     plotFlow as plotFlow
@@ -226,6 +229,12 @@ class System(object):
         result += "\ntotalUA = {}".format(self.totalUA)
         return result
     
+    def save(self, fname, curves=False, **meta):
+        """Stores the summary (and optionally stream curves) in a result
+        file, see resultio.saveSystem."""
+        import resultio
+        resultio.saveSystem(fname, self, curves, **meta)
+    
     def display(self):
         import matplotlib.pyplot as plt
         figs = []
@@ -306,15 +315,31 @@ class objectivePair(object):
             print("Returning zero anyway")
             return 0
             
+# Part of the key of cached lookups; bump it when the model changes results.
+modelVersion = 1
+
 class Problem(object):
-    def __init__(self,bdry,UAgoal):
+    """Objective and constraints for optimizing the chiller at a boundary.
+
+    cache, optional, is a folder (or LookupCache) where results of lookup()
+    persist between runs and processes.
+
+    As in system_aqua1.Problem, an evaluation that fails gives Q = 0 with
+    the missing constraints set to -1, and is stored like any other. Every
+    evaluation, computed or read from the cache, is appended to input."""
+    def __init__(self,bdry,UAgoal,cache=None):
         self.bdry = bdry
         self.UAgoal = UAgoal
+        if isinstance(cache, str):
+            cache = LookupCache(cache, 'system_libr3',
+                                [modelVersion, UAgoal] + describe(bdry))
+        self.cache = cache
         self.input = []
         self.output = dict()
+        self.Ncons = 11
         self.constraints=[{'type':'ineq',
                            'fun':self.constraint,
-                           'args':(i,)} for i in range(11)]
+                           'args':(i,)} for i in range(self.Ncons)]
     def objective(self,x):
         Q,cons = self.lookup(x)
         return -Q
@@ -330,10 +355,13 @@ class Problem(object):
         #print "Hashed x to {}".format(h)
         if h in self.output:
             return self.output[h]
+        entry = self.cache.get(x) if self.cache is not None else None
+        if entry is not None:
+            self.input.append(x.copy())
+            self.output[h] = (entry['Q'], entry['cons'])
+            return self.output[h]
         else:
             self.input.append(x.copy())
-            sys = System(self.bdry,makeChiller(x))
-            Q = sys.chiller.Q_evap_heat
             # m_pump,T_evap,T_cond,x1,x2 = x
             cons = [x[0],
                 x[1] - 0,
@@ -341,10 +369,22 @@ class Problem(object):
                 x[3] - 0.4,
                 x[4] - x[3],
                 0.7 - x[4]]
-            for name, deltaT, epsilon, UA, Qhx in sys.data:
-                cons.append(deltaT)
-            cons.append(self.UAgoal - sys.totalUA)
+            start, error = time.time(), None
+            try:
+                sys = System(self.bdry,makeChiller(x))
+                Q = sys.chiller.Q_evap_heat
+                for name, deltaT, epsilon, UA, Qhx in sys.data:
+                    cons.append(deltaT)
+                cons.append(self.UAgoal - sys.totalUA)
+            except Exception as e:
+                print("At {} caught {}".format(h, e))
+                error = e
+                Q = 0
+                while len(cons) < self.Ncons:
+                    cons.append(-1)
             self.output[h] = (Q,cons)
+            if self.cache is not None:
+                self.cache.put(x, Q, cons, error, time.time() - start)
             return Q,cons
 
 def main():
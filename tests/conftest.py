@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+The modules in src import each other by plain name, so put src on the path.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+
+import pytest
+
+
+class _NoAmmoniaProps(object):
+    """Stands in for ammonia_props.AmmoniaProps where its Windows-only
+    library can't load, so that modules which make one at import time
+    (ammonia1, and so system_aqua1) can still be imported."""
+    def props2(self, *args, **kwargs):
+        raise NotImplementedError("No ammonia property library here")
+
+
+@pytest.fixture(scope='session')
+def system_aqua1():
+    """Imports system_aqua1, stubbing the ammonia property library if it
+    is not available on this platform."""
+    import ammonia_props
+    try:
+        ammonia_props.AmmoniaProps()
+    except (AttributeError, OSError):
+        ammonia_props.AmmoniaProps = _NoAmmoniaProps
+    import system_aqua1
+    return system_aqua1
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+aquaStream tables and saturation enthalpies are built once per state, with
+a stand-in for the Windows-only ammonia_props library (user-038).
+"""
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+
+
+class FakeAmmoniaProps(object):
+    """T = 250 + h / 20 K, with bubble and dew points at h = 1000 and
+    2000, independent of P and x. Counts calls to props2."""
+    calls = 0
+
+    def props2(self, P, x, T=None, h=None, Qu=None):
+        FakeAmmoniaProps.calls += 1
+        if Qu is not None:
+            h = 1000. + 1000. * Qu
+        elif T is not None:
+            h = 20. * (T - 250.)
+        return types.SimpleNamespace(P=P, x=x, h=h, T=250. + h / 20.)
+
+
+@pytest.fixture
+def amm(monkeypatch):
+    module = types.ModuleType('ammonia_props')
+    module.AmmoniaProps = FakeAmmoniaProps
+    monkeypatch.setitem(sys.modules, 'ammonia_props', module)
+    monkeypatch.setattr(hx, '_ammoniaProps', None)
+    monkeypatch.setattr(hx, '_aquaTables', {})
+    monkeypatch.setattr(hx, '_aquaSaturation', {})
+    FakeAmmoniaProps.calls = 0
+    return FakeAmmoniaProps
+
+
+def inlet(h, P=5., x=0.4):
+    return types.SimpleNamespace(P=P, x=x, h=h, T=250. + h / 20.)
+
+
+def test_saturation_cached(amm):
+    s = hx.aquaStream(inlet(500.), 2.)
+    built = amm.calls
+    assert (s.h_liq, s.h_vap, s.h_sat) == (1000., 2000., 1000.)
+    for i in range(5):
+        s.h_sat, s.zones()
+    hx.aquaStream(inlet(500.), 3.)
+    assert amm.calls == built
+
+
+def test_h_sat(amm):
+    assert hx.aquaStream(inlet(2500.), 1.).h_sat == 2000.
+    assert hx.aquaStream(inlet(1500.), 1.).h_sat == 1500.
+
+
+def test_zones(amm):
+    edges, phases = hx.aquaStream(inlet(500.), 2.).zones()
+    np.testing.assert_allclose(edges, [-np.inf, 1000., 3000., np.inf])
+    assert phases == ['subcooled', 'two-phase', 'superheated']
+
+
+def test_curve(amm):
+    s = hx.aquaStream(inlet(500.), 2.)
+    T = np.array([260., 300., 350.])
+    np.testing.assert_allclose(s.q(T), 2. * (20. * (T - 250.) - 500.),
+                               rtol=1e-8)
+    np.testing.assert_allclose(s.T(s.q(T)), T, rtol=1e-8)
+
+
+def test_no_extrapolation(amm):
+    # Beyond the table the curve gives nan, for scalars and arrays alike.
+    s = hx.aquaStream(inlet(500.), 2., 260., 300.)
+    assert np.isnan(s.q(310.)) and np.isnan(s.q(255.))
+    assert np.isnan(s.T(s.q(300.) + 1.))
+    T = np.array([255., 260., 280., 300., 310.])
+    q = s.q(T)
+    assert np.isnan(q[[0, -1]]).all()
+    np.testing.assert_allclose(q[1:-1], 2. * (20. * (T[1:-1] - 250.) - 500.),
+                               rtol=1e-8)
+    assert np.isnan(s.T(np.array([q[1] - 1., q[3] + 1.]))).all()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Breakpoint scans for Qmax and the pinch (user-032), against closed forms
+and a dense scan.
+"""
+import numpy as np
+
+import HRHX_integral_model as hx
+
+
+def test_qmax_two_isothermal_streams():
+    # From the module's example: the local optimizer gets this one wrong.
+    cold = hx.streamExample2(-5., 100., 1., 1., 10.)
+    hot = hx.streamExample2(15., 100., 1., 1., 10.)
+    ci = hx.counterflow_integrator(cold, hot)
+    Qmax, T_pinch, q_pinch = ci.calcQmax(extra=True, method='breakpoints')
+    # Both change phase at 100. The cold stream can be heated to the hot
+    # inlet, 105, taking 5 + 10 + 5, and the hot stream can give as much
+    # cooling to 95, so the profile may touch along the whole plateau.
+    np.testing.assert_allclose(Qmax, 20., rtol=1e-9)
+    q = np.linspace(0, Qmax, 100001)
+    assert (hot.T(q - Qmax) - cold.T(q)).min() > -1e-9
+
+
+def test_qmax_linear_streams():
+    cold = hx.streamExample1(0., 1., 1.)
+    hot = hx.streamExample1(1., 2., 1.)
+    ci = hx.counterflow_integrator(cold, hot)
+    np.testing.assert_allclose(ci.calcQmaxBreakpoints(), 1., rtol=1e-12)
+
+
+def test_pinch_matches_dense_scan():
+    cold = hx.streamExample2(-5., 100., 1., 1., 10.)
+    hot = hx.streamExample1(120., 1.5)
+    ci = hx.counterflow_integrator(cold, hot)
+    Q = 0.8 * ci.calcQmaxBreakpoints()
+    q_pinch, DeltaT = ci.calcPinch(Q)
+    q = np.linspace(0, Q, 200001)
+    dense = hot.T(q - Q) - cold.T(q)
+    assert dense.min() - 1e-4 < DeltaT <= dense.min()
+
+
+def test_qmax_water_plateau():
+    # Boiling water against a hotter boiling stream: the pinch is at the
+    # cold stream's saturation temperature.
+    cold = hx.waterStream(101325, 100e3, 1.)
+    hot = hx.streamExample1(120., 10., 1e3)
+    ci = hx.counterflow_integrator(cold, hot)
+    Qmax, T_pinch, q_pinch = ci.calcQmaxBreakpoints(extra=True)
+    q = np.linspace(0, Qmax, 200001)
+    dense = hot.T(q - Qmax) - cold.T(q)
+    assert abs(dense.min()) < 1e-3
+    np.testing.assert_allclose(T_pinch, 99.97, atol=0.01)
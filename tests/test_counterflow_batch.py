@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+counterflowBatch against counterflow_integrator, pair by pair (user-044).
+"""
+import CoolProp.CoolProp as CP
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+
+
+@pytest.fixture(scope='module')
+def pairs():
+    h_liq = CP.PropsSI('H', 'P', 1e5, 'Q', 0, 'water')
+    return [
+        (hx.streamExample1(0.), hx.streamExample1(1., 1.)),
+        (hx.streamExample1(0.), hx.streamExample1(1., 2.)),
+        (hx.streamExample2(-5., 100., 1., 1., 10.),
+         hx.streamExample1(120., 1.5)),
+        # Both change phase at 100 C; Qmax is 20 (see user-032).
+        (hx.streamExample2(-5., 100., 1., 1., 10.),
+         hx.streamExample2(15., 100., 1., 1., 10.)),
+        (hx.waterStream(1e5, h_liq - 2e5, 0.1),
+         hx.streamExample1(140., 2.0, 4.2e3)),
+    ]
+
+
+@pytest.fixture(scope='module')
+def reference(pairs):
+    result = []
+    for cold, hot in pairs:
+        ci = hx.counterflow_integrator(cold, hot)
+        ci.calcQmaxBreakpoints()
+        result.append(ci)
+    return result
+
+
+def test_qmax(pairs, reference):
+    batch = hx.counterflowBatch([c for c, h in pairs], [h for c, h in pairs])
+    np.testing.assert_allclose(batch.calcQmax(),
+                               [ci.Qmax for ci in reference], rtol=1e-8)
+
+
+def test_pinch_and_UA(pairs, reference):
+    batch = hx.counterflowBatch.fromIntegrators(reference)
+    batch.calcQmax()
+    for f in [0.3, 0.9, 0.99]:
+        Q = f * batch.Qmax
+        q_pinch, DeltaT = batch.calcPinch(Q)
+        UA = batch.calcUA(Q)
+        for i, ci in enumerate(reference):
+            np.testing.assert_allclose(DeltaT[i], ci.calcPinch(Q[i])[1],
+                                       rtol=1e-6, atol=1e-9)
+            np.testing.assert_allclose(UA[i], ci.calcUA(Q[i]), rtol=1e-6)
+
+
+def test_calcQ(reference):
+    # Not the pair of plateaus, which touch for all Q from 10 to Qmax.
+    batch = hx.counterflowBatch.fromIntegrators(reference[:3]
+                                                + reference[4:])
+    Q = 0.7 * batch.calcQmax()
+    np.testing.assert_allclose(batch.calcQ(batch.calcUA(Q)), Q, rtol=1e-8)
+
+
+def test_touching_plateaus(reference):
+    batch = hx.counterflowBatch.fromIntegrators(reference[3:4])
+    batch.calcQmax()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for Q in [5., 10., 14.]:
+            assert batch.calcUA(Q)[0] == reference[3].calcUA(Q)
+
+
+def test_infeasible(reference):
+    batch = hx.counterflowBatch.fromIntegrators(reference)
+    result = batch.evaluate(1.1 * batch.calcQmax())
+    assert np.isinf(result['UA']).all()
+
+
+def test_array_parameters():
+    cold = hx.streamExample1(np.linspace(0, 0.5, 5))
+    hot = hx.streamExample1(1, np.linspace(0.5, 2, 5))
+    batch = hx.counterflowBatch(cold, hot)
+    Q = 0.5 * batch.calcQmax()
+    UA = batch.calcUA(Q)
+    for i in range(5):
+        ci = hx.counterflow_integrator(hx.streamExample1(cold.T_inlet[i]),
+                                       hx.streamExample1(1, hot.mdot[i]))
+        np.testing.assert_allclose(UA[i], ci.calcUA(Q[i]), rtol=1e-8)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+counterflowPoints profiles against scipy.integrate.quad (user-035).
+"""
+import numpy as np
+import pytest
+import scipy.integrate
+
+import HRHX_integral_model as hx
+
+pairs = {
+    'linear': (hx.streamExample1(0.), hx.streamExample1(1., 1.), 0.5),
+    'boiling': (hx.streamExample2(-5., 100., 1., 1., 10.),
+                hx.streamExample1(120., 1.5), 100.),
+}
+
+
+@pytest.mark.parametrize('name', sorted(pairs))
+def test_cumulative_UA(name):
+    cold, hot, Q = pairs[name]
+    p = hx.counterflowPoints(cold, hot, Q)
+    f = lambda q: 1. / (hot.T(q - Q) - cold.T(q))
+    assert p.q[0] == 0 and p.q[-1] == Q
+    for i in np.linspace(0, len(p.q) - 1, 6).astype(int)[1:]:
+        exact = scipy.integrate.quad(f, 0, p.q[i], limit=200)[0]
+        np.testing.assert_allclose(p.UA[i], exact, rtol=2e-4)
+    np.testing.assert_allclose(p.deltaT, p.T_hot - p.T_cold)
+
+
+def test_matches_integrator():
+    cold, hot, Q = pairs['boiling']
+    ci = hx.counterflow_integrator(cold, hot)
+    p = ci.profile(Q)
+    np.testing.assert_allclose(p.UA[-1], ci.calcUA(Q), rtol=2e-4)
+    np.testing.assert_allclose(p.deltaT.min(), ci.calcDistanceT(Q),
+                               atol=1e-3)
+
+
+def test_negative_duty():
+    cold, hot = hx.streamExample1(0.), hx.streamExample1(1., 2.)
+    p = hx.counterflowPoints(cold, hot, -0.2)
+    f = lambda q: 1. / (hot.T(q + 0.2) - cold.T(q))
+    exact = scipy.integrate.quad(f, 0, -0.2)[0]
+    np.testing.assert_allclose(p.UA[-1], exact, rtol=1e-4)
+    assert (np.diff(p.q) < 0).all()
+
+
+def test_toArray():
+    cold, hot, Q = pairs['linear']
+    a = hx.counterflowPoints(cold, hot, Q).toArray()
+    assert a.dtype == hx.profileType
+    np.testing.assert_allclose(a['UA'], np.cumsum(a['dUA']))
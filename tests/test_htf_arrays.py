@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+The array functions of HRHX_models against the scalar calcUA and a root
+finder, design by design (user-046).
+"""
+import numpy as np
+import pytest
+import scipy.optimize
+
+import HRHX_models
+from HRHX_models import FLAG_INPUT, FLAG_ORDER, FLAG_INFEASIBLE
+
+
+@pytest.fixture(scope='module')
+def fluids():
+    return (HRHX_models.getHTFLookup('water'),
+            HRHX_models.getHTFLookup('oil'))
+
+
+designs = dict(T_cold=np.array([20., 40., 60., 30.]),
+               m_cold=np.array([1., 0.5, 2., 1.5]),
+               T_hot=np.array([95., 90., 85., 98.]),
+               m_hot=np.array([0.5, 0.8, 1., 0.3]))
+
+
+def scalarCurves(water, oil, i):
+    h_cold = water.h(designs['T_cold'][i])
+    h_hot = oil.h(designs['T_hot'][i])
+    T_cold = lambda q: water.T(h_cold + q / designs['m_cold'][i])
+    # Heat out of the hot stream, counted from its inlet.
+    T_hot = lambda q: oil.T(h_hot - q / designs['m_hot'][i])
+    return T_cold, T_hot
+
+
+def args(water, oil):
+    return (water, designs['T_cold'], designs['m_cold'],
+            oil, designs['T_hot'], designs['m_hot'])
+
+
+def test_UA(fluids):
+    water, oil = fluids
+    Q_max, flags = HRHX_models.calcQmaxArray(*args(water, oil))
+    assert (flags == 0).all()
+    Q = 0.8 * Q_max
+    UA, flags = HRHX_models.calcUAArray(*args(water, oil), Q)
+    assert (flags == 0).all()
+    for i in range(len(Q)):
+        T_cold, T_hot = scalarCurves(water, oil, i)
+        expected = HRHX_models.calcUA(T_cold, T_hot, Q[i])[0]
+        np.testing.assert_allclose(UA[i], expected, rtol=1e-6)
+
+
+def test_Q(fluids):
+    water, oil = fluids
+    Q_max = HRHX_models.calcQmaxArray(*args(water, oil))[0]
+    UA = np.array([5e3, 1e4, 3e4, 2e3])
+    Q, flags = HRHX_models.calcQArray(*args(water, oil), UA)
+    assert (flags == 0).all()
+    for i in range(len(UA)):
+        T_cold, T_hot = scalarCurves(water, oil, i)
+        f = lambda q: HRHX_models.calcUA(T_cold, T_hot, q)[0] - UA[i]
+        expected = scipy.optimize.brentq(f, 0., Q_max[i] * (1 - 1e-9),
+                                         xtol=1e-6)
+        np.testing.assert_allclose(Q[i], expected, rtol=1e-6)
+
+
+def test_flags(fluids):
+    water, oil = fluids
+    UA, flags = HRHX_models.calcUAArray(
+        water, [20., 20., 20., np.nan, 200.], 1.,
+        oil, [250., 250., 250., 250., 100.], 1., [-1., 1e3, 1e9, 1e3, 1e3])
+    assert np.isnan(UA[0]) and flags[0] == FLAG_INFEASIBLE
+    assert np.isfinite(UA[1]) and flags[1] == 0
+    assert np.isinf(UA[2]) and flags[2] & FLAG_INFEASIBLE
+    assert np.isnan(UA[3]) and flags[3] == FLAG_INPUT
+    assert np.isnan(UA[4]) and flags[4] & (FLAG_INPUT | FLAG_ORDER)
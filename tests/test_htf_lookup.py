@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+HTFLookup tables against CoolProp.PropsSI, for every fluid in htfFluids
+(user-045).
+"""
+import numpy as np
+import pytest
+from CoolProp.CoolProp import PropsSI
+
+import HRHX_models
+
+
+@pytest.mark.parametrize('fluid', sorted(HRHX_models.htfFluids))
+def test_default_pressure(fluid):
+    htf = HRHX_models.getHTFLookup(fluid)
+    T = np.linspace(htf.T_min, htf.T_max, 37)
+    h = PropsSI('H', 'T', T + 273.15, 'P', 101325., htf.name)
+    np.testing.assert_allclose(htf.h(T), h, rtol=1e-6, atol=1.)
+    np.testing.assert_allclose(htf.T(h), T, atol=1e-3)
+    cp = PropsSI('C', 'T', T[1:-1] + 273.15, 'P', 101325., htf.name)
+    np.testing.assert_allclose(htf.C(T[1:-1]), cp, rtol=1e-3)
+
+
+def test_oil_capped_below_boiling():
+    htf = HRHX_models.getHTFLookup('oil')
+    assert 300. < htf.T_max < HRHX_models.htfFluids['oil'][2]
+    with pytest.raises(ValueError):
+        HRHX_models.HTFLookup('oil', T_max=380.)
+
+
+@pytest.mark.parametrize('fluid', sorted(HRHX_models.htfFluids))
+def test_outside_table(fluid):
+    htf = HRHX_models.getHTFLookup(fluid)
+    assert np.isnan(htf.h(htf.T_max + 1.))
+    assert np.isnan(htf.h(np.array([htf.T_min - 1.]))).all()
+    assert np.isnan(htf.T(htf.h(htf.T_max) + 1e3))
+
+
+def test_model2_outlet_beyond_table():
+    model = HRHX_models.HRHX_model2(0.96, 270., 101325., 0.8)
+    water = HRHX_models.getHTFLookup('water')
+    # The water would have to boil; no outlet temperature from the table.
+    with pytest.raises(ValueError):
+        model(50., 0.5, water)
+    Q, T_out = model(50., 2., water)[:2]
+    np.testing.assert_allclose(water.h(T_out) - water.h(50.), Q / 2.,
+                               rtol=1e-8)
+
+
+def test_model1_example():
+    # The documented example, against the same formula with PropsSI.
+    model = HRHX_models.HRHX_model1(0.96, 270., 100, 0.80)
+    htf = HRHX_models.getHTFLookup('water', 10e5)
+    Q, T_out, T_exhaust_out = model(50, 2, htf)[:3]
+    T_mean = 0.5 * (50 + 270.)
+    C_HTF = 2 * PropsSI('C', 'T', T_mean + 273.15, 'P', 10e5, 'Water')
+    assert np.isfinite(T_out)
+    assert T_out == pytest.approx(50 + Q / C_HTF, rel=1e-4)
+    # At 1 atm, water has no heat capacity at T_mean.
+    with pytest.raises(ValueError):
+        model(50, 2, HRHX_models.getHTFLookup('water'))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+PerformanceMap on the example of its module docstring (user-030).
+"""
+import numpy as np
+import pytest
+
+import libr3
+from libr3_map import PerformanceMap
+from HRHX_integral_model import streamExample1 as se1
+
+
+@pytest.fixture(scope='module')
+def performanceMap():
+    chiller = libr3.ChillerLiBr1(T_evap=5, T_cond=40, m_pump=0.05)
+    chiller.setOutletTemperatures(35., 90.)
+    streams = dict(heat=se1(120., 0.3, 4179),
+                   absorberReject=se1(25., 1., 4179),
+                   condReject=se1(25., 1., 4179), cold=se1(12., 1., 4179))
+    UA = dict(gen=480., abs=1140., cond=1030., evap=2440.)
+    axes = dict(heat=np.linspace(100, 130, 4), cold=np.linspace(8, 16, 3))
+    return PerformanceMap.build(chiller, UA, streams, axes)
+
+
+def test_build_solves_every_point(performanceMap):
+    assert np.isfinite(performanceMap.values['Q_evap_heat']).all()
+    # Every solution keeps the evaporator below the chilled water inlet.
+    cold = performanceMap.axes[1][1]
+    assert (performanceMap.values['T_evap'] < cold[np.newaxis, :]).all()
+
+
+def test_validate_midpoints(performanceMap):
+    errors = performanceMap.validate(performanceMap.midpoints())
+    abs_err, rel_err, count = errors['Q_evap_heat']
+    assert count == 6
+    assert rel_err < 0.01
+    assert errors['COP'][1] < 0.01
+
+
+def test_save_load(performanceMap, tmp_path):
+    fname = str(tmp_path / 'map.npz')
+    performanceMap.save(fname)
+    other = PerformanceMap.load(fname)
+    points = performanceMap.midpoints()
+    np.testing.assert_array_equal(other(points), performanceMap(points))
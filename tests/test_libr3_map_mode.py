@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+libr3.iterate1Map against ChillerLiBr1.iterate1, point by point (user-027).
+"""
+import numpy as np
+
+import libr3
+
+fields = """x1 x2 T_gen_inlet T_SHX_concentrate_outlet m_refrig Q_SHX
+Q_abs_total Q_gen_total Q_condenser_reject Q_evap_heat W_pump COP""".split()
+
+
+def test_iterate1Map_matches_iterate1():
+    T_evap = np.array([3., 5., 7.])
+    T_cond = np.array([38., 40., 42.])
+    T_abs_outlet = np.array([33., 35., 37.])
+    T_gen_outlet = np.array([85., 90., 95.])
+    table = libr3.iterate1Map(T_evap, T_cond, T_abs_outlet, T_gen_outlet,
+                              m_pump=0.05, Eff_SHX=0.64)
+    assert table['ok'].all()
+    for i in range(len(table)):
+        chiller = libr3.ChillerLiBr1(T_evap=T_evap[i], T_cond=T_cond[i],
+                                     m_pump=0.05, Eff_SHX=0.64)
+        chiller.setOutletTemperatures(T_abs_outlet[i], T_gen_outlet[i])
+        chiller.iterate1()
+        for name in fields:
+            np.testing.assert_allclose(table[name][i], getattr(chiller, name),
+                                       rtol=1e-6, err_msg=name)
+
+
+def test_iterate1Map_flags_bad_points():
+    # Condenser colder than the evaporator cannot work.
+    table = libr3.iterate1Map([5.], [2.], [35.], [90.])
+    assert not table['ok'][0]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+ChillerLiBr1.iterate2, the Newton rating solver (user-028).
+"""
+import numpy as np
+import pytest
+
+import libr3
+from HRHX_integral_model import streamExample1 as se1
+
+UA = dict(gen=480., abs=1140., cond=1030., evap=2440.)
+
+
+def makeStreams(T_heat=120., T_cold=12.):
+    return [se1(T_heat, 0.3, 4179), se1(25., 1., 4179), se1(25., 1., 4179),
+            se1(T_cold, 1., 4179)]
+
+
+def test_iterate2_converges_within_limits():
+    chiller = libr3.ChillerLiBr1(m_pump=0.05)
+    streams = makeStreams()
+    z = chiller.iterate2(UA, *streams, guess=[5., 40., 35., 90.])
+    assert np.abs(chiller.UA_residuals).max() < 1e-6
+    lo, hi = chiller.ratingLimits(*streams)
+    assert np.all(z > lo) and np.all(z < hi)
+    assert chiller.ratingFeasible(z, (lo, hi))
+    # The residuals are those of an iterate1 solve at the solution.
+    check = libr3.ChillerLiBr1(T_evap=z[0], T_cond=z[1], m_pump=0.05)
+    check.setOutletTemperatures(z[2], z[3])
+    check.iterate1()
+    np.testing.assert_allclose(check.ratingResiduals(UA, *streams), 0,
+                               atol=1e-5)
+
+
+def test_iterate2_rejects_guess_beyond_limits():
+    # The evaporator cannot be warmer than the chilled water inlet.
+    chiller = libr3.ChillerLiBr1(m_pump=0.05)
+    with pytest.raises(ValueError, match="outside the limits"):
+        chiller.iterate2(UA, *makeStreams(T_cold=8.),
+                         guess=[10., 40., 35., 90.])
+
+
+def test_iterate2_fails_without_leaving_limits():
+    chiller = libr3.ChillerLiBr1(m_pump=0.05)
+    streams = makeStreams(T_heat=100., T_cold=8.)
+    lo, hi = chiller.ratingLimits(*streams)
+    try:
+        z = chiller.iterate2(UA, *streams, guess=[5., 30., 30., 80.])
+    except ValueError:
+        pass
+    else:
+        assert np.all(z > lo) and np.all(z < hi)
+    assert chiller.T_evap < streams[3].T_inlet
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+The record array state table of ChillerLiBr1 (user-029).
+"""
+import numpy as np
+import CoolProp.CoolProp as CP
+
+import libr3
+import libr_props
+from hw2_1 import CelsiusToKelvin as C2K
+
+
+def makeChiller():
+    chiller = libr3.ChillerLiBr1(T_evap=5, T_cond=40, x1=0.57, x2=0.62)
+    chiller.iterate1()
+    return chiller
+
+
+def test_iterate1_skips_derived_columns(monkeypatch):
+    calls = []
+    original = libr_props.massSpecificEntropyArray
+    monkeypatch.setattr(libr_props, 'massSpecificEntropyArray',
+                        lambda *args: calls.append(args) or original(*args))
+    chiller = makeChiller()
+    assert calls == []
+    table = chiller.stateTable
+    assert len(calls) == 1
+    assert np.isfinite(table['s'][0])
+    # Reading again does not recompute.
+    chiller.getStateTable()
+    assert len(calls) == 1
+
+
+def test_state_table_matches_scalar_properties():
+    chiller = makeChiller()
+    t = chiller.stateTable
+    labels = chiller.stateLabels
+    i = labels.index('abs_outlet')
+    assert t['T'][i] == chiller.T_abs_outlet_max
+    assert t['h'][i] == chiller.h_abs_outlet
+    np.testing.assert_allclose(
+        t['s'][i], libr_props.massSpecificEntropy(C2K(t['T'][i]), t['x'][i]),
+        rtol=1e-10)
+    j = labels.index('cond_sat_vapor')
+    np.testing.assert_allclose(
+        t['h'][j] + libr3.h_w_ref,
+        CP.PropsSI('H', 'P', chiller.P_cond, 'Q', 1, libr3.water), rtol=1e-10)
+    assert t['Q'][j] == 1
+    assert 0 < t['Q'][labels.index('evap_inlet')] < 1
+
+
+def test_state_table_refreshes_after_solve():
+    chiller = makeChiller()
+    s_before = chiller.stateTable['s'].copy()
+    chiller.setT_evap(3.)
+    chiller.iterate1()
+    assert not np.allclose(chiller.stateTable['s'][8:], s_before[8:],
+                           equal_nan=True)
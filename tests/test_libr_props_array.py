@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Array LiBr kernels against the scalar routines, and the absorber curve they
+build (user-026).
+"""
+import numpy as np
+
+import libr_props
+import libr3
+from hw2_1 import CelsiusToKelvin as C2K
+
+T = np.array([300., 320., 340., 360.])
+x = np.array([0.50, 0.55, 0.60, 0.64])
+P = np.array([0.008, 0.01, 0.07, 0.08])
+
+
+def test_temperatureArray():
+    expected = [libr_props.temperature(p, xi) for p, xi in zip(P, x)]
+    np.testing.assert_allclose(libr_props.temperatureArray(P, x), expected,
+                               rtol=1e-6)
+
+
+def test_enthalpyArray():
+    expected = [libr_props.massSpecificEnthalpy(t, xi) for t, xi in zip(T, x)]
+    np.testing.assert_allclose(libr_props.massSpecificEnthalpyArray(T, x),
+                               expected, rtol=1e-10)
+
+
+def test_absorberCurve():
+    # The interpolated curve passes through the equilibrium states.
+    chiller = libr3.ChillerLiBr1(T_evap=5, T_cond=40, x1=0.57, x2=0.62)
+    chiller.iterate1()
+    absorber = chiller.getAbsorberStream()
+    x_local = np.array([0.61, 0.60, 0.59, 0.58])
+    T_local, q_local = absorber._qx(x_local)
+    np.testing.assert_allclose(absorber.T(q_local), T_local, atol=1e-3)
+    T_scalar = libr_props.temperature(chiller.P_evap * 1e-5, 0.60)
+    np.testing.assert_allclose(C2K(T_local[1]), T_scalar, rtol=1e-6)
+
+
+def test_twoPhasePropsArray_nan():
+    # A nan point stays nan without failing the rest of the vector.
+    h = np.array([2.5e5, np.nan, 3.0e5, 2.5e5])
+    Pa = np.array([0.07, 0.07, 0.08, np.nan])
+    z = np.array([0.55, 0.55, 0.58, 0.55])
+    Q, T_out, x_out = libr_props.twoPhasePropsArray(h, Pa, z)
+    assert np.isnan(Q[1]) and np.isnan(Q[3]) and np.isnan(T_out[3])
+    for i in 0, 2:
+        expected = libr_props.twoPhaseProps(h[i], Pa[i], z[i])
+        np.testing.assert_allclose([Q[i], T_out[i], x_out[i]], expected,
+                                   rtol=1e-4, atol=1e-5)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+LookupCache keys and round trips (user-048).
+"""
+import types
+
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+from lookupcache import LookupCache, describe
+
+
+class Pair(object):
+    def __init__(self, a, b):
+        self.a, self.b = a, b
+
+
+class Other(Pair):
+    pass
+
+
+def test_round_trip(tmp_path):
+    cache = LookupCache(str(tmp_path), 'test', [1, 100.])
+    x = np.array([0.5, 280., 310.])
+    assert cache.get(x) is None
+    cache.put(x, 12.5, [1., -2.], elapsed=0.1)
+    entry = LookupCache(str(tmp_path), 'test', [1, 100.]).get(x)
+    assert entry['Q'] == 12.5 and entry['cons'] == [1., -2.]
+    assert x in cache
+    assert x + 1e-12 not in cache
+    assert x not in LookupCache(str(tmp_path), 'test', [1, 101.])
+    assert x not in LookupCache(str(tmp_path), 'other', [1, 100.])
+    assert len(list(cache.entries())) == 1
+
+
+def test_nan(tmp_path):
+    cache = LookupCache(str(tmp_path), 'test', [1., np.nan])
+    x = np.array([np.nan, 1.])
+    cache.put(x, np.nan, [np.nan], error='failed')
+    entry = cache.get(x)
+    assert entry is not None and entry['error'] == 'failed'
+    assert np.isnan(entry['Q'])
+
+
+def test_describe():
+    bdry = Pair(hx.streamExample1(120., 0.3, 4179), Pair(1, 2.))
+    # Attributes in order of name: T_inlet, cp, mdot.
+    assert describe(bdry) == ['Pair', 'streamExample1', 120., 4179., 0.3,
+                              'Pair', 1., 2.]
+
+
+def test_classes_keep_keys_apart(tmp_path):
+    x = [1., 2.]
+    a = LookupCache(str(tmp_path), 'test', describe(Pair(1., 2.)))
+    b = LookupCache(str(tmp_path), 'test', describe(Other(1., 2.)))
+    assert a.key(x) != b.key(x)
+    a.put(x, 1., [])
+    assert x in a and x not in b
+
+
+class FakeSystem(object):
+    """Stands in for System: four exchangers, failing for x[0] < 0."""
+    def __init__(self, bdry, chiller, **kwargs):
+        if chiller[0] < 0:
+            raise ValueError("no solution")
+        Q = 10. * chiller[0]
+        self.chiller = types.SimpleNamespace(Q_evap=Q, Q_evap_heat=Q)
+        self.data = [(name, 1., 0.5, 20., 5.) for name in 'abcd']
+        self.totalUA = 80.
+
+
+@pytest.fixture(params=['system_libr3', 'system_aqua1'])
+def system(request, monkeypatch, system_aqua1):
+    module = __import__(request.param)
+    monkeypatch.setattr(module, 'System', FakeSystem)
+    monkeypatch.setattr(module, 'makeChiller', lambda x: x)
+    return module
+
+
+def test_problem_cache_hits(system, tmp_path):
+    # Both Problems trace and fail the same way, computed or cached.
+    bdry = Pair(1., 2.)
+    good = np.array([0.5, 1., 2., 3., 4., 5.])
+    bad = -good
+    first = system.Problem(bdry, 100., cache=str(tmp_path))
+    results = [first.lookup(x) for x in (good, bad)]
+    assert results[0][0] == 5.
+    assert results[1][0] == 0 and results[1][1][-1] == -1
+    assert len(results[1][1]) == first.Ncons
+    second = system.Problem(bdry, 100., cache=str(tmp_path))
+    assert [second.lookup(x) for x in (good, bad)] == results
+    np.testing.assert_array_equal(second.input, first.input)
+    assert len(second.input) == 2
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+mapJobs and concurrent heat exchanger sizing against serial mode
+(user-047).
+"""
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+
+
+def power(a, b):
+    return a ** b
+
+
+jobs = [(a, b) for a in range(1, 5) for b in range(3)]
+expected = [a ** b for a, b in jobs]
+
+
+@pytest.mark.parametrize('workers, executor', [(None, 'thread'),
+                                               (1, 'process'),
+                                               (3, 'thread'),
+                                               (2, 'process')])
+def test_order(system_aqua1, workers, executor):
+    assert system_aqua1.mapJobs(power, jobs, workers, executor) == expected
+
+
+def test_existing_executor(system_aqua1):
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        assert system_aqua1.mapJobs(power, jobs, executor=pool) == expected
+
+
+def test_unknown_executor(system_aqua1):
+    with pytest.raises(ValueError):
+        system_aqua1.mapJobs(power, jobs, 2, 'fiber')
+
+
+def test_sizing(system_aqua1):
+    pairs = [(hx.streamExample1(20., 1., 4.), hx.streamExample1(90., 2., 4.),
+              100.),
+             (hx.streamExample2(-5., 100., 1., 1., 10.),
+              hx.streamExample1(120., 1.5), 20.)]
+    serial = [hx.counterflow_integrator(c, h).calcUA3Segments(Q, 0.1)
+              for c, h, Q in pairs]
+    jobs = [(c, h, Q, 0.1) for c, h, Q in pairs]
+    for workers, executor in [(2, 'thread'), (2, 'process')]:
+        results = system_aqua1.mapJobs(system_aqua1._sizeExchanger, jobs,
+                                       workers, executor)
+        for (UA, error, table), (UA0, error0, table0) in zip(results,
+                                                             serial):
+            assert UA == UA0 and error == error0
+            np.testing.assert_array_equal(table, table0)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+monotoneCubic against scipy.interpolate.PchipInterpolator (user-040).
+"""
+import numpy as np
+import pytest
+import scipy.interpolate
+
+import HRHX_integral_model as hx
+
+x = np.array([0., 0.5, 1.2, 2., 3.5, 4.])
+y = np.array([1., 1.3, 2.9, 3., 7., 7.5])
+
+
+@pytest.mark.parametrize('nu', [0, 1, 2, 3])
+def test_matches_pchip(nu):
+    xx = np.linspace(-0.5, 4.5, 101)
+    expected = scipy.interpolate.PchipInterpolator(x, y)(xx, nu)
+    np.testing.assert_allclose(hx.monotoneCubic(x, y)(xx, nu), expected,
+                               rtol=1e-12, atol=1e-12)
+
+
+def test_scalar():
+    curve = hx.monotoneCubic(x, y)
+    pchip = scipy.interpolate.PchipInterpolator(x, y)
+    for t in [-0.3, 0., 0.7, 2., 3.9, 4.4]:
+        assert isinstance(curve(t), float)
+        np.testing.assert_allclose(curve(t), pchip(t), rtol=1e-13)
+
+
+def test_no_extrapolate():
+    curve = hx.monotoneCubic(x, y, extrapolate=False)
+    assert np.isnan(curve(-0.1)) and np.isnan(curve(4.1))
+    assert np.isnan(curve(np.array([-0.1, 4.1]))).all()
+    assert np.isfinite(curve(np.array([0., 4.]))).all()
+
+
+@pytest.mark.parametrize('sign', [1., -1.])
+def test_inverse(sign):
+    curve = hx.monotoneCubic(x, sign * y)
+    xx = np.linspace(0., 4., 51)
+    np.testing.assert_allclose(curve.inverse(curve(xx)), xx, atol=1e-10)
+    # Beyond the knots the inverse extends linearly with the end slopes.
+    slope = curve(4., 1)
+    np.testing.assert_allclose(curve.inverse(sign * 7.5 + slope),
+                               5., rtol=1e-12)
+    assert isinstance(curve.inverse(sign * 2.), float)
+
+
+def test_inverse_not_monotone():
+    with pytest.raises(ValueError):
+        hx.monotoneCubic([0., 1., 2.], [0., 1., 0.]).inverse(0.5)
+
+
+def test_breaks():
+    # A ramp, a plateau, and a ramp: the corners stay sharp.
+    q = np.array([0., 1., 2., 5., 6., 7.])
+    T = np.array([0., 1., 2., 2., 3., 4.])
+    curve = hx.monotoneCubic(q, T, breaks=[2, 3])
+    qq = np.linspace(0., 7., 71)
+    np.testing.assert_allclose(curve(qq), np.interp(qq, q, T), atol=1e-12)
+    assert curve.inverse(2.) == 5.
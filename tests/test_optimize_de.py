@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+differentialEvolution against a constrained optimum from SLSQP (user-050).
+"""
+import concurrent.futures
+import threading
+import time
+
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+import optimize_de
+
+bounds = [(-5., 5.), (-5., 5.)]
+
+
+def objective(x):
+    return (x[0] - 1.) ** 2 + (x[1] - 2.) ** 2
+
+
+def constraints(x):
+    return [2. - x[0] - x[1], x[0] + 4.]
+
+
+def problem(x):
+    return objective(x), constraints(x)
+
+
+calls = []
+
+
+def record(tag):
+    calls.append(tag)
+
+
+def reference():
+    return minimize(objective, [0., 0.], method='SLSQP', bounds=bounds,
+                    constraints=dict(type='ineq', fun=constraints))
+
+
+def test_violation():
+    assert optimize_de.violation([1., 0., -2., -0.5]) == 2.5
+    assert optimize_de.violation([1., np.nan]) == np.inf
+
+
+def test_constrained_optimum():
+    ref = reference()
+    opt = optimize_de.differentialEvolution(problem, bounds, maxevals=3000,
+                                            seed=3)
+    assert opt.success and opt.maxcv == 0
+    assert opt.nfev == 3000
+    np.testing.assert_allclose(opt.x, ref.x, atol=1e-3)
+    assert opt.fun == pytest.approx(ref.fun, abs=1e-5)
+
+
+@pytest.mark.parametrize('workers, executor', [(3, 'thread'),
+                                               (2, 'process')])
+def test_reproducible(workers, executor):
+    serial = optimize_de.differentialEvolution(problem, bounds, maxevals=200,
+                                               seed=7)
+    pooled = optimize_de.differentialEvolution(problem, bounds, maxevals=200,
+                                               seed=7, workers=workers,
+                                               executor=executor)
+    np.testing.assert_array_equal(serial.population, pooled.population)
+    assert serial.fun == pooled.fun
+
+
+def test_existing_executor():
+    serial = optimize_de.differentialEvolution(problem, bounds, maxevals=200,
+                                               seed=7)
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        pooled = optimize_de.differentialEvolution(problem, bounds,
+                                                   maxevals=200, seed=7,
+                                                   executor=pool)
+    np.testing.assert_array_equal(serial.population, pooled.population)
+
+
+def test_initializer_serial():
+    del calls[:]
+    optimize_de.differentialEvolution(problem, bounds, maxevals=20,
+                                      initializer=record, initargs=('a',))
+    assert calls == ['a']
+
+
+def test_initializer_with_executor():
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        with pytest.raises(ValueError):
+            optimize_de.differentialEvolution(problem, bounds, maxevals=20,
+                                              executor=pool,
+                                              initializer=record,
+                                              initargs=('a',))
+
+
+@pytest.mark.parametrize('popsize, maxevals', [(3, 100), (None, 3)])
+def test_popsize(popsize, maxevals):
+    with pytest.raises(ValueError):
+        optimize_de.differentialEvolution(problem, bounds, maxevals=maxevals,
+                                          popsize=popsize)
+
+
+def test_aqua_rejects_executor():
+    xB = [400, 1, 305, 3, 305, 5, 285, 4, 305, 0.15]
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        with pytest.raises(ValueError):
+            optimize_de.optimizeAqua(xB, 100, executor=pool)
+
+
+class ThreadProblem(object):
+    """Stands in for system_aqua1.Problem, recording the threads that build
+    and use each instance. Q and the constraints follow problem()."""
+    instances = []
+
+    def __init__(self, bdry, U, cache=None):
+        self.thread = threading.get_ident()
+        self.used = set()
+        ThreadProblem.instances.append(self)
+
+    def lookup(self, x):
+        self.used.add(threading.get_ident())
+        time.sleep(1e-4)
+        f, cons = problem(x[:2])
+        return -f, cons
+
+
+def test_aqua_threads(system_aqua1, monkeypatch):
+    # Each thread builds its own Problem and no other thread touches it.
+    monkeypatch.setattr(system_aqua1, 'Problem', ThreadProblem)
+    monkeypatch.setattr(ThreadProblem, 'instances', [])
+    xB = [400, 1, 305, 3, 305, 5, 285, 4, 305, 0.15]
+    serial = optimize_de.optimizeAqua(xB, 100, bounds=bounds, maxevals=120,
+                                      seed=5)
+    pooled = optimize_de.optimizeAqua(xB, 100, bounds=bounds, maxevals=120,
+                                      seed=5, workers=2, executor='thread')
+    threads = ThreadProblem.instances[1:]
+    assert 1 <= len(threads) <= 2
+    for p in threads:
+        assert p.used == {p.thread}
+    np.testing.assert_array_equal(serial.population, pooled.population)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+PinchAnalysis against the textbook problem table algorithm (user-041).
+"""
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+from pinch import PinchAnalysis
+
+
+def problemTable(streams, deltaT_min):
+    """Classic problem table for constant heat capacity streams, given as
+    (T_supply, T_target, CP). Returns (Q_hot_min, Q_cold_min)."""
+    shifted = []
+    for Ts, Tt, CP in streams:
+        s = -0.5 * deltaT_min if Ts > Tt else 0.5 * deltaT_min
+        shifted.append((Ts + s, Tt + s, CP, Ts > Tt))
+    T = sorted(set(t for a, b, CP, hot in shifted for t in (a, b)),
+               reverse=True)
+    cascade = [0.]
+    for hi, lo in zip(T[:-1], T[1:]):
+        net = 0.
+        for a, b, CP, hot in shifted:
+            top, bottom = max(a, b), min(a, b)
+            overlap = max(0., min(hi, top) - max(lo, bottom))
+            net += CP * overlap if hot else -CP * overlap
+        cascade.append(cascade[-1] + net)
+    Q_hot = max(0., -min(cascade))
+    return Q_hot, cascade[-1] + Q_hot
+
+
+def asStreams(table):
+    return [(hx.streamExample1(Ts, CP), CP * (Tt - Ts))
+            for Ts, Tt, CP in table]
+
+
+textbook = [(170., 60., 3.), (150., 30., 1.5), (20., 135., 2.),
+            (80., 140., 4.)]
+
+
+def test_textbook():
+    pa = PinchAnalysis(asStreams(textbook), deltaT_min=10.)
+    np.testing.assert_allclose([pa.Q_hot_min, pa.Q_cold_min], [20., 60.],
+                               atol=1e-9)
+    assert pa.T_pinch == pytest.approx(85.)
+    assert pa.gcc.min() == pytest.approx(0., abs=1e-9)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_problems(seed):
+    rng = np.random.default_rng(seed)
+    table = []
+    for i in range(6):
+        a, b = rng.uniform(20., 200., 2)
+        table.append((a, b, rng.uniform(0.5, 5.)))
+    deltaT_min = rng.uniform(0., 20.)
+    pa = PinchAnalysis(asStreams(table), deltaT_min)
+    np.testing.assert_allclose([pa.Q_hot_min, pa.Q_cold_min],
+                               problemTable(table, deltaT_min), atol=1e-7)
+    # Energy balance between the utilities and the streams.
+    net = sum(CP * (Tt - Ts) for Ts, Tt, CP in table)
+    np.testing.assert_allclose(pa.Q_hot_min - pa.Q_cold_min, net, atol=1e-7)
+
+
+def test_isothermal_stream():
+    # A boiling stream at 100 C taking 10, and a hot stream from 150 to 50.
+    boil = hx.streamExample2(0., 100., 1., 1., 10.)
+    streams = [(boil, 10.), (hx.streamExample1(150., 0.2), -20.)]
+    pa = PinchAnalysis(streams, deltaT_min=10.)
+    # Above 110 C the hot stream gives 0.2 * 40 = 8 < 10.
+    np.testing.assert_allclose([pa.Q_hot_min, pa.Q_cold_min], [2., 12.],
+                               atol=1e-6)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+quad_vectorized against scipy.integrate.quad, and calcUA(method='grid')
+against the default path (user-031).
+"""
+import numpy as np
+import scipy.integrate
+
+import HRHX_integral_model as hx
+
+
+def test_smooth():
+    result, error = hx.quad_vectorized(np.cos, 0., 2.)
+    np.testing.assert_allclose(result, np.sin(2.), rtol=1e-12)
+    assert error < 1e-8
+
+
+def test_peaked_with_breakpoint():
+    # A sharp peak, like 1/DeltaT near a pinch, and a kink.
+    f = lambda x: 1. / (np.abs(x - 0.3) + 1e-3)
+    result, error = hx.quad_vectorized(f, 0., 1., breakpoints=[0.3])
+    expected = np.log((0.3 + 1e-3) / 1e-3) + np.log((0.7 + 1e-3) / 1e-3)
+    np.testing.assert_allclose(result, expected, rtol=1e-8)
+
+
+def test_reversed_limits():
+    result = hx.quad_vectorized(np.exp, 1., 0.)[0]
+    np.testing.assert_allclose(result, 1. - np.e, rtol=1e-12)
+
+
+def test_maxpanels_stops_noisy_integrand():
+    # Roundoff-like noise keeps every panel above the goal.
+    rng = np.random.default_rng(0)
+    f = lambda x: 1. + 1e-6 * rng.standard_normal(x.shape)
+    result, error = hx.quad_vectorized(f, 0., 1., epsabs=1e-14, epsrel=0,
+                                       maxpanels=256)
+    np.testing.assert_allclose(result, 1., rtol=1e-5)
+
+
+def test_calcUA_grid_matches_quad():
+    cold = hx.streamExample2(-5., 100., 1., 1., 10.)
+    hot = hx.streamExample1(120., 1.5)
+    ci = hx.counterflow_integrator(cold, hot)
+    ci.calcQmaxBreakpoints()
+    Q = 0.9 * ci.Qmax
+    func = lambda q: 1. / (hot.T(q - Q) - cold.T(q))
+    expected = scipy.integrate.quad(func, 0, Q, points=[5., 15.],
+                                    epsabs=1e-12, epsrel=1e-12)[0]
+    np.testing.assert_allclose(ci.calcUA(Q, method='grid'), expected,
+                               rtol=1e-6)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+ResultStore appends and queries, and the import of the old pickles
+against reading them directly (user-049).
+"""
+import glob
+import os
+
+import numpy as np
+import pytest
+
+import resultstore
+
+dataFolder = os.path.join(os.path.dirname(__file__), os.pardir, 'data')
+
+
+def chunk(T_heat, n, U=100.):
+    return dict(T_heat=np.full(n, T_heat), U=np.full(n, U),
+                Q=np.arange(n, dtype=float),
+                cons=np.arange(2 * n, dtype=float).reshape(n, 2))
+
+
+def test_append_and_query(tmp_path):
+    store = resultstore.ResultStore(str(tmp_path / 'store'))
+    store.append(chunk(400., 3), source='a')
+    store.append(chunk(420., 2, U=200.), source='b')
+    assert len(store) == 5
+    assert store.sources() == {'a', 'b'}
+    df = store.query(T_heat=(410., 430.))
+    assert list(df['Q']) == [0., 1.]
+    df = store.query(U=100., columns=['Q', 'cons'])
+    assert list(df.columns) == ['Q', 'cons_0', 'cons_1']
+    np.testing.assert_array_equal(df['cons_1'], [1., 3., 5.])
+    assert store.query(T_heat=500.).empty
+    assert store.query(missing=1.).empty
+
+
+def test_unequal_columns(tmp_path):
+    store = resultstore.ResultStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.append(dict(a=np.zeros(2), b=np.zeros(3)))
+
+
+def test_import_pickles(tmp_path):
+    files = sorted(glob.glob(os.path.join(dataFolder, 'system_aqua1_*.pkl')))
+    if not files:
+        pytest.skip("No stored pickles")
+    store = resultstore.ResultStore(str(tmp_path))
+    assert resultstore.importPickles(store, dataFolder) == len(files)
+    assert resultstore.importPickles(store, dataFolder) == 0
+    with open(files[0], 'rb') as f:
+        xB, bdry, p, opt, err = resultstore._LegacyUnpickler(f).load()
+    df = store.query(run=resultstore._hasher(xB))
+    assert len(df) == len(p.input)
+    x = np.array(p.input, dtype=float).reshape(len(p.input), -1)
+    for i, name in enumerate(resultstore.inputFields):
+        np.testing.assert_array_equal(df[name], x[:, i])
+    for i, xi in enumerate(x):
+        h = resultstore._hasher(xi)
+        if h in p.output:
+            Q = p.output[h][0]
+            assert df['Q'][i] == Q or (np.isnan(Q) and np.isnan(df['Q'][i]))
+    for name, value in zip(resultstore.boundaryFields, xB):
+        assert (df[name] == value).all()
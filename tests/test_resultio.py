@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Round trips through resultio files, including streams with an isothermal
+plateau (user-043).
+"""
+import CoolProp.CoolProp as CP
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+import resultio
+
+P = 1e5
+
+
+@pytest.fixture(scope='module')
+def h_sat():
+    return (CP.PropsSI('H', 'P', P, 'Q', 0, 'water'),
+            CP.PropsSI('H', 'P', P, 'Q', 1, 'water'))
+
+
+def roundTrip(tmp_path, stream, Q, **meta):
+    fname = str(tmp_path / 'stream.npz')
+    resultio.saveStream(fname, stream, Q, **meta)
+    return resultio.loadStream(fname)
+
+
+def test_boiling_water(tmp_path, h_sat):
+    h_liq, h_vap = h_sat
+    cold = hx.waterStream(P, h_liq - 2e5, 0.1)
+    hot = hx.streamExample1(200., 2.0, 4.2e3)
+    ci = hx.counterflow_integrator(cold, hot)
+    ci.calcQmaxBreakpoints()
+    # Through the plateau and into the superheated region.
+    Q = 0.99 * ci.Qmax
+    s = roundTrip(tmp_path, cold, Q, name='boiler')
+    T_sat = hx.K2C(CP.PropsSI('T', 'P', P, 'Q', 0, 'water'))
+    # q at the plateau is its start, as for the waterStream.
+    assert s.q(T_sat) == pytest.approx(cold.q(T_sat), rel=1e-9)
+    T = np.array([60., 90., T_sat - 1, T_sat + 1, cold.T(Q) - 1])
+    np.testing.assert_allclose(s.q(T), cold.q(T), rtol=1e-2)
+    q = np.linspace(0, Q, 11)
+    np.testing.assert_allclose(s.T(q), cold.T(q), atol=0.05)
+    UA = hx.counterflow_integrator(s, hot).calcUA(Q)
+    np.testing.assert_allclose(UA, ci.calcUA(Q), rtol=1e-3)
+
+
+def test_condensing_water(tmp_path, h_sat):
+    h_liq, h_vap = h_sat
+    hot = hx.waterStream(P, h_vap + 1e5, 0.1)
+    s = roundTrip(tmp_path, hot, -0.1 * (h_vap - h_liq + 2e5))
+    T_sat = hx.K2C(CP.PropsSI('T', 'P', P, 'Q', 0, 'water'))
+    # Cooling reaches the plateau at its vapor end.
+    assert s.q(T_sat) == pytest.approx(-0.1 * 1e5, rel=1e-6)
+    assert s.q(T_sat) == pytest.approx(hot.q(T_sat), rel=1e-6)
+
+
+def test_streamExample2(tmp_path):
+    boil = hx.streamExample2(-5., 100., 1., 1., 10.)
+    s = roundTrip(tmp_path, boil, 20.)
+    assert s.q(100.) == pytest.approx(5.)
+    np.testing.assert_allclose(s.q([96., 100., 101.]), [1., 5., 16.])
+    edges, kinds = s.segments()
+    assert kinds == ['linear', 'isothermal', 'linear']
+
+
+def test_metadata(tmp_path):
+    fname = str(tmp_path / 'stream.npz')
+    resultio.saveStream(fname, hx.streamExample1(20., 1., 4.), 200.,
+                        name='cold')
+    with resultio.ResultFile(fname) as f:
+        assert f.kind == 'stream'
+        assert f.meta['name'] == 'cold'
+        assert f.meta['T_out'] == pytest.approx(70.)
+    df = resultio.index(str(tmp_path))
+    assert list(df['name']) == ['cold']
+
+
+def test_index_skips_bad_files(tmp_path):
+    good = str(tmp_path / 'b_good.npz')
+    resultio.saveStream(good, hx.streamExample1(20., 1., 4.), 200.,
+                        name='cold')
+    with open(good, 'rb') as f:
+        data = f.read()
+    # Truncated, not a zip at all, a plain npz, and a header without fields.
+    (tmp_path / 'a_truncated.npz').write_bytes(data[:len(data) // 2])
+    (tmp_path / 'c_text.npz').write_text('not a zip file')
+    np.savez(str(tmp_path / 'd_plain.npz'), x=np.arange(3))
+    resultio.write(str(tmp_path / 'e_partial.npz'), 'stream', {})
+    with np.load(str(tmp_path / 'e_partial.npz')) as f:
+        header = f[resultio._headerKey].tobytes().decode('utf-8')
+    header = header.replace('"version"', '"release"')
+    np.savez(str(tmp_path / 'e_partial.npz'), **{resultio._headerKey:
+             np.frombuffer(header.encode('utf-8'), dtype=np.uint8)})
+    df = resultio.index(str(tmp_path))
+    assert list(df.index) == [good]
+
+
+def test_profile(tmp_path):
+    p = hx.counterflowPoints(hx.streamExample1(0.), hx.streamExample1(1., 1.),
+                             0.5)
+    fname = str(tmp_path / 'profile.npz')
+    resultio.saveProfile(fname, p)
+    with resultio.ResultFile(fname) as f:
+        table = f.table('profile', hx.profileType)
+        assert f.meta['UA'] == pytest.approx(p.UA[-1])
+    np.testing.assert_array_equal(table, p.toArray())
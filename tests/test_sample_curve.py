@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+sampleCurve against the curve it samples (user-039).
+"""
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+
+
+def knee(t):
+    # A stream that is nearly flat, then bends sharply at t = 0.6.
+    return t, 10. * np.log1p(np.exp(50. * (t - 0.6))) / 50.
+
+
+def test_interpolation_error():
+    t, q, T = hx.sampleCurve(knee, 0., 1., tol=0.01, maxpoints=200)
+    assert (np.diff(t) > 0).all()
+    np.testing.assert_allclose(knee(t)[1], T)
+    qq = np.linspace(0, 1, 2001)
+    assert np.abs(np.interp(qq, q, T) - knee(qq)[1]).max() < 0.02
+    # Points crowd around the knee.
+    h = np.diff(t)
+    assert h[np.searchsorted(t, 0.6) - 1] < h.max() / 4
+
+
+def test_straight_line():
+    t, q, T = hx.sampleCurve(lambda t: (t, 2. * t), 0., 1., n=9)
+    assert len(t) == 9
+
+
+def test_maxpoints():
+    t, q, T = hx.sampleCurve(knee, 0., 1., tol=1e-9, maxpoints=30)
+    assert len(t) == 30
+
+
+def failing(t):
+    if t > 0.7:
+        raise ValueError("out of range")
+    return knee(t)
+
+
+def test_truncate(capsys):
+    t, q, T = hx.sampleCurve(failing, 0., 1.)
+    assert t[-1] <= 0.7
+    assert capsys.readouterr().out == ''
+    hx.sampleCurve(failing, 0., 1., verbose=True)
+    assert 'Unable to evaluate' in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        hx.sampleCurve(failing, 0., 1., truncate=False)
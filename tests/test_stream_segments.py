@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Stream segments and the closed-form UA of linear and isothermal pieces,
+against plain quadrature (user-036).
+"""
+import CoolProp.CoolProp as CP
+import numpy as np
+import pytest
+import scipy.integrate
+
+import HRHX_integral_model as hx
+
+
+def quadUA(cold, hot, Q, points=()):
+    f = lambda q: 1. / (hot.T(q - Q) - cold.T(q))
+    return scipy.integrate.quad(f, 0, Q, points=points, limit=200)[0]
+
+
+def test_base_defaults():
+    edges, kinds = hx.stream().segments()
+    np.testing.assert_array_equal(edges, [-np.inf, np.inf])
+    assert kinds == ['curve']
+    edges, phases = hx.stream().zones()
+    np.testing.assert_array_equal(edges, [-np.inf, np.inf])
+    assert phases == ['single-phase']
+
+
+@pytest.fixture(scope='module')
+def boiling():
+    P = 1e5
+    h_liq = CP.PropsSI('H', 'P', P, 'Q', 0, 'water')
+    h_vap = CP.PropsSI('H', 'P', P, 'Q', 1, 'water')
+    cold = hx.waterStream(P, h_liq - 2e5, 0.1)
+    return cold, h_liq, h_vap
+
+
+def test_waterStream_segments(boiling):
+    cold, h_liq, h_vap = boiling
+    edges, kinds = cold.segments()
+    np.testing.assert_allclose(edges[1:3], 0.1 * np.array([2e5, 2e5 + h_vap
+                                                           - h_liq]),
+                               rtol=1e-6)
+    assert kinds == ['curve', 'isothermal', 'curve']
+    q = np.linspace(edges[1], edges[2], 5)
+    np.testing.assert_allclose(cold.T(q), cold.T(q[0]), atol=1e-9)
+
+
+def test_waterStream_UA(boiling):
+    cold, h_liq, h_vap = boiling
+    hot = hx.streamExample1(140., 2.0, 4.2e3)
+    ci = hx.counterflow_integrator(cold, hot)
+    ci.calcQmaxBreakpoints()
+    edges = cold.segments()[0][1:3]
+    for f in [0.5, 0.95]:
+        Q = f * ci.Qmax
+        points = edges[edges < Q]
+        np.testing.assert_allclose(ci.calcUA(Q), quadUA(cold, hot, Q, points),
+                                   rtol=1e-6)
+
+
+def test_closed_form():
+    # Both streams linear or isothermal everywhere: no quadrature at all.
+    cold = hx.streamExample2(-5., 100., 1., 1., 10.)
+    hot = hx.streamExample1(120., 1.5)
+    ci = hx.counterflow_integrator(cold, hot)
+    assert all(linear for a, b, linear in ci._pieces(12.))
+    np.testing.assert_allclose(ci.calcUA(12.), quadUA(cold, hot, 12., [5.]),
+                               rtol=1e-8)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+The UA table of counterflow_integrator.tabulateUA against direct integration
+with calcUA, and rebuilding of a stale table (user-033).
+"""
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+
+
+@pytest.fixture(scope='module')
+def boiling():
+    cold = hx.streamExample2(-5., 100., 1., 1., 10.)
+    hot = hx.streamExample1(120., 1.5)
+    ci = hx.counterflow_integrator(cold, hot)
+    ci.tabulateUA()
+    return ci
+
+
+def test_table_matches_quad(boiling):
+    ci = boiling
+    tol = 2e-4
+    Q = ci.Qmax * -np.expm1(-np.linspace(0.05, 12., 41))
+    exact = np.array([ci.calcUA(q) for q in Q])
+    table = ci.calcUA(Q, method='table')
+    np.testing.assert_allclose(table, exact, rtol=tol)
+    assert ci.UA_table_error <= 1e-4
+
+
+def test_calcQ_inverts_table(boiling):
+    ci = boiling
+    Q = ci.Qmax * np.array([0.1, 0.5, 0.9, 0.99])
+    UA = ci.calcUA(Q, method='table')
+    np.testing.assert_allclose(ci.calcQ(UA, method='table'), Q, rtol=1e-8)
+
+
+def test_rebuilt_for_new_streams():
+    ci = hx.counterflow_integrator(hx.streamExample1(0.), hx.streamExample1(1.))
+    ci.calcUA(0.5, method='table')
+    first = ci.UA_table
+    # Halving the hot flow halves Qmax and changes the curve.
+    ci.hot = hx.streamExample1(1., 0.5)
+    UA = ci.calcUA(0.25, method='table')
+    assert ci.UA_table is not first
+    assert ci.Qmax == pytest.approx(0.5)
+    np.testing.assert_allclose(UA, ci.calcUA(0.25), rtol=1e-4)
+
+
+def test_rebuilt_for_new_qmax():
+    ci = hx.counterflow_integrator(hx.streamExample1(0.), hx.streamExample1(1.))
+    ci.calcUA(0.5, method='table')
+    first = ci.UA_table
+    ci.calcQmaxBreakpoints()
+    ci.calcUA(0.5, method='table')
+    assert ci.UA_table is first
+    ci.Qmax = 0.9
+    ci.calcUA(0.5, method='table')
+    assert ci.UA_table is not first
+    assert ci.Q_table[-1] < 0.9
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+calcUA3Segments against calcUA3, near and beyond the pinch (user-034).
+"""
+import warnings
+
+import CoolProp.CoolProp as CP
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+
+
+@pytest.fixture(scope='module')
+def boiler():
+    h_liq = CP.PropsSI('H', 'P', 1e5, 'Q', 0, 'water')
+    cold = hx.waterStream(1e5, h_liq - 2e5, 0.1)
+    hot = hx.streamExample1(140., 2.0, 4.2e3)
+    ci = hx.counterflow_integrator(cold, hot)
+    ci.calcQmaxBreakpoints()
+    return ci
+
+
+@pytest.mark.parametrize('f', [0.5, 0.98, 1.02, 1.05])
+def test_matches_calcUA3(boiler, f):
+    Q = f * boiler.Qmax
+    UA, error = boiler.calcUA3(Q, 1.)
+    UA_s, error_s, table = boiler.calcUA3Segments(Q, 1.)
+    np.testing.assert_allclose(UA_s, UA, rtol=1e-6)
+    # The error integral is measured against Q * delta_t_min.
+    assert abs(error_s - error) <= 1e-6 * Q * 1.
+    np.testing.assert_allclose(table['Q'].sum(), Q)
+    np.testing.assert_allclose(table['UA'].sum(), UA_s)
+
+
+def test_deltaT_min(boiler):
+    Q = 0.9 * boiler.Qmax
+    table = boiler.calcUA3Segments(Q, 1.)[2]
+    # The pinch is at the bubble point, at a kink in the cold curve.
+    exact = boiler.calcDistanceT(Q)
+    np.testing.assert_allclose(table['deltaT_min'].min(), exact, atol=1e-6)
+
+
+def test_negative_duty():
+    cold = hx.streamExample1(0., 1.)
+    hot = hx.streamExample1(1., 2.)
+    ci = hx.counterflow_integrator(cold, hot)
+    UA, error = ci.calcUA3(-0.2, 0.1)
+    UA_s, error_s, table = ci.calcUA3Segments(-0.2, 0.1)
+    np.testing.assert_allclose(UA_s, UA, rtol=1e-6)
+    np.testing.assert_allclose(error_s, error, atol=1e-9)
+
+
+def test_linearUA_degenerate():
+    # Against the LMTD formula, with no warnings at the degenerate ends.
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert hx._linearUA(2., 4., 1.)[0] == pytest.approx(
+            hx.UA_by_LMTD(2., 0., 0., 4., 1.))
+        assert hx._linearUA(2., 3., 3.)[0] == pytest.approx(
+            hx.UA_by_LMTD(2., 0., 0., 3., 3.))
+        assert hx._linearUA(2., 2., 0.)[0] == np.inf
+        assert hx._linearUA(2., 2., -1.)[0] == np.inf
+        assert hx._linearUA(0., 2., 0.)[0] == 0.
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+The tabulated waterStream against CoolProp.PropsSI (user-037).
+"""
+import CoolProp.CoolProp as CP
+import numpy as np
+import pytest
+
+import HRHX_integral_model as hx
+
+P = 1e5
+
+
+@pytest.fixture(scope='module')
+def stream():
+    h_in = CP.PropsSI('H', 'P', P, 'T', 300., 'water')
+    return hx.waterStream(P, h_in, 0.5), h_in
+
+
+def test_T_of_q(stream):
+    s, h_in = stream
+    T = np.array([280., 300., 330., 360., 370., 380., 420., 500., 700.])
+    h = CP.PropsSI('H', 'P', P, 'T', T, 'water')
+    np.testing.assert_allclose(s.T(s.mdot * (h - h_in)), hx.K2C(T),
+                               atol=1e-3)
+
+
+def test_q_of_T(stream):
+    s, h_in = stream
+    T = np.array([290., 320., 350., 365., 400., 450., 600.])
+    h = CP.PropsSI('H', 'P', P, 'T', T, 'water')
+    np.testing.assert_allclose(s.q(hx.K2C(T)), s.mdot * (h - h_in),
+                               rtol=1e-5)
+
+
+def test_plateau(stream):
+    s, h_in = stream
+    T_sat = CP.PropsSI('T', 'P', P, 'Q', 0, 'water')
+    h = CP.PropsSI('H', 'P', P, 'Q', [0.1, 0.5, 0.9], 'water')
+    np.testing.assert_allclose(s.T(s.mdot * (h - h_in)), hx.K2C(T_sat),
+                               atol=1e-9)
+
+
+def test_shared_table():
+    h_in = CP.PropsSI('H', 'P', P, 'T', 320., 'water')
+    assert hx.waterStream(P, h_in, 1.).table \
+        is hx.waterStream(P, h_in + 1e3, 2.).table
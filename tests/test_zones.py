@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+calcZones and rateZones against calcUA and quadrature zone by zone
+(user-042).
+"""
+import CoolProp.CoolProp as CP
+import numpy as np
+import pytest
+import scipy.integrate
+
+import HRHX_integral_model as hx
+
+
+@pytest.fixture(scope='module')
+def boiler():
+    h_liq = CP.PropsSI('H', 'P', 1e5, 'Q', 0, 'water')
+    cold = hx.waterStream(1e5, h_liq - 2e5, 0.1)
+    hot = hx.streamExample1(200., 2.0, 4.2e3)
+    ci = hx.counterflow_integrator(cold, hot)
+    ci.calcQmaxBreakpoints()
+    return ci
+
+
+h_cold = {'subcooled': 2e3, 'two-phase': 1e4, 'superheated': 100.}
+
+
+def test_uniform_coefficient(boiler):
+    Q = 0.8 * boiler.Qmax
+    area, table = boiler.calcZones(Q, 500., 500.)
+    np.testing.assert_allclose(area * 250., boiler.calcUA(Q), rtol=1e-6)
+
+
+def test_zone_by_zone(boiler):
+    Q = 0.95 * boiler.Qmax
+    area, table = boiler.calcZones(Q, h_cold, 500.)
+    assert list(table['cold']) == ['subcooled', 'two-phase',
+                                         'superheated']
+    np.testing.assert_allclose(table['Q'].sum(), Q)
+    f = lambda q: 1. / (boiler.hot.T(q - Q) - boiler.cold.T(q))
+    for row in table:
+        UA = scipy.integrate.quad(f, row['q_start'], row['q_end'])[0]
+        np.testing.assert_allclose(row['UA'], UA, rtol=1e-6)
+        U = 1. / (1. / h_cold[row['cold']] + 1. / 500.)
+        np.testing.assert_allclose(row['area'], UA / U, rtol=1e-6)
+    np.testing.assert_allclose(area, table['area'].sum())
+
+
+def test_rateZones(boiler):
+    Q = 0.7 * boiler.Qmax
+    area = boiler.calcZones(Q, h_cold, 500.)[0]
+    np.testing.assert_allclose(boiler.rateZones(area, h_cold, 500.), Q,
+                               rtol=1e-8)
+
+
+def test_missing_phase(boiler):
+    with pytest.raises(ValueError):
+        boiler.calcZones(0.9 * boiler.Qmax, {'subcooled': 1.}, 500.)